@@ -0,0 +1,98 @@
+import numpy as np
+from functools import lru_cache
+
+# Columns of every per-frame track
+X, Y, ALPHA, ANGLE = range(4)
+TRACK_FIELDS = ("x", "y", "alpha", "angle")
+
+# Distinct (instruction, sprite size, canvas, frame count) tracks kept in memory
+TRACK_CACHE_SIZE = 256
+
+
+def build_timeline(sprite_sizes: dict, instructions: dict, canvas_size: tuple, frame_count: int) -> dict:
+    """
+    Plan a whole animation before any frame is drawn.
+
+    Args:
+        sprite_sizes: Dict mapping tags to the size of the sprite actually pasted
+        instructions: Output of parse_animation_instructions
+        canvas_size: Canvas (width, height)
+        frame_count: Number of frames
+
+    Returns:
+        Dict mapping tags to a read-only (frame_count, 4) float array of
+        x, y, alpha (0-1) and angle (degrees) per frame
+    """
+    return {
+        tag: animation_track(size, instructions.get(tag, {"type": "static"}), canvas_size, frame_count)
+        for tag, size in sprite_sizes.items()
+    }
+
+
+def animation_track(sprite_size: tuple, instruction: dict, canvas_size: tuple, frame_count: int) -> np.ndarray:
+    """Per-frame (x, y, alpha, angle) for one sprite; shared between jobs with the same plan"""
+    return _compile_track(
+        instruction.get("type", "static"),
+        instruction.get("direction"),
+        tuple(sprite_size),
+        tuple(canvas_size),
+        frame_count,
+    )
+
+
+@lru_cache(maxsize=TRACK_CACHE_SIZE)
+def _compile_track(kind: str, direction, sprite_size: tuple, canvas_size: tuple, frame_count: int) -> np.ndarray:
+    img_width, img_height = sprite_size
+    canvas_width, canvas_height = canvas_size
+
+    # Progress from 0 to 1 for every frame at once
+    if frame_count > 1:
+        progress = np.arange(frame_count) / (frame_count - 1)
+    else:
+        progress = np.zeros(frame_count)
+
+    center_x = np.full(frame_count, float((canvas_width - img_width) // 2))
+    center_y = np.full(frame_count, float((canvas_height - img_height) // 2))
+    x, y = center_x, center_y
+    alpha = np.ones(frame_count)
+    angle = np.zeros(frame_count)
+
+    if kind == "slide_horizontal":
+        share = progress if direction in (None, "left_to_right") else 1 - progress
+        x = np.trunc(share * (canvas_width - img_width))
+
+    elif kind == "slide_vertical":
+        share = progress if direction in (None, "top_to_bottom") else 1 - progress
+        y = np.trunc(share * (canvas_height - img_height))
+
+    elif kind == "rotate":
+        # One clockwise turn in place; the last frame stops short so the loop is seamless
+        angle = np.arange(frame_count) * (360.0 / max(frame_count, 1))
+
+    elif kind == "fade":
+        alpha = 1 - progress if direction == "out" else progress
+
+    elif kind == "bounce":
+        bounce_height = canvas_height // 4
+        y = canvas_height - img_height - np.trunc(bounce_height * np.abs(np.sin(progress * np.pi * 2)))
+
+    track = np.empty((frame_count, len(TRACK_FIELDS)))
+    track[:, X] = x
+    track[:, Y] = y
+    track[:, ALPHA] = alpha
+    track[:, ANGLE] = angle
+    track.setflags(write=False)
+    return track
+
+
+def describe_timeline(timeline: dict) -> dict:
+    """JSON-friendly view of a timeline: {tag: [{"x", "y", "alpha", "angle"}, ...]}"""
+    return {
+        tag: [dict(zip(TRACK_FIELDS, (round(float(value), 3) for value in row))) for row in track]
+        for tag, track in timeline.items()
+    }
+
+
+def timeline_cache_stats() -> dict:
+    info = _compile_track.cache_info()
+    return {"hits": info.hits, "misses": info.misses, "entries": info.currsize, "max_entries": info.maxsize}
@@ -0,0 +1,57 @@
+import os
+
+from .image_pyramid import remove_pyramid
+
+# File extensions for the formats Pillow reports from the image header
+FORMAT_EXTENSIONS = {
+    "JPEG": ".jpg",
+    "PNG": ".png",
+    "GIF": ".gif",
+    "WEBP": ".webp",
+    "BMP": ".bmp",
+    "TIFF": ".tiff",
+}
+
+
+class BlobStore:
+    """
+    Content-addressed storage for uploaded images, shared by all sessions.
+
+    Blobs are named "<sha256><ext>" and sharded by the first two hex digits.
+    Sessions only hold blob names; reference counts live in the session store,
+    which calls remove() once the last session lets go of a blob.
+    """
+
+    def __init__(self, root: str):
+        self.root = root
+        os.makedirs(root, exist_ok=True)
+
+    @staticmethod
+    def blob_name(digest: str, image_format: str, fallback_ext: str = "") -> str:
+        ext = FORMAT_EXTENSIONS.get(image_format, fallback_ext.lower())
+        return f"{digest}{ext}"
+
+    def path(self, name: str) -> str:
+        return os.path.join(self.root, name[:2], name)
+
+    def exists(self, name: str) -> bool:
+        return os.path.exists(self.path(name))
+
+    def adopt(self, temp_path: str, name: str) -> str:
+        """
+        Move a freshly uploaded file into place as blob name.
+
+        Replacing an existing blob is safe because the content is identical,
+        and it restores a blob that was removed concurrently.
+        """
+        blob_path = self.path(name)
+        os.makedirs(os.path.dirname(blob_path), exist_ok=True)
+        os.replace(temp_path, blob_path)
+        return blob_path
+
+    def remove(self, name: str):
+        try:
+            os.remove(self.path(name))
+        except FileNotFoundError:
+            pass
+        remove_pyramid(self.path(name))
@@ -0,0 +1,107 @@
+from collections import deque
+import os
+import threading
+import time
+
+# Circuit breaker settings (environment overridable)
+BREAKER_FAILURES = int(os.environ.get("BREAKER_FAILURES", 3))  # Consecutive failures that open a breaker
+BREAKER_RESET_TIMEOUT = float(os.environ.get("BREAKER_RESET_TIMEOUT", 30))  # Seconds before an open breaker is retried
+
+# Recent call latencies kept per breaker for its stats
+LATENCY_WINDOW = 100
+
+CLOSED, OPEN, HALF_OPEN = "closed", "open", "half_open"
+
+
+class CircuitBreaker:
+    """
+    Fail fast in front of an endpoint that keeps failing.
+
+    Closed, every call goes through. After failure_threshold consecutive
+    failures the breaker opens and calls are refused without touching the
+    network. Once reset_timeout has passed it is half-open: one trial call
+    goes through, and its outcome closes the breaker or opens it again.
+
+    A background health probe can move the retry time: hold_open keeps the
+    breaker open for another reset_timeout, so no caller pays for the trial
+    while the server is down, and probe_succeeded allows the trial at once.
+    """
+
+    def __init__(self, name: str, failure_threshold: int = BREAKER_FAILURES,
+                 reset_timeout: float = BREAKER_RESET_TIMEOUT):
+        self.name = name
+        self.failure_threshold = failure_threshold
+        self.reset_timeout = reset_timeout
+        self.state = CLOSED
+        self.consecutive_failures = 0
+        self.retry_at = 0.0
+        self.latencies = deque(maxlen=LATENCY_WINDOW)
+        self.successes = 0
+        self.failures = 0
+        self.rejected = 0
+        self.opened = 0
+        self._lock = threading.Lock()
+
+    @property
+    def available(self) -> bool:
+        """Whether a call would be let through right now (without claiming the half-open trial)"""
+        with self._lock:
+            return self.state == CLOSED or time.monotonic() >= self.retry_at
+
+    def allow(self) -> bool:
+        """Claim permission for one call; False means fail fast"""
+        with self._lock:
+            if self.state == CLOSED:
+                return True
+            now = time.monotonic()
+            if now >= self.retry_at:
+                # This call is the trial; a trial that never reports back is replaced after reset_timeout
+                self.state = HALF_OPEN
+                self.retry_at = now + self.reset_timeout
+                return True
+            self.rejected += 1
+            return False
+
+    def record_success(self, latency: float):
+        with self._lock:
+            self.latencies.append(latency)
+            self.successes += 1
+            self.consecutive_failures = 0
+            self.state = CLOSED
+
+    def record_failure(self, latency: float) -> bool:
+        """Count a failed call; True when this failure opened the breaker"""
+        with self._lock:
+            self.latencies.append(latency)
+            self.failures += 1
+            self.consecutive_failures += 1
+            if self.state == HALF_OPEN or (self.state == CLOSED and self.consecutive_failures >= self.failure_threshold):
+                self.state = OPEN
+                self.retry_at = time.monotonic() + self.reset_timeout
+                self.opened += 1
+                return True
+            return False
+
+    def probe_succeeded(self):
+        with self._lock:
+            if self.state == OPEN:
+                self.retry_at = time.monotonic()
+
+    def hold_open(self):
+        with self._lock:
+            if self.state == OPEN:
+                self.retry_at = time.monotonic() + self.reset_timeout
+
+    def stats(self) -> dict:
+        with self._lock:
+            latencies = sorted(self.latencies)
+            return {
+                "state": self.state,
+                "consecutive_failures": self.consecutive_failures,
+                "successes": self.successes,
+                "failures": self.failures,
+                "rejected": self.rejected,
+                "opened": self.opened,
+                "latency_p50": round(latencies[len(latencies) // 2], 4) if latencies else None,
+                "latency_p99": round(latencies[int(len(latencies) * 0.99)], 4) if latencies else None,
+            }
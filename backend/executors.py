@@ -0,0 +1,197 @@
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+import asyncio
+import functools
+import os
+import threading
+
+# Executor configuration (environment overridable)
+# RENDER_EXECUTOR: "process" runs Pillow work in worker processes, "thread" keeps it in-process
+RENDER_EXECUTOR = os.environ.get("RENDER_EXECUTOR", "process")
+RENDER_WORKERS = int(os.environ.get("RENDER_WORKERS", os.cpu_count() or 1))
+IO_WORKERS = int(os.environ.get("IO_WORKERS", 8))
+# Background work nobody waits for (upload pyramids) gets its own small pool, never the render pool
+BACKGROUND_WORKERS = int(os.environ.get("BACKGROUND_WORKERS", 1))
+
+# Per-job timeouts in seconds
+RENDER_TIMEOUT = float(os.environ.get("RENDER_TIMEOUT", 120))
+IO_TIMEOUT = float(os.environ.get("IO_TIMEOUT", 120))
+
+# How often to check whether the HTTP client is still connected
+DISCONNECT_POLL_INTERVAL = 0.5
+
+_render_pool = None
+_io_pool = None
+_background_pool = None
+_pool_lock = threading.Lock()
+
+# Caches filled by render jobs live in the worker processes; each job brings back a snapshot
+_worker_reporter = None
+_worker_stats = {}  # worker pid -> latest reporter() result
+
+
+class JobTimeout(Exception):
+    """Raised when a pooled job does not finish within its timeout"""
+
+
+class ClientDisconnected(Exception):
+    """Raised when the client went away while its job was still running"""
+
+
+def get_render_pool():
+    """Return the executor used for CPU-bound rendering, creating it on first use"""
+    global _render_pool
+    with _pool_lock:
+        if _render_pool is None:
+            if RENDER_EXECUTOR == "thread":
+                _render_pool = ThreadPoolExecutor(max_workers=RENDER_WORKERS, thread_name_prefix="render")
+            else:
+                _render_pool = ProcessPoolExecutor(max_workers=RENDER_WORKERS)
+        return _render_pool
+
+
+def get_io_pool():
+    """Return the thread pool used for blocking network calls, creating it on first use"""
+    global _io_pool
+    with _pool_lock:
+        if _io_pool is None:
+            _io_pool = ThreadPoolExecutor(max_workers=IO_WORKERS, thread_name_prefix="blocking-io")
+        return _io_pool
+
+
+def get_background_pool():
+    """Return the executor for fire-and-forget CPU work, creating it on first use"""
+    global _background_pool
+    with _pool_lock:
+        if _background_pool is None:
+            if RENDER_EXECUTOR == "thread":
+                _background_pool = ThreadPoolExecutor(max_workers=BACKGROUND_WORKERS, thread_name_prefix="background")
+            else:
+                _background_pool = ProcessPoolExecutor(max_workers=BACKGROUND_WORKERS)
+        return _background_pool
+
+
+def _report_background_failure(name: str, future):
+    if not future.cancelled() and future.exception() is not None:
+        print(f"Background job {name} failed: {future.exception()}")
+
+
+def submit_background(fn, *args, **kwargs):
+    """
+    Queue fn(*args, **kwargs) on the background pool without waiting for it.
+
+    It never delays interactive renders; failures are printed since nobody
+    awaits the result.
+    """
+    future = get_background_pool().submit(fn, *args, **kwargs)
+    future.add_done_callback(functools.partial(_report_background_failure, fn.__name__))
+    return future
+
+
+async def _wait_for_disconnect(request):
+    """Return once the client behind request has disconnected"""
+    while not await request.is_disconnected():
+        await asyncio.sleep(DISCONNECT_POLL_INTERVAL)
+
+
+async def run_in_pool(pool, fn, *args, timeout: float = None, request=None, **kwargs):
+    """
+    Run fn(*args, **kwargs) on pool without blocking the event loop.
+
+    Args:
+        pool: Executor to submit the job to
+        fn: Callable to run (must be picklable for process pools)
+        timeout: Seconds to wait before giving up with JobTimeout
+        request: Optional Starlette request; the job is cancelled with
+            ClientDisconnected when its client goes away
+
+    Jobs that already started in a worker cannot be interrupted, so on
+    timeout or disconnect their result is simply discarded.
+    """
+    loop = asyncio.get_running_loop()
+    job = loop.run_in_executor(pool, functools.partial(fn, *args, **kwargs))
+    return await _await_job(job, fn.__name__, timeout, request)
+
+
+async def run_async(fn, *args, timeout: float = IO_TIMEOUT, request=None, **kwargs):
+    """
+    Await the coroutine fn(*args, **kwargs) with the same timeout and disconnect
+    handling as the pools; unlike a pooled job it is really cancelled.
+    """
+    job = asyncio.ensure_future(fn(*args, **kwargs))
+    return await _await_job(job, fn.__name__, timeout, request)
+
+
+async def _await_job(job, name: str, timeout: float, request):
+    watcher = asyncio.ensure_future(_wait_for_disconnect(request)) if request is not None else None
+    waiting = {job} if watcher is None else {job, watcher}
+
+    try:
+        done, _ = await asyncio.wait(waiting, timeout=timeout, return_when=asyncio.FIRST_COMPLETED)
+
+        if job in done:
+            return job.result()
+
+        if watcher is not None and watcher in done:
+            raise ClientDisconnected(f"Client disconnected while running {name}")
+        raise JobTimeout(f"{name} did not finish within {timeout} seconds")
+    finally:
+        if not job.done():
+            job.cancel()
+        if watcher is not None:
+            watcher.cancel()
+
+
+class _ReportingJob:
+    """Picklable wrapper that runs fn in a worker and also returns the worker's pid and reporter()"""
+
+    def __init__(self, fn, reporter):
+        self.fn = fn
+        self.reporter = reporter
+        self.__name__ = fn.__name__
+
+    def __call__(self, *args, **kwargs):
+        return self.fn(*args, **kwargs), os.getpid(), self.reporter()
+
+
+def report_worker_stats(reporter):
+    """
+    Have render jobs in worker processes return reporter() (a picklable
+    module-level function) with their result; see worker_stats().
+    """
+    global _worker_reporter
+    _worker_reporter = reporter
+
+
+def worker_stats() -> list:
+    """Latest reporter() result of every render worker process that has run a job"""
+    return list(_worker_stats.values())
+
+
+async def run_render(fn, *args, timeout: float = RENDER_TIMEOUT, request=None, **kwargs):
+    """Run a CPU-bound rendering job on the render pool"""
+    pool = get_render_pool()
+    if _worker_reporter is None or not isinstance(pool, ProcessPoolExecutor):
+        return await run_in_pool(pool, fn, *args, timeout=timeout, request=request, **kwargs)
+
+    job = _ReportingJob(fn, _worker_reporter)
+    result, pid, stats = await run_in_pool(pool, job, *args, timeout=timeout, request=request, **kwargs)
+    _worker_stats[pid] = stats
+    return result
+
+
+async def run_blocking_io(fn, *args, timeout: float = IO_TIMEOUT, request=None, **kwargs):
+    """Run a blocking network call on the I/O thread pool"""
+    return await run_in_pool(get_io_pool(), fn, *args, timeout=timeout, request=request, **kwargs)
+
+
+def shutdown_pools():
+    """Stop every pool, dropping jobs that have not started yet"""
+    global _render_pool, _io_pool, _background_pool
+    with _pool_lock:
+        for pool in (_render_pool, _io_pool, _background_pool):
+            if pool is not None:
+                pool.shutdown(wait=False, cancel_futures=True)
+        _render_pool = None
+        _io_pool = None
+        _background_pool = None
+        _worker_stats.clear()
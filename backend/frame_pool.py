@@ -0,0 +1,209 @@
+from collections import OrderedDict
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from multiprocessing import get_context, shared_memory, util
+from PIL import Image
+import os
+import threading
+import uuid
+
+# Parallel frame rendering (environment overridable)
+# PARALLEL_FRAMES=1 renders long animations across FRAME_WORKERS processes
+PARALLEL_FRAMES = os.environ.get("PARALLEL_FRAMES", "0") == "1"
+FRAME_WORKERS = int(os.environ.get("FRAME_WORKERS", os.cpu_count() or 1))
+PARALLEL_MIN_FRAMES = int(os.environ.get("PARALLEL_MIN_FRAMES", 32))
+
+# Frames per task, and tasks kept in flight per worker
+FRAME_CHUNK = 4
+CHUNKS_PER_WORKER = 2
+
+# Animations a frame worker keeps attached (sprites mapped, variants cached)
+WORKER_JOBS_KEPT = 2
+
+# One long-lived frame pool per process (usually a render worker), started on first use
+_frame_pool = None
+_frame_pool_lock = threading.Lock()
+
+# In a frame worker: animation id -> its attached state, least recently used first
+_worker_jobs = OrderedDict()
+
+
+def should_render_in_parallel(frame_count: int, parallel: bool = None) -> bool:
+    """parallel=None follows PARALLEL_FRAMES; short animations are cheaper to draw than to hand out"""
+    if parallel is None:
+        parallel = PARALLEL_FRAMES
+    return parallel and FRAME_WORKERS > 1 and frame_count >= PARALLEL_MIN_FRAMES
+
+
+def get_frame_pool(workers: int = None) -> ProcessPoolExecutor:
+    """
+    Return this process's frame pool, creating it on first use.
+
+    Workers are spawned once and serve every later animation, so only the
+    first pays interpreter start-up. workers only counts when the pool is created.
+    """
+    global _frame_pool
+    with _frame_pool_lock:
+        if _frame_pool is None:
+            # spawn, not fork: this may run inside a threaded server process
+            _frame_pool = ProcessPoolExecutor(max_workers=workers or FRAME_WORKERS, mp_context=get_context("spawn"))
+            # Render workers leave through multiprocessing's exit hooks, not interpreter shutdown.
+            # Run before the queue finalizers (priority 10) so the stop signals still reach the workers.
+            util.Finalize(None, _frame_pool.shutdown, exitpriority=20)
+        return _frame_pool
+
+
+def _discard_frame_pool(pool: ProcessPoolExecutor):
+    global _frame_pool
+    with _frame_pool_lock:
+        if _frame_pool is pool:
+            _frame_pool = None
+    pool.shutdown(wait=False, cancel_futures=True)
+
+
+def parallel_animation_frames(layers: dict, timeline: dict, canvas_size: tuple, frame_count: int,
+                              palette: Image.Image = None, workers: int = None):
+    """
+    Yield (frame, dirty_box) like gif_generator.animation_frames, rendered by a process pool.
+
+    Sprites are copied once into shared memory and mapped read-only by every
+    worker of the process's long-lived frame pool; each worker attaches them
+    on its first chunk of the animation. Workers render contiguous
+    chunks of frames; results are yielded strictly in frame order with a
+    bounded number of chunks in flight. With a palette, workers also quantize
+    each frame's dirty area and yield "P" frames for GifDeltaWriter.
+    """
+    workers = workers or FRAME_WORKERS
+    blocks = []
+    try:
+        sprites = {}
+        for tag, layer in layers.items():
+            sprite = layer["sprite"]
+            data = sprite.tobytes()
+            block = shared_memory.SharedMemory(create=True, size=max(1, len(data)))
+            blocks.append(block)
+            block.buf[:len(data)] = data
+            sprites[tag] = (block.name, sprite.mode, sprite.size)
+
+        palette_colors = palette.getpalette() if palette is not None else None
+        chunks = [range(start, min(start + FRAME_CHUNK, frame_count)) for start in range(0, frame_count, FRAME_CHUNK)]
+        job = (uuid.uuid4().hex, sprites, timeline, canvas_size, palette_colors)
+
+        pool = get_frame_pool(workers)
+        pending = []
+        next_chunk = 0
+        try:
+            while next_chunk < len(chunks) or pending:
+                # Keep a bounded window of chunks in flight
+                while next_chunk < len(chunks) and len(pending) < workers * CHUNKS_PER_WORKER:
+                    pending.append(pool.submit(_render_chunk, job, chunks[next_chunk]))
+                    next_chunk += 1
+
+                for mode, data, dirty_box in pending.pop(0).result():
+                    frame = Image.frombytes(mode, canvas_size, data)
+                    if mode == "P":
+                        frame.putpalette(palette_colors)
+                    yield frame, dirty_box
+        except BrokenProcessPool:
+            # A worker died; the next animation starts a fresh pool
+            _discard_frame_pool(pool)
+            raise
+        finally:
+            for future in pending:
+                future.cancel()
+    finally:
+        for block in blocks:
+            block.close()
+            block.unlink()
+
+
+def _attach_job(sprites: dict, timeline: dict, canvas_size: tuple, palette_colors: list) -> dict:
+    try:
+        from .gif_encoder import palette_image
+    except ImportError:
+        from gif_encoder import palette_image
+
+    layers = {}
+    blocks = []
+    for tag, (name, mode, size) in sprites.items():
+        # Spawned workers share the parent's resource tracker, which unlinks the block once
+        block = shared_memory.SharedMemory(name=name)
+        blocks.append(block)
+        layers[tag] = {"sprite": Image.frombuffer(mode, size, block.buf, "raw", mode, 0, 1)}
+
+    return {
+        "layers": layers,
+        "blocks": blocks,
+        "timeline": timeline,
+        "canvas_size": canvas_size,
+        "palette": palette_image(palette_colors) if palette_colors else None,
+        "variants": {},
+    }
+
+
+def _detach_job(state: dict):
+    blocks = state.pop("blocks")
+    state.clear()
+    for block in blocks:
+        try:
+            block.close()
+        except BufferError:
+            # An image still maps it; the mapping goes when that image is collected
+            pass
+
+
+def _detach_all_jobs():
+    while _worker_jobs:
+        _detach_job(_worker_jobs.popitem()[1])
+
+
+def _job_state(job: tuple) -> dict:
+    """State of an animation in this frame worker, attached on its first chunk here"""
+    job_id = job[0]
+    state = _worker_jobs.get(job_id)
+    if state is None:
+        if not _worker_jobs:
+            # Unmap sprites before the interpreter tears down, so no mapping outlives its images
+            util.Finalize(None, _detach_all_jobs, exitpriority=10)
+        state = _worker_jobs[job_id] = _attach_job(*job[1:])
+        while len(_worker_jobs) > WORKER_JOBS_KEPT:
+            _detach_job(_worker_jobs.popitem(last=False)[1])
+    else:
+        _worker_jobs.move_to_end(job_id)
+    return state
+
+
+def _render_chunk(job: tuple, frame_indices: range) -> list:
+    try:
+        from .gif_generator import draw_frame, frame_layout, layout_dirty_box
+        from .gif_encoder import clip_box, quantize_frame
+    except ImportError:
+        from gif_generator import draw_frame, frame_layout, layout_dirty_box
+        from gif_encoder import clip_box, quantize_frame
+
+    state = _job_state(job)
+    layers, timeline, variants = state["layers"], state["timeline"], state["variants"]
+    canvas_size, palette = state["canvas_size"], state["palette"]
+
+    # Dirty boxes need the layout of the frame before the chunk
+    previous_layout = {}
+    if frame_indices[0] > 0:
+        previous_layout = frame_layout(layers, timeline, frame_indices[0] - 1, variants)
+
+    results = []
+    for frame_idx in frame_indices:
+        layout = frame_layout(layers, timeline, frame_idx, variants)
+        frame = draw_frame(layout, canvas_size)
+        dirty_box = layout_dirty_box(previous_layout, layout) if frame_idx > 0 else None
+        previous_layout = layout
+
+        if palette is not None:
+            # Only the area the encoder will read needs quantizing
+            indexed = Image.new("P", canvas_size, 0)
+            area = (0, 0) + canvas_size if dirty_box is None else clip_box(dirty_box, canvas_size)
+            if area:
+                indexed.paste(quantize_frame(frame.crop(area), palette), area[:2])
+            frame = indexed
+
+        results.append((frame.mode, frame.tobytes(), dirty_box))
+    return results
@@ -0,0 +1,188 @@
+from abc import ABC, abstractmethod
+from functools import lru_cache
+from PIL import Image
+import os
+import subprocess
+
+try:
+    from .gif_encoder import GifDeltaWriter
+except ImportError:
+    from gif_encoder import GifDeltaWriter
+
+# Output formats for animations: extension and media type
+OUTPUT_FORMATS = {
+    "gif": (".gif", "image/gif"),
+    "webp": (".webp", "image/webp"),
+    "mp4": (".mp4", "video/mp4"),
+}
+DEFAULT_OUTPUT_FORMAT = "gif"
+
+# MP4 is H.264 through moviepy's ffmpeg, the only codec browsers play in an MP4
+MP4_CODEC = "libx264"
+MP4_PRESET = os.environ.get("MP4_PRESET", "veryfast")
+
+# Long slides are written as repeated frames so players never see less than 1 fps
+MP4_MIN_FPS = 1.0
+
+WEBP_QUALITY = int(os.environ.get("WEBP_QUALITY", 80))
+# Pillow has no streaming WebP encoder, so WebP frames are held until the file is
+# written; an animation may hold at most this many bytes of RGB frames
+WEBP_MAX_FRAME_BYTES = int(os.environ.get("WEBP_MAX_FRAME_BYTES", 256 * 1024 * 1024))
+
+
+class OutputTooLarge(ValueError):
+    """Raised when an animation is too large for its output format"""
+
+
+@lru_cache(maxsize=None)
+def h264_available() -> bool:
+    """Whether moviepy's ffmpeg has the libx264 encoder (checked once per process)"""
+    try:
+        from moviepy.config import FFMPEG_BINARY
+
+        encoders = subprocess.run(
+            [FFMPEG_BINARY, "-hide_banner", "-encoders"], capture_output=True, text=True, timeout=30
+        ).stdout
+    except (ImportError, OSError, subprocess.SubprocessError):
+        return False
+    return any(line.split()[1:2] == [MP4_CODEC] for line in encoders.splitlines())
+
+
+def output_format_available(output_format: str) -> bool:
+    """Whether this server can write output_format (MP4 needs an H.264 encoder)"""
+    if output_format == "mp4":
+        return h264_available()
+    return output_format in OUTPUT_FORMATS
+
+
+def open_frame_writer(output_format: str, output_path: str, canvas_size: tuple, duration: int, palette=None):
+    """
+    Writer for an animation in output_format.
+
+    Every writer takes add_frame(frame, dirty_box=None) and close() and works
+    as a context manager, so callers can feed frames from a generator. GIF and
+    MP4 encode each frame as it arrives; WebP keeps them until close(), as
+    Pillow has no public streaming WebP encoder, so WebP is limited to
+    WEBP_MAX_FRAME_BYTES of frames (callers that know their frame count
+    check it up front with check_webp_size). dirty_box is only used by GIF,
+    which also needs its palette up front.
+
+    Raises:
+        ValueError: Unknown output format, or GIF without a palette
+        OutputTooLarge: (from add_frame) WebP frames over WEBP_MAX_FRAME_BYTES
+        RuntimeError: MP4 without an H.264 encoder
+    """
+    if output_format == "gif":
+        if palette is None:
+            raise ValueError("GIF output needs a palette")
+        return GifDeltaWriter(output_path, canvas_size, palette, duration)
+    if output_format == "webp":
+        return WebPWriter(output_path, canvas_size, duration)
+    if output_format == "mp4":
+        return MP4Writer(output_path, canvas_size, duration)
+    raise ValueError(f"Unsupported output format: {output_format}")
+
+
+def check_webp_size(canvas_size: tuple, frame_count: int, max_bytes: int = None):
+    """Raise OutputTooLarge when frame_count frames of canvas_size exceed the WebP frame budget"""
+    max_bytes = WEBP_MAX_FRAME_BYTES if max_bytes is None else max_bytes
+    needed = canvas_size[0] * canvas_size[1] * 3 * frame_count
+    if needed > max_bytes:
+        raise OutputTooLarge(
+            f"WebP animations are limited to {max_bytes} bytes of frames; {frame_count} frames of "
+            f"{canvas_size[0]}x{canvas_size[1]} need {needed}. Use GIF or MP4 instead"
+        )
+
+
+class FrameWriter(ABC):
+    """Base class: context manager support around add_frame/close"""
+
+    @abstractmethod
+    def add_frame(self, frame: Image.Image, dirty_box: tuple = None):
+        """Encode (or queue) one frame"""
+
+    def close(self):
+        pass
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+
+class WebPWriter(FrameWriter):
+    """
+    Animated WebP.
+
+    Pillow only encodes WebP animations through save(append_images=...), so
+    frames are collected and written in one go by close(). Frames past
+    max_bytes raise OutputTooLarge.
+    """
+
+    def __init__(self, output_path: str, canvas_size: tuple, duration: int, quality: int = WEBP_QUALITY,
+                 max_bytes: int = None):
+        self.output_path = output_path
+        self.canvas_size = canvas_size
+        self.duration = duration
+        self.quality = quality
+        self.max_bytes = WEBP_MAX_FRAME_BYTES if max_bytes is None else max_bytes
+        self.closed = False
+        self._frames = []
+
+    def add_frame(self, frame: Image.Image, dirty_box: tuple = None):
+        check_webp_size(self.canvas_size, len(self._frames) + 1, self.max_bytes)
+        self._frames.append(frame.convert("RGB"))
+
+    def close(self):
+        if self.closed:
+            return
+        self.closed = True
+        frames, self._frames = self._frames, []
+        if not frames:
+            return
+        frames[0].save(
+            self.output_path, "WEBP", save_all=True, append_images=frames[1:],
+            duration=self.duration, loop=0, quality=self.quality,
+        )
+
+
+class MP4Writer(FrameWriter):
+    """H.264 MP4 through moviepy's ffmpeg writer; each frame is piped to the encoder as soon as it arrives"""
+
+    def __init__(self, output_path: str, canvas_size: tuple, duration: int):
+        if not h264_available():
+            raise RuntimeError(f"No H.264 encoder available (ffmpeg without {MP4_CODEC})")
+        self.output_path = output_path
+        # Video encoders want even dimensions
+        self.size = (canvas_size[0] - canvas_size[0] % 2, canvas_size[1] - canvas_size[1] % 2)
+        fps = 1000 / max(duration, 1)
+        self.repeats = max(1, round(MP4_MIN_FPS / fps))
+        self.fps = fps * self.repeats
+        self._writer = None
+
+    def _open(self):
+        from moviepy.video.io.ffmpeg_writer import FFMPEG_VideoWriter
+
+        # faststart puts the index up front so browsers can play while downloading
+        return FFMPEG_VideoWriter(
+            self.output_path, self.size, self.fps, codec=MP4_CODEC, preset=MP4_PRESET,
+            ffmpeg_params=["-movflags", "+faststart"],
+        )
+
+    def add_frame(self, frame: Image.Image, dirty_box: tuple = None):
+        import numpy as np
+
+        if self._writer is None:
+            self._writer = self._open()
+        frame = frame.convert("RGB")
+        if frame.size != self.size:
+            frame = frame.crop((0, 0) + self.size)
+        pixels = np.asarray(frame)
+        for _ in range(self.repeats):
+            self._writer.write_frame(pixels)
+
+    def close(self):
+        if self._writer is not None:
+            self._writer.close()
+            self._writer = None
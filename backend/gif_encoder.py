@@ -0,0 +1,234 @@
+from PIL import Image, ImageChops, GifImagePlugin
+import os
+import struct
+
+# Palette index reserved for "unchanged since the previous frame"
+TRANSPARENT_INDEX = 255
+
+# Sprites are sampled at most this large when building the shared palette
+PALETTE_SAMPLE_SIZE = 256
+
+# GIF disposal method 1: leave the frame in place for the next one to draw over
+DISPOSAL_KEEP = 1
+
+# Palette builders selectable with GIF_QUANTIZER (all deterministic)
+QUANTIZERS = {
+    "mediancut": Image.Quantize.MEDIANCUT,
+    "fastoctree": Image.Quantize.FASTOCTREE,
+    "maxcoverage": Image.Quantize.MAXCOVERAGE,
+}
+GIF_QUANTIZER = os.environ.get("GIF_QUANTIZER", "mediancut")
+
+# Never let a quantized pixel land on the transparent index
+_OPAQUE_LUT = list(range(TRANSPARENT_INDEX)) + [0] * (256 - TRANSPARENT_INDEX)
+
+
+def build_shared_palette(sprites: list, background: tuple = (255, 255, 255), method: str = None,
+                         opacities: tuple = (1.0,)) -> Image.Image:
+    """
+    Build one palette for every frame of an animation.
+
+    Each sprite is sampled over the background colour (so edge blending is
+    represented) into a single mosaic, which is quantized (GIF_QUANTIZER) to 255
+    colours. Index 255 is kept free for transparency. Pass several opacities
+    when sprites fade, so the blended colours get palette entries too.
+
+    Returns:
+        A 1x1 "P" image carrying the palette, usable as Image.quantize(palette=...)
+    """
+    samples = []
+    for sprite in sprites:
+        sample = sprite.copy()
+        sample.thumbnail((PALETTE_SAMPLE_SIZE, PALETTE_SAMPLE_SIZE))
+        mask = sample.getchannel("A") if sample.mode == "RGBA" else Image.new("L", sample.size, 255)
+        for opacity in opacities:
+            flattened = Image.new("RGB", sample.size, background)
+            flattened.paste(sample.convert("RGB"), (0, 0), mask.point(lambda value: int(value * opacity)))
+            samples.append(flattened)
+
+    # Background swatch first, then the sprites side by side
+    return palette_from_samples([Image.new("RGB", (16, 16), background)] + samples, method)
+
+
+def build_frame_palette(frames: list, method: str = None) -> Image.Image:
+    """
+    Build one palette for a sequence of full RGB frames (e.g. presentation slides).
+
+    frames may be any iterable, such as a frame generator: it is consumed once and
+    only a downsampled copy (at most PALETTE_SAMPLE_SIZE on the long edge) of each
+    frame is kept.
+    """
+    samples = []
+    for frame in frames:
+        sample = frame.convert("RGB")
+        sample.thumbnail((PALETTE_SAMPLE_SIZE, PALETTE_SAMPLE_SIZE))
+        samples.append(sample)
+    return palette_from_samples(samples, method)
+
+
+def palette_from_samples(samples: list, method: str = None) -> Image.Image:
+    """Lay RGB samples side by side and quantize the mosaic to 255 colours"""
+    method = QUANTIZERS.get(method or GIF_QUANTIZER, Image.Quantize.MEDIANCUT)
+    width = sum(sample.size[0] for sample in samples) or 1
+    height = max([1] + [sample.size[1] for sample in samples])
+    mosaic = Image.new("RGB", (width, height), samples[0].getpixel((0, 0)) if samples else (0, 0, 0))
+    x = 0
+    for sample in samples:
+        mosaic.paste(sample, (x, 0))
+        x += sample.size[0]
+
+    quantized = mosaic.quantize(colors=TRANSPARENT_INDEX, method=method)
+    return palette_image(quantized.getpalette()[:TRANSPARENT_INDEX * 3])
+
+
+def quantize_frame(img: Image.Image, palette: Image.Image) -> Image.Image:
+    """Map an image onto a shared palette without dithering, never using the transparent index"""
+    quantized = img.convert("RGB").quantize(palette=palette, dither=Image.Dither.NONE)
+    return quantized.point(_OPAQUE_LUT)
+
+
+def palette_image(colors: list) -> Image.Image:
+    """
+    Wrap a flat RGB list (at most 255 entries) in a "P" image for quantize(palette=...).
+
+    Unused entries, including the transparency slot, repeat the first colour so
+    they never win a nearest-colour match over a real entry.
+    """
+    colors = list(colors[:TRANSPARENT_INDEX * 3])
+    colors += colors[:3] * (256 - len(colors) // 3)
+    palette = Image.new("P", (1, 1))
+    palette.putpalette(colors)
+    return palette
+
+
+def union_boxes(boxes: list):
+    """Smallest box containing every (left, top, right, bottom) box; None for none"""
+    boxes = [box for box in boxes if box and box[0] < box[2] and box[1] < box[3]]
+    if not boxes:
+        return None
+    return (
+        min(box[0] for box in boxes),
+        min(box[1] for box in boxes),
+        max(box[2] for box in boxes),
+        max(box[3] for box in boxes),
+    )
+
+
+def clip_box(box: tuple, canvas_size: tuple):
+    """Clip a box to the canvas; None if nothing is left"""
+    left, top = max(0, int(box[0])), max(0, int(box[1]))
+    right, bottom = min(canvas_size[0], int(box[2])), min(canvas_size[1], int(box[3]))
+    if left >= right or top >= bottom:
+        return None
+    return (left, top, right, bottom)
+
+
+class GifDeltaWriter:
+    """
+    Stream frames into a GIF that shares one global palette.
+
+    The first frame is written in full. Every later frame only encodes its
+    dirty rectangle, with pixels that did not change keyed to the transparent
+    index and disposal "keep", so file size and encode time follow the amount
+    of motion rather than canvas area times frame count.
+    """
+
+    def __init__(self, output_path: str, canvas_size: tuple, palette: Image.Image, duration: int, loop: int = 0):
+        self.canvas_size = canvas_size
+        self.palette = palette
+        self.duration = duration
+        self.frame_count = 0
+        self.output_path = output_path
+        self.loop = loop
+        self._previous = None
+        # The file is created with the first frame, so an empty animation leaves nothing behind
+        self._fp = None
+
+    def _write_header(self, loop: int):
+        width, height = self.canvas_size
+        colors = self.palette.getpalette()[:768]
+        self._fp.write(
+            b"GIF89a"
+            + struct.pack("<HH", width, height)
+            + bytes((0xF7, 0, 0))  # global 256-colour table, background index 0, square pixels
+            + bytes(colors)
+            # NETSCAPE looping extension
+            + b"!\xff\x0bNETSCAPE2.0\x03\x01" + struct.pack("<H", loop) + b"\x00"
+        )
+
+    def _quantize(self, img: Image.Image) -> Image.Image:
+        """
+        Map an image onto the shared palette, returning raw indexes as an "L" image.
+
+        "P" images are taken as already quantized against this writer's palette
+        (see quantize_frame), so frames can be quantized elsewhere.
+        """
+        if img.mode != "P":
+            img = quantize_frame(img, self.palette)
+        return Image.frombytes("L", img.size, img.tobytes())
+
+    def add_frame(self, frame: Image.Image, dirty_box: tuple = None):
+        """
+        Encode the next frame.
+
+        Args:
+            frame: Full-canvas RGB frame
+            dirty_box: (left, top, right, bottom) of everything that may have
+                changed since the previous frame; None means the whole canvas
+                and an empty box means nothing changed
+        """
+        if self._previous is None or dirty_box is None:
+            dirty_box = (0, 0) + self.canvas_size
+        else:
+            dirty_box = clip_box(dirty_box, self.canvas_size)
+            if dirty_box is None:
+                # Nothing moved: a single transparent pixel keeps the timing
+                self._write_unchanged_frame()
+                return
+
+        indexes = self._quantize(frame.crop(dirty_box))
+
+        if self._previous is None:
+            self._previous = indexes
+            self._write_frame(indexes, (0, 0), transparent=False)
+            return
+
+        # Key pixels that match what is already on screen to the transparent index
+        unchanged = ImageChops.difference(indexes, self._previous.crop(dirty_box)).point(lambda v: 255 if v == 0 else 0)
+        self._previous.paste(indexes, dirty_box[:2])
+        delta = indexes.copy()
+        delta.paste(TRANSPARENT_INDEX, (0, 0) + delta.size, unchanged)
+
+        # Trim to the pixels that actually changed
+        changed_box = ImageChops.invert(unchanged).getbbox()
+        if changed_box is None:
+            self._write_unchanged_frame()
+            return
+        delta = delta.crop(changed_box)
+        offset = (dirty_box[0] + changed_box[0], dirty_box[1] + changed_box[1])
+        self._write_frame(delta, offset, transparent=True)
+
+    def _write_unchanged_frame(self):
+        self._write_frame(Image.new("L", (1, 1), TRANSPARENT_INDEX), (0, 0), transparent=True)
+
+    def _write_frame(self, indexes: Image.Image, offset: tuple, transparent: bool):
+        if self._fp is None:
+            self._fp = open(self.output_path, "wb")
+            self._write_header(self.loop)
+        params = {"duration": self.duration, "disposal": DISPOSAL_KEEP}
+        if transparent:
+            params["transparency"] = TRANSPARENT_INDEX
+        for chunk in GifImagePlugin.getdata(indexes, offset, **params):
+            self._fp.write(chunk)
+        self.frame_count += 1
+
+    def close(self):
+        if self._fp is not None and not self._fp.closed:
+            self._fp.write(b";")
+            self._fp.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
@@ -1,9 +1,30 @@
 from PIL import Image, ImageDraw
 import os
-import re
-import math
 
-def create_animated_gif(image_paths: dict, prompt: str, output_path: str, duration=500, frame_count=10):
+try:
+    from .animation_timeline import ALPHA, ANGLE, X, Y, animation_track, build_timeline
+    from .image_cache import image_size, load_sprite
+    from .gif_encoder import build_shared_palette, union_boxes
+    from .frame_writers import DEFAULT_OUTPUT_FORMAT, check_webp_size, open_frame_writer
+    from .frame_pool import parallel_animation_frames, should_render_in_parallel
+    from .prompt_spec import COLOR_MAP, parse_prompt_spec
+    from .text_labels import DEFAULT_FONT_SIZE, paste_label, script_for_language, text_label
+except ImportError:
+    from animation_timeline import ALPHA, ANGLE, X, Y, animation_track, build_timeline
+    from image_cache import image_size, load_sprite
+    from gif_encoder import build_shared_palette, union_boxes
+    from frame_writers import DEFAULT_OUTPUT_FORMAT, check_webp_size, open_frame_writer
+    from frame_pool import parallel_animation_frames, should_render_in_parallel
+    from prompt_spec import COLOR_MAP, parse_prompt_spec
+    from text_labels import DEFAULT_FONT_SIZE, paste_label, script_for_language, text_label
+
+# Rotation and fading are rendered in steps, so variants can be reused
+ROTATION_STEP = 10  # degrees
+FADE_STEPS = 16
+
+
+def create_animated_gif(image_paths: dict, prompt: str, output_path: str, duration=500, frame_count=10, progress=None,
+                        output_format=DEFAULT_OUTPUT_FORMAT, parallel=None):
     """
     Create an animated GIF based on prompt with movement descriptions or presentation slideshow.
     
@@ -13,164 +34,268 @@ def create_animated_gif(image_paths: dict, prompt: str, output_path: str, durati
         output_path: Output file path
         duration: Duration per frame in milliseconds
         frame_count: Number of frames to generate
+        progress: Optional callable receiving (frames_rendered, frame_count)
+        output_format: "gif", "webp" or "mp4" (see frame_writers.OUTPUT_FORMATS)
+        parallel: Render frames across a process pool; None follows PARALLEL_FRAMES
     """
+    # Parse the prompt once (cached); every step below reads the same spec
+    spec = parse_prompt_spec(prompt)
+    
     # Check if this is a presentation-style prompt
-    if is_presentation_prompt(prompt):
-        return create_presentation_gif(image_paths, prompt, output_path, duration)
+    if spec.is_presentation:
+        return create_presentation_gif(image_paths, prompt, output_path, duration, progress=progress,
+                                       output_format=output_format)
     
     # Parse animation instructions from prompt
-    animation_instructions = parse_animation_instructions(prompt)
+    animation_instructions = spec.animation_instructions()
     
     # Extract custom dimensions from prompt
-    canvas_size = extract_canvas_size_from_prompt(prompt)
+    canvas_size = spec.canvas_size
+    if output_format == "webp":
+        # WebP holds every frame until it is written; refuse before drawing any
+        check_webp_size(canvas_size, frame_count)
+    
+    # Decode and resize every tagged image once for the whole job
+    layers = prepare_animation_layers(image_paths, animation_instructions, canvas_size)
+    
+    # Plan every sprite's motion up front, from the size actually pasted
+    timeline = build_timeline(
+        {tag: layer["sprite"].size for tag, layer in layers.items()},
+        {tag: layer["instruction"] for tag, layer in layers.items()},
+        canvas_size,
+        frame_count,
+    )
+    
+    # GIF shares one palette built from the sprites; fading sprites also need their blends
+    palette = None
+    if output_format == "gif":
+        opacities = (1.0,)
+        if any((track[:, ALPHA] < 1).any() for track in timeline.values()):
+            opacities = (1.0, 0.75, 0.5, 0.25)
+        palette = build_shared_palette([layer["sprite"] for layer in layers.values()], (255, 255, 255), opacities=opacities)
+    
+    # Long animations can be drawn (and quantized) by a process pool, reassembled in order
+    if should_render_in_parallel(frame_count, parallel):
+        frames = parallel_animation_frames(layers, timeline, canvas_size, frame_count, palette)
+    else:
+        frames = animation_frames(layers, timeline, canvas_size, frame_count)
     
-    # Create frames
-    frames = []
+    # Frames are encoded as they are drawn, so only a few are alive at a time
+    with open_frame_writer(output_format, output_path, canvas_size, duration, palette) as writer:
+        for frame_idx, (frame, dirty_box) in enumerate(frames):
+            writer.add_frame(frame, dirty_box)
+            if progress:
+                progress(frame_idx + 1, frame_count)
+    
+    return output_path
+
+
+def animation_frames(layers: dict, timeline: dict, canvas_size: tuple, frame_count: int):
+    """
+    Yield (frame, dirty_box) for every frame of the animation.
+
+    dirty_box covers every sprite that moved, turned or faded since the
+    previous frame, so encoders can skip the rest of the canvas.
+    """
+    previous_layout = {}
+    variants = {}
     
     for frame_idx in range(frame_count):
-        # Create base canvas
-        canvas = Image.new("RGB", canvas_size, color=(255, 255, 255))
-        
-        # Process each tagged image
-        for tag, image_path in image_paths.items():
-            if os.path.exists(image_path):
-                try:
-                    img = Image.open(image_path).convert("RGBA")
-                    
-                    # Get animation instruction for this tag
-                    instruction = animation_instructions.get(tag, {"type": "static"})
-                    
-                    # Calculate position for this frame
-                    x, y = calculate_animated_position(
-                        img.size, instruction, canvas_size, frame_idx, frame_count
-                    )
-                    
-                    # Resize image if needed
-                    img = resize_for_animation(img, instruction, canvas_size)
-                    
-                    # Paste image onto canvas
-                    if img.mode == "RGBA":
-                        canvas.paste(img, (int(x), int(y)), img)
-                    else:
-                        canvas.paste(img, (int(x), int(y)))
-                        
-                except Exception as e:
-                    # Skip problematic images
-                    continue
+        layout = frame_layout(layers, timeline, frame_idx, variants)
+        yield draw_frame(layout, canvas_size), layout_dirty_box(previous_layout, layout)
+        previous_layout = layout
+
+
+def frame_layout(layers: dict, timeline: dict, frame_idx: int, variants: dict) -> dict:
+    """
+    Where every layer goes in one frame.
+
+    Returns:
+        Dict mapping tags to (sprite variant, box, variant key)
+    """
+    layout = {}
+    for tag, layer in layers.items():
+        x, y, alpha, angle = timeline[tag][frame_idx, [X, Y, ALPHA, ANGLE]]
+        key, img = sprite_variant(variants, layer["sprite"], angle, alpha)
         
-        frames.append(canvas)
-    
-    # Save as animated GIF
-    if frames:
-        frames[0].save(
-            output_path,
-            save_all=True,
-            append_images=frames[1:],
-            optimize=False,
-            duration=duration,
-            loop=0,
-        )
-    
-    return output_path
+        # Rotated variants grow, so keep them centred on the planned position
+        x = int(x) + (layer["sprite"].size[0] - img.size[0]) // 2
+        y = int(y) + (layer["sprite"].size[1] - img.size[1]) // 2
+        layout[tag] = (img, (x, y, x + img.size[0], y + img.size[1]), key)
+    return layout
+
+
+def draw_frame(layout: dict, canvas_size: tuple) -> Image.Image:
+    """Paste a frame layout onto a fresh white canvas"""
+    canvas = Image.new("RGB", canvas_size, color=(255, 255, 255))
+    for img, box, _ in layout.values():
+        if img.mode == "RGBA":
+            canvas.paste(img, box[:2], img)
+        else:
+            canvas.paste(img, box[:2])
+    return canvas
+
+
+def layout_dirty_box(previous_layout: dict, layout: dict) -> tuple:
+    """Old and new boxes of every sprite that moved, turned or faded; (0, 0, 0, 0) if none did"""
+    moved = [tag for tag in layout if previous_layout.get(tag, (None,))[1:] != layout[tag][1:]]
+    dirty_box = union_boxes(
+        [layout[tag][1] for tag in moved] + [previous_layout[tag][1] for tag in moved if tag in previous_layout]
+    )
+    return dirty_box or (0, 0, 0, 0)
 
 
+def sprite_variant(variants: dict, sprite: Image.Image, angle: float, alpha: float) -> tuple:
+    """
+    Rotated/faded version of sprite, rendered once per angle and alpha step.
+
+    variants is a per-job dict, so every frame and every tag sharing the same
+    sprite reuses the same rendered image.
+
+    Returns:
+        (variant key, image)
+    """
+    angle_step = round(angle / ROTATION_STEP) % (360 // ROTATION_STEP)
+    alpha_step = round(alpha * FADE_STEPS)
+    if angle_step == 0 and alpha_step == FADE_STEPS:
+        return (0, FADE_STEPS), sprite
+    
+    key = (id(sprite), angle_step, alpha_step)
+    if key not in variants:
+        img = sprite.convert("RGBA") if sprite.mode != "RGBA" else sprite
+        if angle_step:
+            # Negative angle turns clockwise
+            img = img.rotate(-angle_step * ROTATION_STEP, resample=Image.Resampling.BICUBIC, expand=True)
+        if alpha_step < FADE_STEPS:
+            img = img.copy()
+            img.putalpha(img.getchannel("A").point(lambda value: value * alpha_step // FADE_STEPS))
+        variants[key] = img
+    return key[1:], variants[key]
+
+
+def prepare_animation_layers(image_paths: dict, animation_instructions: dict, canvas_size: tuple) -> dict:
+    """
+    Decode and resize each tagged image once so every frame can reuse the sprite.
+    
+    Returns:
+        Dict mapping tags to {"sprite", "source_size", "instruction"}; images that
+        are missing or fail to load are left out.
+    """
+    layers = {}
+    
+    for tag, image_path in image_paths.items():
+        if not os.path.exists(image_path):
+            continue
+        try:
+            source_size = image_size(image_path)
+            
+            # Get animation instruction for this tag
+            instruction = animation_instructions.get(tag, {"type": "static"})
+            
+            layers[tag] = {
+                "sprite": load_sprite(image_path, animation_target_size(source_size, canvas_size)),
+                "source_size": source_size,
+                "instruction": instruction,
+            }
+        except Exception as e:
+            # Skip problematic images
+            continue
+    
+    return layers
+
 def is_presentation_prompt(prompt: str) -> bool:
     """Check if the prompt is asking for a presentation-style slideshow"""
-    prompt_lower = prompt.lower()
-    presentation_keywords = [
-        "presentation", "slideshow", "shift images", "slide", "show images",
-        "display images", "sequence", "order", "one by one", "turn by turn"
-    ]
-    return any(keyword in prompt_lower for keyword in presentation_keywords)
+    return parse_prompt_spec(prompt).is_presentation
 
 
 def should_add_text_overlay(prompt: str) -> bool:
     """Check if the prompt specifically requests text overlays"""
-    prompt_lower = prompt.lower()
-    text_keywords = [
-        "add text", "with text", "text overlay", "show text", "display text",
-        "tag name", "label", "caption", "title", "white text", "text color"
-    ]
-    return any(keyword in prompt_lower for keyword in text_keywords)
+    return parse_prompt_spec(prompt).wants_text_overlay
 
 
 def extract_canvas_size_from_prompt(prompt: str) -> tuple:
     """Extract custom width and height from prompt"""
-    import re
-    
-    # Look for various dimension patterns
-    patterns = [
-        r'(\d+)\s*x\s*(\d+)',  # 1920x1080, 1920 x 1080
-        r'(\d+)\s*by\s*(\d+)',  # 1920 by 1080
-        r'(\d+)\s*width\s*(\d+)\s*height',  # 1920 width 1080 height
-        r'width\s*(\d+)\s*height\s*(\d+)',  # width 1920 height 1080
-        r'(\d+)\s*wide\s*(\d+)\s*tall',  # 1920 wide 1080 tall
-        r'(\d+)\s*pixels?\s*wide\s*(\d+)\s*pixels?\s*tall',  # 1920 pixels wide 1080 pixels tall
-        r'size\s*(\d+)\s*x\s*(\d+)',  # size 1920x1080
-        r'dimensions?\s*(\d+)\s*x\s*(\d+)',  # dimensions 1920x1080
-    ]
-    
-    for pattern in patterns:
-        match = re.search(pattern, prompt.lower())
-        if match:
-            width = int(match.group(1))
-            height = int(match.group(2))
-            
-            # Validate reasonable dimensions
-            if 100 <= width <= 4000 and 100 <= height <= 4000:
-                return (width, height)
-    
-    # Look for common aspect ratios
-    aspect_ratios = {
-        'square': (1080, 1080),
-        'landscape': (1920, 1080),
-        'portrait': (1080, 1920),
-        'widescreen': (1920, 1080),
-        'instagram': (1080, 1080),
-        'youtube': (1920, 1080),
-        'facebook': (1200, 630),
-        'twitter': (1200, 675),
-    }
-    
-    prompt_lower = prompt.lower()
-    for ratio_name, dimensions in aspect_ratios.items():
-        if ratio_name in prompt_lower:
-            return dimensions
-    
-    # Default size
-    return (1080, 1080)
-
-
-def create_presentation_gif(image_paths: dict, prompt: str, output_path: str, duration=2000):
+    return parse_prompt_spec(prompt).canvas_size
+
+
+def create_presentation_gif(image_paths: dict, prompt: str, output_path: str, duration=2000, progress=None,
+                            output_format=DEFAULT_OUTPUT_FORMAT):
     """
     Create a presentation-style GIF that shows images in sequence with text overlays.
+    
+    progress, if given, is called with (frames_rendered, frame_count) after each slide.
     """
-    import re
-    from PIL import ImageDraw, ImageFont
+    spec = parse_prompt_spec(prompt)
     
-    # Extract timing information from prompt
-    timing_match = re.search(r'(\d+)\s*seconds?', prompt.lower())
-    if timing_match:
-        duration = int(timing_match.group(1)) * 1000  # Convert to milliseconds
+    # Extract timing information from prompt ("3 seconds")
+    if spec.duration_ms:
+        duration = spec.duration_ms
     
     # Extract custom dimensions from prompt
-    canvas_size = extract_canvas_size_from_prompt(prompt)
+    canvas_size = spec.canvas_size
     
     # Extract image order from prompt
-    tag_order = extract_image_order_from_prompt(prompt, list(image_paths.keys()))
+    tag_order = spec.image_order(list(image_paths.keys()))
+    
+    frame_count = len(tag_order) + 1
+    if output_format == "webp":
+        check_webp_size(canvas_size, frame_count)
+    
+    # GIF needs its palette up front: sample the slides' sprites and labels instead of rendering them twice
+    palette = None
+    if output_format == "gif":
+        palette = presentation_palette(image_paths, prompt, tag_order, canvas_size)
     
-    # Create frames for each image
-    frames = []
+    # Stream a frame for each image (plus the closing blank frame) to the writer
+    with open_frame_writer(output_format, output_path, canvas_size, duration, palette) as writer:
+        for slide_idx, frame in presentation_frames(image_paths, prompt, tag_order, canvas_size):
+            writer.add_frame(frame)
+            if progress and slide_idx < len(tag_order):
+                progress(slide_idx + 1, frame_count)
     
+    if progress:
+        progress(frame_count, frame_count)
+    
+    return output_path
+
+
+def presentation_palette(image_paths: dict, prompt: str, tag_order: list, canvas_size: tuple) -> Image.Image:
+    """
+    Palette for a presentation GIF, sampled from what the slides are made of:
+    each slide's sprite and text label over the black background.
+    """
+    spec = parse_prompt_spec(prompt)
+    sprites = []
     for tag in tag_order:
+        if tag in image_paths and os.path.exists(image_paths[tag]):
+            try:
+                source_size = image_size(image_paths[tag])
+                sprites.append(load_sprite(image_paths[tag], presentation_target_size(source_size, canvas_size)))
+            except Exception as e:
+                # Skip problematic images (the slide is skipped too)
+                continue
+            if spec.wants_text_overlay:
+                sprites.append(overlay_label(tag, prompt)[0])
+    
+    if sprites and spec.wants_text_overlay:
+        sprites.append(overlay_label("End", prompt)[0])
+    return build_shared_palette(sprites, background=(0, 0, 0))
+
+
+def presentation_frames(image_paths: dict, prompt: str, tag_order: list, canvas_size: tuple):
+    """Yield (slide index, frame) for each slide that renders, then the closing blank frame"""
+    frames_written = 0
+    with_text = parse_prompt_spec(prompt).wants_text_overlay
+    
+    for slide_idx, tag in enumerate(tag_order):
         if tag in image_paths and os.path.exists(image_paths[tag]):
             try:
                 # Create base canvas
                 canvas = Image.new("RGB", canvas_size, color=(0, 0, 0))  # Black background
                 
-                # Load and resize image
-                img = Image.open(image_paths[tag]).convert("RGBA")
-                img = resize_for_presentation(img, canvas_size)
+                # Load and resize image (shared sprite cache)
+                source_size = image_size(image_paths[tag])
+                img = load_sprite(image_paths[tag], presentation_target_size(source_size, canvas_size))
                 
                 # Center the image
                 x = (canvas_size[0] - img.size[0]) // 2
@@ -183,69 +308,38 @@ def create_presentation_gif(image_paths: dict, prompt: str, output_path: str, du
                     canvas.paste(img, (x, y))
                 
                 # Add text overlay only if requested in prompt
-                if should_add_text_overlay(prompt):
+                if with_text:
                     add_text_overlay_to_frame(canvas, tag, canvas_size, prompt)
                 
-                frames.append(canvas)
-                
             except Exception as e:
                 # Skip problematic images
                 continue
+            
+            yield slide_idx, canvas
+            frames_written += 1
     
     # Add a blank frame at the end for better presentation
-    if frames:
+    if frames_written:
         blank_frame = Image.new("RGB", canvas_size, color=(0, 0, 0))
-        if should_add_text_overlay(prompt):
+        if with_text:
             add_text_overlay_to_frame(blank_frame, "End", canvas_size, prompt)
-        frames.append(blank_frame)
-    
-    # Save as animated GIF
-    if frames:
-        frames[0].save(
-            output_path,
-            save_all=True,
-            append_images=frames[1:],
-            optimize=False,
-            duration=duration,
-            loop=0,
-        )
-        # Presentation GIF created successfully
-    
-    return output_path
+        yield len(tag_order), blank_frame
 
 
 def extract_image_order_from_prompt(prompt: str, available_tags: list) -> list:
     """Extract the order of images from the prompt"""
-    import re
-    
-    # Look for explicit order in prompt
-    order_match = re.search(r'order\s+@(\w+)(?:\s*,\s*@(\w+))*(?:\s*and\s*@(\w+))?', prompt.lower())
-    if order_match:
-        order = [order_match.group(1)]
-        if order_match.group(2):
-            order.append(order_match.group(2))
-        if order_match.group(3):
-            order.append(order_match.group(3))
-        return [tag for tag in order if tag in available_tags]
-    
-    # Look for @tag references in sequence
-    tag_sequence = re.findall(r'@(\w+)', prompt)
-    ordered_tags = []
-    for tag in tag_sequence:
-        if tag in available_tags and tag not in ordered_tags:
-            ordered_tags.append(tag)
-    
-    # If no specific order found, use available tags in original order
-    if not ordered_tags:
-        ordered_tags = available_tags
-    
-    return ordered_tags
+    return parse_prompt_spec(prompt).image_order(available_tags)
 
 
 def resize_for_presentation(img: Image.Image, canvas_size: tuple) -> Image.Image:
     """Resize image for presentation while maintaining aspect ratio"""
+    return img.resize(presentation_target_size(img.size, canvas_size), Image.Resampling.LANCZOS)
+
+
+def presentation_target_size(img_size: tuple, canvas_size: tuple) -> tuple:
+    """Calculate the presentation size for an image while maintaining aspect ratio"""
     canvas_width, canvas_height = canvas_size
-    img_width, img_height = img.size
+    img_width, img_height = img_size
     
     # Calculate scaling to fit within canvas with some padding
     max_width = canvas_width - 100  # 50px padding on each side
@@ -259,210 +353,70 @@ def resize_for_presentation(img: Image.Image, canvas_size: tuple) -> Image.Image
     new_width = int(img_width * scale)
     new_height = int(img_height * scale)
     
-    return img.resize((new_width, new_height), Image.Resampling.LANCZOS)
+    return (new_width, new_height)
 
 
 def extract_text_content_from_prompt(prompt: str) -> str:
-    """Extract custom text content from prompt"""
-    import re
-    
-    # Look for quoted text
-    quoted_pattern = r'["\']([^"\']+)["\']'
-    match = re.search(quoted_pattern, prompt)
-    if match:
-        return match.group(1)
-    
-    # Look for "text: <content>" pattern
-    text_pattern = r'text[:\s]+([^,\.]+)'
-    match = re.search(text_pattern, prompt.lower())
-    if match:
-        # Get the original case text
-        start_pos = match.start(1)
-        text_content = prompt[start_pos:match.end(1)].strip()
-        return text_content
-    
-    # Return None if no specific text found
-    return None
+    """Extract custom text content from prompt (None if no specific text found)"""
+    return parse_prompt_spec(prompt).custom_text
 
 
 def add_text_overlay_to_frame(canvas: Image.Image, text: str, canvas_size: tuple, prompt: str = ""):
     """Add text overlay to a frame"""
-    from PIL import ImageDraw, ImageFont
-    
-    # Check if we should use custom text from prompt
-    custom_text = extract_text_content_from_prompt(prompt) if prompt else None
-    if custom_text:
-        text = custom_text
-    
-    # Detect language
-    language = "english"
-    if prompt:
-        prompt_lower = prompt.lower()
-        if "hindi" in prompt_lower or "हिंदी" in prompt:
-            language = "hindi"
-    
-    draw = ImageDraw.Draw(canvas)
-    
-    # Try to use a larger font based on language
-    try:
-        if language == "hindi":
-            # Try to load a font that supports Devanagari script
-            try:
-                font = ImageFont.truetype("NotoSansDevanagari-Regular.ttf", 48)
-            except:
-                try:
-                    font = ImageFont.truetype("/usr/share/fonts/truetype/noto/NotoSansDevanagari-Regular.ttf", 48)
-                except:
-                    font = ImageFont.load_default()
-        else:
-            # Try to load a system font
-            try:
-                font = ImageFont.truetype("arial.ttf", 48)
-            except:
-                try:
-                    font = ImageFont.truetype("/System/Library/Fonts/Arial.ttf", 48)
-                except:
-                    try:
-                        font = ImageFont.truetype("/usr/share/fonts/truetype/dejavu/DejaVuSans-Bold.ttf", 48)
-                    except:
-                        font = ImageFont.load_default()
-    except:
-        font = ImageFont.load_default()
+    label = overlay_label(text, prompt)
+    text_width, text_height = label[2]
     
     # Calculate text position (bottom center)
-    text_bbox = draw.textbbox((0, 0), text, font=font)
-    text_width = text_bbox[2] - text_bbox[0]
-    text_height = text_bbox[3] - text_bbox[1]
-    
     x = (canvas_size[0] - text_width) // 2
     y = canvas_size[1] - text_height - 30  # 30px from bottom
     
-    # Extract text color from prompt
-    text_color = (255, 255, 255)  # Default white for GIFs
-    if prompt:
-        prompt_lower = prompt.lower()
-        if "black text" in prompt_lower:
-            text_color = (0, 0, 0)
-        elif "red text" in prompt_lower:
-            text_color = (255, 0, 0)
-        elif "blue text" in prompt_lower:
-            text_color = (0, 0, 255)
-    
-    # Add text with outline for better visibility
-    # Draw outline
+    paste_label(canvas, label, (x, y))
+
+
+def overlay_label(text: str, prompt: str = "") -> tuple:
+    """The text_label an overlay of text draws for this prompt (custom text, colour and script applied)"""
+    spec = parse_prompt_spec(prompt)
+    
+    # Check if we should use custom text from prompt
+    if spec.custom_text:
+        text = spec.custom_text
+    
+    # Extract text color from prompt (default white for GIFs; "white text" is the default anyway)
+    text_color = (255, 255, 255)
+    colors = [color for color in spec.text_colors if color != "white"]
+    if colors:
+        text_color = COLOR_MAP[colors[0]]
     outline_color = (0, 0, 0) if text_color == (255, 255, 255) else (255, 255, 255)
-    for adj_x in [-2, -1, 0, 1, 2]:
-        for adj_y in [-2, -1, 0, 1, 2]:
-            if adj_x != 0 or adj_y != 0:
-                draw.text((x + adj_x, y + adj_y), text, fill=outline_color, font=font)
     
-    # Draw main text
-    draw.text((x, y), text, fill=text_color, font=font)
+    # Outlined text is rendered once per (text, font, colours) and reused on every frame
+    return text_label(text, script_for_language(spec.language), DEFAULT_FONT_SIZE, text_color, outline_color)
 
 
 def parse_animation_instructions(prompt: str) -> dict:
     """Parse animation instructions from prompt"""
-    instructions = {}
-    prompt_lower = prompt.lower()
-    
-    # Look for movement keywords
-    for tag in re.findall(r'@(\w+)', prompt):
-        instructions[tag] = {"type": "static"}  # Default
-        
-        if "moving" in prompt_lower or "move" in prompt_lower:
-            if "left to right" in prompt_lower:
-                instructions[tag] = {"type": "slide_horizontal", "direction": "left_to_right"}
-            elif "right to left" in prompt_lower:
-                instructions[tag] = {"type": "slide_horizontal", "direction": "right_to_left"}
-            elif "up to down" in prompt_lower or "top to bottom" in prompt_lower:
-                instructions[tag] = {"type": "slide_vertical", "direction": "top_to_bottom"}
-            elif "down to up" in prompt_lower or "bottom to top" in prompt_lower:
-                instructions[tag] = {"type": "slide_vertical", "direction": "bottom_to_top"}
-            elif "rotate" in prompt_lower or "spinning" in prompt_lower:
-                instructions[tag] = {"type": "rotate"}
-            elif "bounce" in prompt_lower:
-                instructions[tag] = {"type": "bounce"}
-            elif "fade" in prompt_lower:
-                instructions[tag] = {"type": "fade"}
-        
-        if "stable" in prompt_lower or "static" in prompt_lower:
-            instructions[tag] = {"type": "static"}
-    
-    return instructions
+    return parse_prompt_spec(prompt).animation_instructions()
 
 
 def calculate_animated_position(img_size: tuple, instruction: dict, canvas_size: tuple, 
                               frame_idx: int, total_frames: int) -> tuple:
     """Calculate position for a specific frame based on animation type"""
-    img_width, img_height = img_size
-    canvas_width, canvas_height = canvas_size
-    
-    # Progress from 0 to 1
-    progress = frame_idx / (total_frames - 1) if total_frames > 1 else 0
-    
-    if instruction["type"] == "static":
-        # Center the image
-        x = (canvas_width - img_width) // 2
-        y = (canvas_height - img_height) // 2
-        return (x, y)
-    
-    elif instruction["type"] == "slide_horizontal":
-        direction = instruction.get("direction", "left_to_right")
-        if direction == "left_to_right":
-            x = int(progress * (canvas_width - img_width))
-            y = (canvas_height - img_height) // 2
-        else:  # right_to_left
-            x = int((1 - progress) * (canvas_width - img_width))
-            y = (canvas_height - img_height) // 2
-        return (x, y)
-    
-    elif instruction["type"] == "slide_vertical":
-        direction = instruction.get("direction", "top_to_bottom")
-        if direction == "top_to_bottom":
-            x = (canvas_width - img_width) // 2
-            y = int(progress * (canvas_height - img_height))
-        else:  # bottom_to_top
-            x = (canvas_width - img_width) // 2
-            y = int((1 - progress) * (canvas_height - img_height))
-        return (x, y)
-    
-    elif instruction["type"] == "rotate":
-        # Center position with rotation effect (simplified as position change)
-        center_x = canvas_width // 2
-        center_y = canvas_height // 2
-        radius = min(canvas_width, canvas_height) // 4
-        
-        angle = progress * 2 * math.pi
-        x = center_x + radius * math.cos(angle) - img_width // 2
-        y = center_y + radius * math.sin(angle) - img_height // 2
-        return (x, y)
-    
-    elif instruction["type"] == "bounce":
-        # Bouncing effect
-        bounce_height = canvas_height // 4
-        bounce_progress = abs(math.sin(progress * math.pi * 2))
-        
-        x = (canvas_width - img_width) // 2
-        y = canvas_height - img_height - int(bounce_height * bounce_progress)
-        return (x, y)
-    
-    elif instruction["type"] == "fade":
-        # Position stays same, but we could modify alpha (handled elsewhere)
-        x = (canvas_width - img_width) // 2
-        y = (canvas_height - img_height) // 2
-        return (x, y)
-    
-    else:
-        # Default to center
-        x = (canvas_width - img_width) // 2
-        y = (canvas_height - img_height) // 2
-        return (x, y)
+    track = animation_track(img_size, instruction, canvas_size, total_frames)
+    return (int(track[frame_idx, X]), int(track[frame_idx, Y]))
 
 
 def resize_for_animation(img: Image.Image, instruction: dict, canvas_size: tuple) -> Image.Image:
     """Resize image for animation"""
+    new_size = animation_target_size(img.size, canvas_size)
+    if new_size != img.size:
+        return img.resize(new_size, Image.Resampling.LANCZOS)
+    
+    return img
+
+
+def animation_target_size(img_size: tuple, canvas_size: tuple) -> tuple:
+    """Calculate the sprite size used for animation"""
     canvas_width, canvas_height = canvas_size
-    img_width, img_height = img.size
+    img_width, img_height = img_size
     
     # For most animations, keep image at reasonable size
     max_size = min(canvas_width, canvas_height) // 3
@@ -471,6 +425,6 @@ def resize_for_animation(img: Image.Image, instruction: dict, canvas_size: tuple
         ratio = max_size / max(img_width, img_height)
         new_width = int(img_width * ratio)
         new_height = int(img_height * ratio)
-        return img.resize((new_width, new_height), Image.Resampling.LANCZOS)
+        return (new_width, new_height)
     
-    return img
+    return img_size
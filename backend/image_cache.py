@@ -0,0 +1,203 @@
+from PIL import Image, ImageOps
+from collections import OrderedDict
+import hashlib
+import os
+import re
+import threading
+
+try:
+    from .image_pyramid import best_level_path
+except ImportError:
+    from image_pyramid import best_level_path
+
+# Memory budget for decoded sprites (bytes), shared by every request in this process.
+# With the process render pool each of the RENDER_WORKERS workers has a cache of this size.
+SPRITE_CACHE_BYTES = int(os.environ.get("SPRITE_CACHE_BYTES", 256 * 1024 * 1024))
+
+# How many file digests to remember before re-hashing
+DIGEST_MEMO_SIZE = 4096
+
+_digest_memo = OrderedDict()
+_digest_lock = threading.Lock()
+
+# Blob store files are "<sha256><ext>" in a directory named after the first two hex digits
+BLOB_NAME_PATTERN = re.compile(r'^([0-9a-f]{64})(\.\w+)?$')
+
+
+def blob_digest(path: str):
+    """SHA-256 named by a content-addressed blob path, or None for any other file"""
+    match = BLOB_NAME_PATTERN.match(os.path.basename(path))
+    if match and os.path.basename(os.path.dirname(path)) == match.group(1)[:2]:
+        return match.group(1)
+    return None
+
+
+def file_digest(path: str) -> str:
+    """
+    Return the SHA-256 of a file's content.
+
+    Blob store files carry their digest in their name, so in any process
+    (render workers included) they are never read for it. Other files are
+    remembered per (path, mtime, size) so an unchanged one is only read once.
+    """
+    digest = blob_digest(path)
+    if digest is not None:
+        return digest
+
+    stat = os.stat(path)
+    stamp = (stat.st_mtime_ns, stat.st_size)
+
+    with _digest_lock:
+        memo = _digest_memo.get(path)
+        if memo and memo[0] == stamp:
+            _digest_memo.move_to_end(path)
+            return memo[1]
+
+    sha = hashlib.sha256()
+    with open(path, "rb") as f:
+        for chunk in iter(lambda: f.read(1024 * 1024), b""):
+            sha.update(chunk)
+    digest = sha.hexdigest()
+
+    with _digest_lock:
+        _digest_memo[path] = (stamp, digest)
+        _digest_memo.move_to_end(path)
+        while len(_digest_memo) > DIGEST_MEMO_SIZE:
+            _digest_memo.popitem(last=False)
+
+    return digest
+
+
+class SpriteCache:
+    """
+    LRU cache of decoded images keyed by (content hash, size, resample, mode).
+
+    Entries are evicted least-recently-used first once the decoded pixel data
+    exceeds max_bytes. Cached images are shared, so callers must not modify them.
+    """
+
+    def __init__(self, max_bytes: int = SPRITE_CACHE_BYTES):
+        self.max_bytes = max_bytes
+        self.current_bytes = 0
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key: tuple):
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                self.misses += 1
+                return None
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return entry[0]
+
+    def put(self, key: tuple, img: Image.Image):
+        nbytes = image_nbytes(img)
+        if nbytes > self.max_bytes:
+            # Never let one huge image flush the whole cache
+            return
+
+        with self._lock:
+            if key in self._entries:
+                self.current_bytes -= self._entries.pop(key)[1]
+            self._entries[key] = (img, nbytes)
+            self.current_bytes += nbytes
+
+            while self.current_bytes > self.max_bytes:
+                _, (_, evicted_bytes) = self._entries.popitem(last=False)
+                self.current_bytes -= evicted_bytes
+                self.evictions += 1
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+            self.current_bytes = 0
+
+    def stats(self) -> dict:
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                "entries": len(self._entries),
+                "bytes": self.current_bytes,
+                "max_bytes": self.max_bytes,
+                "hits": self.hits,
+                "misses": self.misses,
+                "evictions": self.evictions,
+                "hit_rate": self.hits / lookups if lookups else 0.0,
+            }
+
+
+def image_nbytes(img: Image.Image) -> int:
+    """Approximate memory used by an image's pixel data"""
+    return img.size[0] * img.size[1] * len(img.getbands())
+
+
+# Global instance
+sprite_cache = SpriteCache()
+
+
+# Resizes box-reduce first when the source is at least this many times larger
+RESIZE_REDUCING_GAP = 3.0
+
+# EXIF orientations that swap width and height
+TRANSPOSED_ORIENTATIONS = (5, 6, 7, 8)
+
+
+def image_size(path: str) -> tuple:
+    """Read EXIF-oriented image dimensions from the file header without decoding pixels"""
+    with Image.open(path) as img:
+        width, height = img.size
+        if img.getexif().get(0x0112) in TRANSPOSED_ORIENTATIONS:
+            return (height, width)
+        return (width, height)
+
+
+def decode_for_target(path: str, target_size: tuple, mode: str = "RGBA") -> Image.Image:
+    """
+    Decode an image (EXIF-oriented, converted to mode) that will be resized to target_size.
+
+    JPEGs are decoded straight at 1/2, 1/4 or 1/8 scale via Image.draft when
+    that still covers the target, which cuts decode time and peak memory for
+    large camera images. Other formats decode at full size.
+    """
+    with Image.open(path) as source:
+        # draft works on the stored (un-rotated) dimensions
+        if source.getexif().get(0x0112) in TRANSPOSED_ORIENTATIONS:
+            draft_size = (target_size[1], target_size[0])
+        else:
+            draft_size = target_size
+        source.draft(None, (max(1, draft_size[0]), max(1, draft_size[1])))
+        return ImageOps.exif_transpose(source).convert(mode)
+
+
+def load_sprite(path: str, target_size: tuple = None, resample=Image.Resampling.LANCZOS, mode: str = "RGBA") -> Image.Image:
+    """
+    Load an image converted to mode and resized to target_size, using the shared cache.
+
+    Args:
+        path: Image file path
+        target_size: (width, height) to resize to; None keeps the source size
+        resample: Pillow resampling filter used for the resize
+        mode: Pillow mode to convert to
+    """
+    digest = file_digest(path)
+    source_size = image_size(path)
+    target_size = tuple(target_size or source_size)
+
+    key = (digest, target_size, int(resample), mode)
+    img = sprite_cache.get(key)
+    if img is not None:
+        return img
+
+    # Start from the smallest pre-built pyramid level that still covers the target
+    img = decode_for_target(best_level_path(path, source_size, target_size), target_size, mode)
+    if img.size != target_size:
+        # reducing_gap lets Pillow box-reduce large sources before the final filter pass
+        img = img.resize(target_size, resample, reducing_gap=RESIZE_REDUCING_GAP)
+
+    sprite_cache.put(key, img)
+    return img
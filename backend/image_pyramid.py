@@ -0,0 +1,78 @@
+from PIL import Image, ImageOps
+import os
+import shutil
+import uuid
+
+# Long-edge sizes of the downscaled variants kept next to each upload
+PYRAMID_LEVELS = (2048, 1024, 512)
+
+# Set BUILD_PYRAMIDS=0 to skip building levels at upload time
+BUILD_PYRAMIDS = os.environ.get("BUILD_PYRAMIDS", "1") == "1"
+
+
+def pyramid_dir(path: str) -> str:
+    """Folder holding the pyramid levels of the image at path"""
+    return f"{path}.pyr"
+
+
+def level_path(path: str, level: int) -> str:
+    return os.path.join(pyramid_dir(path), f"{level}.png")
+
+
+def build_pyramid(path: str) -> list:
+    """
+    Decode an image once and store its normalized pyramid levels.
+
+    The image is EXIF-oriented and converted to RGBA, then each level in
+    PYRAMID_LEVELS smaller than the image is written as a PNG. Levels are
+    written to a temporary name first, so readers never see partial files.
+
+    Returns:
+        Paths of the levels written (existing levels are skipped)
+    """
+    written = []
+    levels = [level for level in PYRAMID_LEVELS if not os.path.exists(level_path(path, level))]
+    if not levels:
+        return written
+
+    with Image.open(path) as source:
+        img = ImageOps.exif_transpose(source).convert("RGBA")
+
+    os.makedirs(pyramid_dir(path), exist_ok=True)
+    # Largest first, so each level is reduced from the previous one
+    for level in sorted(levels, reverse=True):
+        if max(img.size) <= level:
+            continue
+        ratio = level / max(img.size)
+        img = img.resize((max(1, round(img.size[0] * ratio)), max(1, round(img.size[1] * ratio))), Image.Resampling.LANCZOS)
+
+        destination = level_path(path, level)
+        partial_path = f"{destination}.{uuid.uuid4().hex}.part"
+        img.save(partial_path, "PNG", compress_level=1)
+        os.replace(partial_path, destination)
+        written.append(destination)
+
+    return written
+
+
+def best_level_path(path: str, source_size: tuple, target_size: tuple) -> str:
+    """
+    Pick the smallest stored level that still covers target_size in both dimensions.
+
+    Falls back to the original file when no pyramid level is large enough.
+    """
+    source_edge = max(source_size)
+    for level in sorted(PYRAMID_LEVELS):
+        if level >= source_edge:
+            break
+        ratio = level / source_edge
+        if source_size[0] * ratio < target_size[0] or source_size[1] * ratio < target_size[1]:
+            continue
+        candidate = level_path(path, level)
+        if os.path.exists(candidate):
+            return candidate
+    return path
+
+
+def remove_pyramid(path: str):
+    shutil.rmtree(pyramid_dir(path), ignore_errors=True)
@@ -0,0 +1,244 @@
+from datetime import datetime
+from typing import Dict, Optional
+import asyncio
+import multiprocessing
+import os
+import uuid
+
+try:
+    from .executors import RENDER_EXECUTOR
+except ImportError:
+    from executors import RENDER_EXECUTOR
+
+# Job queue configuration (environment overridable)
+JOB_QUEUE_SIZE = int(os.environ.get("JOB_QUEUE_SIZE", 32))
+JOB_WORKERS = int(os.environ.get("JOB_WORKERS", 4))
+# Finished jobs are forgotten after this many seconds
+JOB_RETENTION = int(os.environ.get("JOB_RETENTION", 3600))
+
+FINISHED_STATUSES = ("succeeded", "failed", "cancelled")
+
+
+class QueueFull(Exception):
+    """Raised when the job queue cannot take more work"""
+
+
+class JobElsewhere(Exception):
+    """Raised when a job id was issued by another server process"""
+
+
+class FrameProgress:
+    """
+    Picklable progress callback handed to renderers.
+
+    Renderers call it with (frames_rendered, frame_count); the numbers land on a
+    board that the API process can read, even when rendering runs in a worker process.
+    """
+
+    def __init__(self, board, job_id: str):
+        self.board = board
+        self.job_id = job_id
+
+    def __call__(self, frames_rendered: int, frame_count: int):
+        self.board[self.job_id] = (frames_rendered, frame_count)
+
+
+def set_job_stage(job: Optional[Dict], stage: str):
+    """Record the current stage of a job (no-op for synchronous requests)"""
+    if job is not None:
+        job["stage"] = stage
+        job["updated_at"] = datetime.now()
+
+
+def set_job_plan(job: Optional[Dict], plan: Dict):
+    """Record the layout plan read so far from a streaming LLM answer (no-op for synchronous requests)"""
+    if job is not None:
+        job["plan"] = plan
+        job["updated_at"] = datetime.now()
+
+
+class JobManager:
+    """
+    Bounded queue of background generation jobs served by a fixed set of workers.
+
+    Jobs and their status live in this process only, even with the shared
+    SQLite session store: async jobs need a single uvicorn worker, or a
+    proxy that sends every /jobs/{job_id} request to the worker that issued
+    the id. Job ids start with this process's worker_id, so a poll that
+    reaches another worker raises JobElsewhere instead of looking unknown.
+    """
+
+    def __init__(self, max_queue: int = JOB_QUEUE_SIZE, workers: int = JOB_WORKERS):
+        self.max_queue = max_queue
+        self.worker_count = workers
+        self.worker_id = uuid.uuid4().hex[:8]
+        self.jobs: Dict[str, Dict] = {}
+        self._queue = None
+        self._workers = []
+        self._manager = None
+        self._progress_board = {}
+        self._stopping = False
+
+    async def start(self):
+        """Create the queue and worker tasks on the running event loop"""
+        if self._queue is not None:
+            return
+        if RENDER_EXECUTOR != "thread":
+            # Render workers are separate processes, so progress goes through a manager
+            self._manager = multiprocessing.Manager()
+            self._progress_board = self._manager.dict()
+        self._queue = asyncio.Queue(maxsize=self.max_queue)
+        self._workers = [asyncio.create_task(self._worker()) for _ in range(self.worker_count)]
+
+    async def stop(self):
+        """Cancel workers and running jobs"""
+        self._stopping = True
+        for worker in self._workers:
+            worker.cancel()
+        await asyncio.gather(*self._workers, return_exceptions=True)
+        self._workers = []
+        self._queue = None
+        self._stopping = False
+        if self._manager is not None:
+            self._manager.shutdown()
+            self._manager = None
+            self._progress_board = {}
+
+    def submit(self, session_id: str, kind: str, run) -> Dict:
+        """
+        Queue a job and return its record right away.
+
+        Args:
+            session_id: Session the job belongs to
+            kind: Short job type, e.g. "generate" or "refine"
+            run: Async callable taking the job record and returning the result dict
+        """
+        if self._queue is None:
+            raise RuntimeError("Job manager is not running")
+
+        self.purge_finished()
+
+        job_id = f"{self.worker_id}-{uuid.uuid4()}"
+        job = {
+            "job_id": job_id,
+            "session_id": session_id,
+            "kind": kind,
+            "status": "queued",
+            "stage": "queued",
+            "plan": None,
+            "result": None,
+            "error": None,
+            "created_at": datetime.now(),
+            "updated_at": datetime.now(),
+        }
+
+        try:
+            self._queue.put_nowait((job, run))
+        except asyncio.QueueFull:
+            raise QueueFull(f"Job queue is full ({self.max_queue} jobs waiting)")
+
+        self.jobs[job_id] = job
+        return job
+
+    def get(self, job_id: str) -> Optional[Dict]:
+        """
+        Job record, or None when it is unknown or was forgotten.
+
+        Raises:
+            JobElsewhere: The id was issued by another server process
+        """
+        job = self.jobs.get(job_id)
+        if job is None and not job_id.startswith(f"{self.worker_id}-"):
+            raise JobElsewhere(f"Job {job_id} was not queued by this server worker")
+        return job
+
+    def frame_progress(self, job: Optional[Dict]) -> Optional[FrameProgress]:
+        """Return a progress callback for renderers, or None for synchronous requests"""
+        if job is None:
+            return None
+        return FrameProgress(self._progress_board, job["job_id"])
+
+    def describe(self, job: Dict) -> Dict:
+        """Public view of a job, including frame progress"""
+        progress = self._progress_board.get(job["job_id"])
+        return {
+            "job_id": job["job_id"],
+            "session_id": job["session_id"],
+            "kind": job["kind"],
+            "status": job["status"],
+            "stage": job["stage"],
+            "plan": job["plan"],
+            "progress": {
+                "frames_rendered": progress[0] if progress else 0,
+                "frame_count": progress[1] if progress else None,
+            },
+            "result": job["result"],
+            "error": job["error"],
+            "created_at": job["created_at"],
+            "updated_at": job["updated_at"],
+        }
+
+    def cancel(self, job_id: str) -> bool:
+        """Cancel a queued or running job; returns False if it already finished"""
+        job = self.jobs.get(job_id)
+        if not job or job["status"] in FINISHED_STATUSES:
+            return False
+
+        if job["status"] == "queued":
+            # The worker skips it when it reaches the front of the queue
+            self._finish(job, "cancelled")
+        else:
+            job["task"].cancel()
+        return True
+
+    def purge_finished(self):
+        """Forget finished jobs older than JOB_RETENTION"""
+        current_time = datetime.now()
+        to_remove = []
+        for job_id, job in self.jobs.items():
+            if job["status"] in FINISHED_STATUSES and (current_time - job["updated_at"]).total_seconds() > JOB_RETENTION:
+                to_remove.append(job_id)
+
+        for job_id in to_remove:
+            del self.jobs[job_id]
+            self._progress_board.pop(job_id, None)
+
+    def _finish(self, job: Dict, status: str, result: Dict = None, error: str = None):
+        job["status"] = status
+        job["stage"] = "done" if status == "succeeded" else status
+        job["result"] = result
+        job["error"] = error
+        job["updated_at"] = datetime.now()
+        job.pop("task", None)
+
+    async def _worker(self):
+        while True:
+            job, run = await self._queue.get()
+            try:
+                if job["status"] == "cancelled":
+                    continue
+
+                job["status"] = "running"
+                set_job_stage(job, "starting")
+                job["task"] = asyncio.ensure_future(run(job))
+                try:
+                    result = await job["task"]
+                except asyncio.CancelledError:
+                    # Cancelling the worker cancels the awaited job first, so only
+                    # the flag tells stop() apart from DELETE /jobs/{id}
+                    if self._stopping:
+                        # The worker itself is being stopped, take the job down with it
+                        job["task"].cancel()
+                    self._finish(job, "cancelled")
+                    if self._stopping:
+                        raise
+                except Exception as e:
+                    self._finish(job, "failed", error=str(getattr(e, "detail", e)))
+                else:
+                    self._finish(job, "succeeded", result=result)
+            finally:
+                self._queue.task_done()
+
+
+# Global instance
+job_manager = JobManager()
@@ -0,0 +1,153 @@
+import re
+
+try:
+    from .prompt_spec import COLOR_MAP, find_background_color, find_canvas_size, parse_prompt_spec
+except ImportError:
+    from prompt_spec import COLOR_MAP, find_background_color, find_canvas_size, parse_prompt_spec
+
+# Plan lines the expansion templates ask the LLM to start its answer with, e.g.
+#   CANVAS: 1200x628
+#   BACKGROUND: navy blue
+#   @logo: top
+PLAN_LINE_PATTERN = re.compile(r'^\s*(canvas|background|@\w+)\s*:\s*(.*?)\s*$', re.MULTILINE | re.IGNORECASE)
+PLAN_SIZE_PATTERN = re.compile(r'^(\d+)\s*[x×]\s*(\d+)$')
+POSITION_WORD_PATTERN = re.compile(r'\b(background|foreground|front|centre|center|middle|left|right|top|bottom)\b')
+
+# Words the LLM may use for each position type understood by the composer
+POSITION_WORDS = {
+    "background": "background",
+    "foreground": "front",
+    "front": "front",
+    "centre": "center",
+    "center": "center",
+    "middle": "center",
+    "left": "left",
+    "right": "right",
+    "top": "top",
+    "bottom": "bottom",
+}
+
+# Appended to the prompt expansion templates so the answer opens with a plan
+PLAN_INSTRUCTIONS = """
+Begin your answer with these layout lines, one per line, before anything else:
+CANVAS: <width>x<height>
+BACKGROUND: <colour name or #rrggbb>
+@<tag>: <one of background, front, center, left, right, top, bottom> (one line per @tag)
+"""
+
+
+def strip_layout_plan(text: str) -> str:
+    """LLM answer without its plan lines, for use as an image prompt"""
+    return PLAN_LINE_PATTERN.sub("", text).strip() if text else text
+
+
+class LayoutPlanParser:
+    """
+    Pull a layout plan (canvas size, background colour, one position per tag)
+    out of LLM text as it streams in.
+
+    Only the plan lines requested by PLAN_INSTRUCTIONS are read ("CANVAS:",
+    "BACKGROUND:" and "@tag:"); descriptive prose never becomes layout.
+    Whatever the user's prompt states explicitly is taken from it and never
+    overridden; the LLM only fills in the rest. The plan is sufficient once
+    every field is known, which is usually well before the completion ends.
+    """
+
+    def __init__(self, prompt: str, tags: list):
+        prompt_lower = prompt.lower()
+        spec = parse_prompt_spec(prompt)
+        self.tags = list(tags)
+        self.canvas_size = find_canvas_size(prompt_lower)
+        self.background_color = find_background_color(prompt_lower)
+        self.positions = {tag: position for tag, position in spec.positions if tag in self.tags}
+        self._explicit = (self.canvas_size, self.background_color, dict(self.positions))
+        self._defaults = spec
+        self._pending = ""
+        self.characters = 0
+
+    @property
+    def sufficient(self) -> bool:
+        return (
+            self.canvas_size is not None
+            and self.background_color is not None
+            and all(tag in self.positions for tag in self.tags)
+        )
+
+    def feed(self, text: str) -> bool:
+        """Add streamed text; True when the plan changed"""
+        self.characters += len(text)
+        self._pending += text
+        # Only finished lines are parsed, so "CANVAS: 19" never reads as a size
+        boundary = self._pending.rfind("\n")
+        if boundary < 0:
+            return False
+
+        finished, self._pending = self._pending[:boundary + 1], self._pending[boundary + 1:]
+        return self._parse(finished)
+
+    def finish(self) -> bool:
+        """Parse whatever is left once the stream has ended"""
+        finished, self._pending = self._pending, ""
+        return self._parse(finished)
+
+    def _parse(self, text: str) -> bool:
+        before = (self.canvas_size, self.background_color, len(self.positions))
+        wanted = {tag.lower(): tag for tag in self.tags}
+        for match in PLAN_LINE_PATTERN.finditer(text.lower()):
+            key, value = match.group(1), match.group(2)
+            if key == "canvas":
+                if self.canvas_size is None:
+                    self.canvas_size = _plan_size(value)
+            elif key == "background":
+                if self.background_color is None:
+                    self.background_color = _plan_color(value)
+            elif key[1:] in wanted and wanted[key[1:]] not in self.positions:
+                word = POSITION_WORD_PATTERN.search(value)
+                if word:
+                    self.positions[wanted[key[1:]]] = POSITION_WORDS[word.group(1)]
+        return (self.canvas_size, self.background_color, len(self.positions)) != before
+
+    def layout(self):
+        """
+        Layout for compose_image_with_tags, or None while the LLM has added
+        nothing to what the prompt already says (so plain renders keep their
+        cache keys).
+        """
+        if (self.canvas_size, self.background_color, self.positions) == self._explicit:
+            return None
+        return {
+            "canvas_size": list(self.canvas_size or self._defaults.canvas_size),
+            "background_color": list(self.background_color or self._defaults.background_color),
+            "positions": dict(self.positions),
+        }
+
+    def describe(self) -> dict:
+        """JSON-friendly view of the plan so far, for job status"""
+        return {
+            "canvas_size": list(self.canvas_size) if self.canvas_size else None,
+            "background_color": list(self.background_color) if self.background_color else None,
+            "positions": dict(self.positions),
+            "sufficient": self.sufficient,
+            "characters_read": self.characters,
+        }
+
+
+def _plan_size(value: str):
+    """Canvas size of a "CANVAS:" line such as "1200x628", or None"""
+    match = PLAN_SIZE_PATTERN.match(value)
+    if match:
+        width, height = int(match.group(1)), int(match.group(2))
+        if 100 <= width <= 4000 and 100 <= height <= 4000:
+            return (width, height)
+    return None
+
+
+def _plan_color(value: str):
+    """Colour of a "BACKGROUND:" line (a colour name, rgb() or #rrggbb), or None"""
+    value = value.rstrip(".")
+    name = value.replace(" ", "")
+    if name in COLOR_MAP:
+        return COLOR_MAP[name]
+    if value.startswith(("rgb", "#")):
+        return find_background_color(value)
+    return None
@@ -0,0 +1,162 @@
+from collections import OrderedDict
+import hashlib
+import json
+import os
+import re
+import threading
+import time
+
+# LLM response cache settings (environment overridable)
+LLM_CACHE_SIZE = int(os.environ.get("LLM_CACHE_SIZE", 512))
+LLM_CACHE_TTL = float(os.environ.get("LLM_CACHE_TTL", 24 * 60 * 60))  # seconds
+LLM_CACHE_PATH = os.environ.get("LLM_CACHE_PATH", "")  # JSON file; empty keeps the cache in memory only
+LLM_CACHE_FLUSH_INTERVAL = float(os.environ.get("LLM_CACHE_FLUSH_INTERVAL", 5))  # seconds a change waits to be written
+
+WHITESPACE_PATTERN = re.compile(r'\s+')
+# Runs of tags such as "@b @a", "@b, @a" or "@b and @a"
+TAG_RUN_PATTERN = re.compile(r'@\w+(?:(?:\s*,\s*|\s+and\s+|\s+)@\w+)+')
+TAG_PATTERN = re.compile(r'@\w+')
+
+
+def normalize_prompt(prompt: str) -> str:
+    """
+    Fold a prompt to the form used in cache keys.
+
+    Case and whitespace are ignored, and runs of tags are listed in sorted
+    order, so "@b and @a  on Blue" and "@a, @b on blue" share a key. Tags in
+    different parts of the sentence keep their places.
+    """
+    folded = WHITESPACE_PATTERN.sub(" ", prompt.casefold()).strip()
+    return TAG_RUN_PATTERN.sub(lambda match: ", ".join(sorted(TAG_PATTERN.findall(match.group(0)))), folded)
+
+
+def response_key(model: str, template: str, prompt: str, tags) -> str:
+    """Cache key of one LLM call: model, prompt template, normalized prompt and tag set"""
+    payload = [model, template, normalize_prompt(prompt), sorted(set(tags))]
+    return hashlib.sha256(json.dumps(payload).encode()).hexdigest()
+
+
+class ResponseCache:
+    """
+    LRU cache of LLM responses with a time-to-live.
+
+    With a path, entries are saved to a JSON file and loaded again on
+    start-up, so repeat prompts skip the LLM across restarts too. Changes
+    are written by a timer thread at most every flush_interval seconds (and
+    by flush(), called at shutdown), never by the caller of put(). Entry
+    times are wall-clock so the TTL still holds after a restart.
+    """
+
+    def __init__(self, max_entries: int = LLM_CACHE_SIZE, ttl: float = LLM_CACHE_TTL, path: str = None,
+                 flush_interval: float = LLM_CACHE_FLUSH_INTERVAL):
+        self.max_entries = max_entries
+        self.ttl = ttl
+        self.path = path or None
+        self.flush_interval = flush_interval
+        self._entries = OrderedDict()  # key -> (stored_at, response), least recently used first
+        self._lock = threading.Lock()
+        self._write_lock = threading.Lock()
+        self._dirty = False
+        self._flush_timer = None
+        self.hits = 0
+        self.misses = 0
+        self.expirations = 0
+        self.evictions = 0
+        if self.path:
+            self._load()
+
+    def get(self, key: str):
+        """Cached response for key, or None"""
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                self.misses += 1
+                return None
+            if time.time() - entry[0] > self.ttl:
+                del self._entries[key]
+                self.expirations += 1
+                self.misses += 1
+                return None
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return entry[1]
+
+    def put(self, key: str, response: str):
+        if self.max_entries <= 0:
+            return
+        with self._lock:
+            self._entries[key] = (time.time(), response)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+                self.evictions += 1
+            self._changed()
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+            self._changed()
+
+    def flush(self):
+        """Write the cache file now if anything changed since the last write"""
+        with self._lock:
+            if self._flush_timer is not None:
+                self._flush_timer.cancel()
+                self._flush_timer = None
+            if not self._dirty:
+                return
+            self._dirty = False
+            entries = [[key, stored_at, response] for key, (stored_at, response) in self._entries.items()]
+        self._save(entries)
+
+    def stats(self) -> dict:
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                "entries": len(self._entries),
+                "max_entries": self.max_entries,
+                "hits": self.hits,
+                "misses": self.misses,
+                "expirations": self.expirations,
+                "evictions": self.evictions,
+                "hit_rate": round(self.hits / lookups, 4) if lookups else 0.0,
+            }
+
+    def _load(self):
+        try:
+            with open(self.path) as f:
+                stored = json.load(f)
+        except (OSError, ValueError):
+            # Missing or unreadable: start empty, the next put rewrites it
+            return
+
+        now = time.time()
+        for key, stored_at, response in stored[-self.max_entries:] if self.max_entries > 0 else []:
+            if now - stored_at <= self.ttl:
+                self._entries[key] = (stored_at, response)
+
+    def _changed(self):
+        """Mark the file out of date and schedule a write (caller holds the lock)"""
+        if not self.path:
+            return
+        self._dirty = True
+        if self._flush_timer is None:
+            self._flush_timer = threading.Timer(self.flush_interval, self.flush)
+            self._flush_timer.daemon = True
+            self._flush_timer.start()
+
+    def _save(self, entries: list):
+        """Write the cache file; a failed write only costs persistence"""
+        partial_path = f"{self.path}.{os.getpid()}.part"
+        with self._write_lock:
+            try:
+                os.makedirs(os.path.dirname(self.path) or ".", exist_ok=True)
+                with open(partial_path, "w") as f:
+                    json.dump(entries, f)
+                os.replace(partial_path, self.path)
+            except OSError:
+                pass
+
+
+# Global instance shared by the LM Studio handler
+llm_response_cache = ResponseCache(path=LLM_CACHE_PATH)
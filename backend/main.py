@@ -1,15 +1,29 @@
-from fastapi import FastAPI, UploadFile, File, Form, HTTPException
+from fastapi import FastAPI, UploadFile, File, Form, HTTPException, Request
 from fastapi.middleware.cors import CORSMiddleware
 from fastapi.responses import FileResponse, JSONResponse
 from typing import List, Dict, Optional
+import asyncio
 import os
 import uuid
 import shutil
-from PIL import Image
-import re
-from datetime import datetime
 import zipfile
 
+from .executors import (
+    IO_TIMEOUT, RENDER_TIMEOUT, ClientDisconnected, JobTimeout, report_worker_stats, run_async, run_blocking_io,
+    run_render, shutdown_pools, submit_background, worker_stats,
+)
+from .frame_writers import DEFAULT_OUTPUT_FORMAT, OUTPUT_FORMATS, OutputTooLarge, output_format_available
+from .image_pyramid import BUILD_PYRAMIDS, PYRAMID_LEVELS, build_pyramid
+from .jobs import JobElsewhere, QueueFull, job_manager, set_job_plan, set_job_stage
+from .layout_plan import LayoutPlanParser
+from .blob_store import BlobStore
+from .prompt_spec import parse_prompt_spec
+from .render_cache import RenderCache, link_or_copy, render_key
+from .render_stats import merge_cache_stats, render_cache_stats
+from .session_store import create_session_store
+from .singleflight import SingleFlight
+from .uploads import MAX_SESSION_UPLOAD_BYTES, MAX_UPLOAD_BYTES, InvalidImage, UploadTooLarge, save_upload
+
 # Initialize app
 app = FastAPI(title="Proc Image Generator API")
 
@@ -27,12 +41,29 @@ BASE_DIR = "backend/static"
 UPLOAD_DIR = f"{BASE_DIR}/uploads"
 OUTPUT_DIR = f"{BASE_DIR}/output"
 TEMP_DIR = f"{BASE_DIR}/temp"
+BLOB_DIR = f"{UPLOAD_DIR}/blobs"
 os.makedirs(UPLOAD_DIR, exist_ok=True)
 os.makedirs(OUTPUT_DIR, exist_ok=True)
 os.makedirs(TEMP_DIR, exist_ok=True)
 
-# Session storage
-sessions: Dict[str, Dict] = {}
+# Session storage: "memory" (single worker) or "sqlite" (shared by workers, survives restarts).
+# Async jobs are not shared either way; see JobManager.
+SESSION_STORE = os.environ.get("SESSION_STORE", "memory")
+SESSION_DB_PATH = os.environ.get("SESSION_DB_PATH", f"{BASE_DIR}/sessions.db")
+session_store = create_session_store(SESSION_STORE, SESSION_DB_PATH)
+
+# Uploaded images are stored once by content hash and shared between sessions
+blob_store = BlobStore(BLOB_DIR)
+
+# Finished renders, reused when the same prompt meets the same images again
+RENDER_CACHE_DIR = os.environ.get("RENDER_CACHE_DIR", f"{BASE_DIR}/render_cache")
+render_cache = RenderCache(RENDER_CACHE_DIR)
+
+# Identical LLM calls and renders running at the same time (double clicks, retries) are done once
+inflight = SingleFlight()
+
+# Render workers report their in-memory cache counters back with each job
+report_worker_stats(render_cache_stats)
 
 class SessionManager:
     @staticmethod
@@ -43,44 +74,49 @@ class SessionManager:
         os.makedirs(session_dir, exist_ok=True)
         os.makedirs(output_dir, exist_ok=True)
         
-        sessions[session_id] = {
-            "created_at": datetime.now(),
-            "upload_dir": session_dir,
-            "output_dir": output_dir,
-            "images": {},  # filename -> tag mapping
-            "last_activity": datetime.now()
-        }
+        session_store.create(session_id, session_dir, output_dir)
         return session_id
     
     @staticmethod
     def get_session(session_id: str) -> Optional[Dict]:
-        if session_id in sessions:
-            sessions[session_id]["last_activity"] = datetime.now()
-            return sessions[session_id]
-        return None
+        session = session_store.get(session_id)
+        if session:
+            session_store.touch(session_id, session["last_activity"])
+        return session
+    
+    @staticmethod
+    def add_image(session_id: str, filename: str) -> bool:
+        """Reference an uploaded image (without a tag) from the session; False if already there"""
+        return session_store.add_image(session_id, filename)
+    
+    @staticmethod
+    def image_path(session: Dict, filename: str) -> str:
+        """Resolve a session image to its file (blob store, or the session folder for older uploads)"""
+        legacy_path = os.path.join(session["upload_dir"], filename)
+        if os.path.exists(legacy_path):
+            return legacy_path
+        return blob_store.path(filename)
+    
+    @staticmethod
+    def set_image_tag(session_id: str, filename: str, tag: str):
+        session_store.set_tag(session_id, filename, tag)
     
     @staticmethod
     def cleanup_session(session_id: str):
-        if session_id in sessions:
-            session = sessions[session_id]
+        session = session_store.get(session_id)
+        if session:
             # Remove directories
             if os.path.exists(session["upload_dir"]):
                 shutil.rmtree(session["upload_dir"])
             if os.path.exists(session["output_dir"]):
                 shutil.rmtree(session["output_dir"])
-            # Remove from memory
-            del sessions[session_id]
+            # Remove from the store, deleting uploads no other session references
+            session_store.delete(session_id, release_image=blob_store.remove)
     
     @staticmethod
     def cleanup_old_sessions():
         """Clean up sessions older than 1 hour"""
-        current_time = datetime.now()
-        to_remove = []
-        for session_id, session_data in sessions.items():
-            if (current_time - session_data["last_activity"]).seconds > 3600:
-                to_remove.append(session_id)
-        
-        for session_id in to_remove:
+        for session_id in session_store.idle_sessions(3600):
             SessionManager.cleanup_session(session_id)
 
 
@@ -124,6 +160,22 @@ async def cleanup_session(session_id: str):
 # ==========================================
 # 📤 Upload Images with Tags
 # ==========================================
+def session_upload_bytes(session: Dict) -> int:
+    """Bytes of the images a session uploaded (stats every file, so run it off the event loop)"""
+    return sum(
+        os.path.getsize(path) for path in
+        (SessionManager.image_path(session, filename) for filename in session["images"])
+        if os.path.exists(path)
+    )
+
+
+def session_quota_message(filename: str, session_left: int) -> str:
+    return (
+        f"Session upload quota exceeded: {filename} does not fit in the {session_left} bytes left "
+        f"of the session's {MAX_SESSION_UPLOAD_BYTES} bytes"
+    )
+
+
 @app.post("/upload/{session_id}/")
 async def upload_images(session_id: str, files: List[UploadFile] = File(...)):
     """Upload images to a specific session"""
@@ -131,19 +183,49 @@ async def upload_images(session_id: str, files: List[UploadFile] = File(...)):
     if not session:
         raise HTTPException(status_code=404, detail="Session not found")
     
+    session_bytes = await run_blocking_io(session_upload_bytes, session)
+    
+    # Stage and check the whole batch first, so a rejected file leaves nothing behind
+    staged = []
+    try:
+        for file in files:
+            # Stage the upload in the session folder under a unique name
+            staging_path = os.path.join(session["upload_dir"], f"{uuid.uuid4()}.upload")
+            
+            # Stream to disk in chunks, hashing and checking the image header on the way
+            session_left = max(0, MAX_SESSION_UPLOAD_BYTES - session_bytes)
+            if not session_left:
+                raise HTTPException(status_code=413, detail=session_quota_message(file.filename, session_left))
+            max_bytes = min(MAX_UPLOAD_BYTES, session_left)
+            try:
+                saved = await save_upload(file, staging_path, max_bytes)
+            except UploadTooLarge as e:
+                if session_left < MAX_UPLOAD_BYTES:
+                    raise HTTPException(status_code=413, detail=session_quota_message(file.filename, session_left))
+                raise HTTPException(status_code=413, detail=f"Upload limit exceeded: {str(e)}")
+            except InvalidImage as e:
+                raise HTTPException(status_code=400, detail=f"{file.filename}: {str(e)}")
+            
+            # Store by content hash; identical uploads share one blob across sessions
+            file_extension = os.path.splitext(file.filename)[1]
+            blob_name = BlobStore.blob_name(saved["sha256"], saved["format"], file_extension)
+            if blob_name not in session["images"] and all(name != blob_name for name, _, _ in staged):
+                session_bytes += saved["size"]
+            staged.append((blob_name, staging_path, saved))
+    except BaseException:
+        for _, staging_path, _ in staged:
+            os.remove(staging_path)
+        raise
+    
     saved_files = []
-    for file in files:
-        # Generate unique filename to avoid conflicts
-        file_extension = os.path.splitext(file.filename)[1]
-        unique_filename = f"{uuid.uuid4()}{file_extension}"
-        file_path = os.path.join(session["upload_dir"], unique_filename)
+    for blob_name, staging_path, saved in staged:
+        SessionManager.add_image(session_id, blob_name)
+        blob_path = blob_store.adopt(staging_path, blob_name)
+        saved_files.append(blob_name)
         
-        with open(file_path, "wb") as f:
-            f.write(await file.read())
-        
-        # Add to session images without tag initially
-        session["images"][unique_filename] = None
-        saved_files.append(unique_filename)
+        # Pre-scale large uploads in the background so renders start from a small level
+        if BUILD_PYRAMIDS and max(saved["width"], saved["height"]) > min(PYRAMID_LEVELS):
+            submit_background(build_pyramid, blob_path)
 
     return {"count": len(saved_files), "files": saved_files, "session_id": session_id}
 
@@ -167,7 +249,7 @@ async def assign_tag(session_id: str, payload: dict):
     if filename not in session["images"]:
         raise HTTPException(status_code=404, detail="Image not found in session")
     
-    session["images"][filename] = tag
+    SessionManager.set_image_tag(session_id, filename, tag)
     return {"message": f"Tag '{tag}' assigned to {filename}"}
 
 
@@ -185,7 +267,7 @@ async def assign_tags_batch(session_id: str, payload: dict):
         tag = assignment.get("tag")
         
         if filename and tag and filename in session["images"]:
-            session["images"][filename] = tag
+            SessionManager.set_image_tag(session_id, filename, tag)
     
     return {"message": f"Assigned {len(tag_assignments)} tags", "session_id": session_id}
 
@@ -195,21 +277,19 @@ async def assign_tags_batch(session_id: str, payload: dict):
 # ==========================================
 def parse_prompt_tags(prompt: str) -> List[str]:
     """Extract @tag references from prompt"""
-    tag_pattern = r'@(\w+)'
-    return re.findall(tag_pattern, prompt)
+    return list(parse_prompt_spec(prompt).tags)
 
 def get_tagged_images(session: Dict, tags: List[str]) -> Dict[str, str]:
-    """Get image filenames for given tags"""
+    """Get image filenames for given tags (first upload wins when a tag is reused)"""
     tagged_images = {}
     for tag in tags:
-        for filename, assigned_tag in session["images"].items():
-            if assigned_tag == tag:
-                tagged_images[tag] = filename
-                break
+        filenames = session["tags"].get(tag)
+        if filenames:
+            tagged_images[tag] = filenames[0]
     return tagged_images
 
 @app.post("/session/{session_id}/generate/")
-async def generate_image(session_id: str, payload: dict):
+async def generate_image(session_id: str, payload: dict, request: Request):
     """Generate image based on prompt with tagged images"""
     session = SessionManager.get_session(session_id)
     if not session:
@@ -217,9 +297,14 @@ async def generate_image(session_id: str, payload: dict):
     
     prompt = payload.get("prompt", "")
     generate_gif = payload.get("generate_gif", False)
+    output_format = payload.get("format", DEFAULT_OUTPUT_FORMAT)
     
     if not prompt:
         raise HTTPException(status_code=400, detail="Prompt is required")
+    if output_format not in OUTPUT_FORMATS:
+        raise HTTPException(status_code=400, detail=f"Unsupported format: {output_format}")
+    if not await run_blocking_io(output_format_available, output_format):
+        raise HTTPException(status_code=400, detail=f"Format not available on this server: {output_format}")
     
     # Parse tags from prompt
     tags = parse_prompt_tags(prompt)
@@ -236,78 +321,218 @@ async def generate_image(session_id: str, payload: dict):
     if missing_tags:
         raise HTTPException(status_code=400, detail=f"Images not found for tags: {missing_tags}")
     
+    # Opt-in async mode: queue the work and return a job id right away
+    if payload.get("async", False):
+        return submit_job(
+            session_id, "generate",
+            lambda job: run_generation(session_id, session, tagged_images, prompt, generate_gif,
+                                       job=job, output_format=output_format)
+        )
+    
     try:
-        if generate_gif:
-            # Generate animated GIF
-            output_path = await generate_animated_gif(session, tagged_images, prompt)
-            
-            # Check if file was actually created
-            if not os.path.exists(output_path):
-                raise Exception("GIF file was not created")
-            
-            return {
-                "message": "Animated GIF generated successfully",
-                "gif_path": f"/session/{session_id}/output/{os.path.basename(output_path)}",
-                "session_id": session_id
-            }
-        else:
-            # Generate static image
-            output_path = await generate_static_image(session, tagged_images, prompt)
-            return {
-                "message": "Image generated successfully",
-                "image_path": f"/session/{session_id}/output/{os.path.basename(output_path)}",
-                "session_id": session_id
-            }
+        return await run_generation(session_id, session, tagged_images, prompt, generate_gif,
+                                    request=request, output_format=output_format)
+    except ClientDisconnected as e:
+        raise HTTPException(status_code=499, detail=str(e))
+    except JobTimeout as e:
+        raise HTTPException(status_code=504, detail=f"Generation timed out: {str(e)}")
+    except OutputTooLarge as e:
+        raise HTTPException(status_code=413, detail=str(e))
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"Generation failed: {str(e)}")
 
 
-async def generate_static_image(session: Dict, tagged_images: Dict[str, str], prompt: str) -> str:
+async def run_generation(session_id: str, session: Dict, tagged_images: Dict[str, str], prompt: str,
+                         generate_gif: bool, request: Request = None, job: Dict = None,
+                         output_format: str = DEFAULT_OUTPUT_FORMAT) -> Dict:
+    """Generate a static image or GIF and build the API response"""
+    if generate_gif:
+        # Generate animation (GIF, WebP or MP4)
+        output_path = await generate_animated_gif(session, tagged_images, prompt, request, job, output_format)
+        
+        # Check if file was actually created
+        if not os.path.exists(output_path):
+            raise Exception("GIF file was not created")
+        
+        return {
+            "message": "Animated GIF generated successfully",
+            "gif_path": f"/session/{session_id}/output/{os.path.basename(output_path)}",
+            "format": output_format,
+            "session_id": session_id
+        }
+    else:
+        # Generate static image
+        output_path = await generate_static_image(session, tagged_images, prompt, request, job)
+        return {
+            "message": "Image generated successfully",
+            "image_path": f"/session/{session_id}/output/{os.path.basename(output_path)}",
+            "session_id": session_id
+        }
+
+
+async def generate_static_image(session: Dict, tagged_images: Dict[str, str], prompt: str,
+                                request: Request = None, job: Dict = None) -> str:
     """Generate a static image using AI (Llama3 + Ollama)"""
-    from .ollama_handler import generate_ai_image
+    from .ollama_handler import lm_studio_generator
+    from .image_composer import compose_image_with_tags
     
     output_filename = f"generated_{uuid.uuid4()}.png"
     output_path = os.path.join(session["output_dir"], output_filename)
     
+    image_paths = {}
+    for tag, filename in tagged_images.items():
+        image_paths[tag] = SessionManager.image_path(session, filename)
+    
+    # While LM Studio's image endpoint is failing, go straight to the local composer
+    if lm_studio_generator.images_available():
+        set_job_stage(job, "prompt_expansion")
+        try:
+            # Uploaded filenames are content hashes, so they identify the inputs. The exact
+            # prompt is used, not the normalized one: the flight may end in a composite,
+            # whose layering follows the order the tags are written in
+            flight_key = ("static", prompt, tuple(sorted(tagged_images.items())))
+            # The flight may expand the prompt, generate and still render the composite
+            if await shared_output(
+                flight_key, output_path, generate_static_image_to, prompt, tagged_images, image_paths, job,
+                request=request, timeout=IO_TIMEOUT + RENDER_TIMEOUT
+            ):
+                return output_path
+        except ClientDisconnected:
+            raise
+        except Exception as e:
+            print(f"AI image generation failed, composing locally instead: {e!r}")
+    
+    # Fallback to composite image generation
+    set_job_stage(job, "rendering")
+    await cached_render("compose", "png", image_paths, prompt, output_path, compose_image_with_tags, request=request)
+    return output_path
+
+
+async def generate_static_image_to(output_path: str, prompt: str, tagged_images: Dict[str, str],
+                                   image_paths: Dict[str, str], job: Dict = None) -> str:
+    """
+    Generate an AI image into output_path, or the composite when the image endpoint fails.
+
+    The prompt expansion is streamed through a LayoutPlanParser. While the
+    image endpoint has been failing, the composite is rendered as soon as the
+    plan has laid out the canvas, background and every tag, while the LLM is
+    still writing and the image endpoint is still working, so the fallback is
+    ready when it is needed. It is cancelled if the AI image arrives after all.
+    """
+    from .ollama_handler import generate_ai_image_async, lm_studio_generator
+    from .image_composer import compose_image_with_tags
+    
+    plan = LayoutPlanParser(prompt, list(tagged_images))
+    layout_path = os.path.join(os.path.dirname(output_path), f"layout_{uuid.uuid4()}.png")
+    layout_render = None
+    # A healthy image endpoint rarely needs the fallback, so it is not rendered ahead of time
+    render_early = lm_studio_generator.images_failing()
+    
+    def on_text(piece: str):
+        nonlocal layout_render
+        if plan.feed(piece):
+            set_job_plan(job, plan.describe())
+        if render_early and layout_render is None and plan.sufficient:
+            layout_render = asyncio.ensure_future(cached_render(
+                "compose", "png", image_paths, prompt, layout_path, compose_image_with_tags, layout=plan.layout()
+            ))
+    
     try:
         # Generate AI image using Llama3 + Ollama (dimensions will be extracted from prompt)
-        ai_image_path = generate_ai_image(prompt, tagged_images)
-        
+        ai_image_path = await generate_ai_image_async(prompt, tagged_images, on_text=on_text)
         if ai_image_path and os.path.exists(ai_image_path):
             # Move the generated image to session output directory
-            import shutil
             shutil.move(ai_image_path, output_path)
+            if layout_render is not None:
+                layout_render.cancel()
             return output_path
-        else:
-            # Fallback to composite image generation
-            from .image_composer import compose_image_with_tags
-            image_paths = {}
-            for tag, filename in tagged_images.items():
-                image_paths[tag] = os.path.join(session["upload_dir"], filename)
-            compose_image_with_tags(image_paths, prompt, output_path)
+        
+        # Fallback to composite image generation, laid out by as much of the plan as arrived
+        set_job_stage(job, "rendering")
+        if layout_render is not None:
+            await layout_render
+            os.replace(layout_path, output_path)
             return output_path
-            
-    except Exception as e:
-        # Fallback to composite image generation
-        from .image_composer import compose_image_with_tags
-        image_paths = {}
-        for tag, filename in tagged_images.items():
-            image_paths[tag] = os.path.join(session["upload_dir"], filename)
-        compose_image_with_tags(image_paths, prompt, output_path)
+        plan.finish()
+        set_job_plan(job, plan.describe())
+        await cached_render(
+            "compose", "png", image_paths, prompt, output_path, compose_image_with_tags, layout=plan.layout()
+        )
         return output_path
+    finally:
+        if layout_render is not None:
+            # Whether used, cancelled or failed, the early composite's working file goes once it is done
+            layout_render.add_done_callback(lambda task: discard_task_output(task, layout_path))
 
 
-async def generate_animated_gif(session: Dict, tagged_images: Dict[str, str], prompt: str) -> str:
-    """Generate an animated GIF based on prompt"""
+def discard_task_output(task: asyncio.Task, path: str):
+    """Done callback for a task whose output nobody reads: retrieve its error and remove its file"""
+    if not task.cancelled():
+        task.exception()
+    try:
+        os.remove(path)
+    except FileNotFoundError:
+        pass
+
+
+async def cached_render(kind: str, artifact_format: str, image_paths: Dict[str, str], prompt: str,
+                        output_path: str, render, request: Request = None, layout: Dict = None, **kwargs):
+    """
+    Run render(image_paths, prompt, output_path, **kwargs) unless the render cache already has the result.
+
+    A layout plan from the LLM is passed on to the renderer and is part of the cache key.
+    """
+    key_params = {}
+    if layout:
+        kwargs["layout"] = key_params["layout"] = layout
+    key = await run_blocking_io(render_key, kind, prompt, image_paths, artifact_format, request=request, **key_params)
+    if await run_blocking_io(render_cache.fetch, key, output_path, request=request):
+        return
+    await shared_output(
+        ("render", key), output_path, render_to, key, render, image_paths, prompt,
+        request=request, timeout=RENDER_TIMEOUT, **kwargs
+    )
+
+
+async def shared_output(flight_key, output_path: str, produce, *args, request: Request = None,
+                        timeout: float = IO_TIMEOUT, **kwargs):
+    """
+    Await produce(output_path, *args, **kwargs) once for identical requests in flight.
+
+    The first request's call writes its own output_path and returns it (or
+    None); requests that joined it get that file linked to their output_path.
+    timeout bounds each caller's wait, so it must cover the work produce does.
+    """
+    produced_path = await run_async(
+        inflight.do, flight_key, produce, output_path, *args, timeout=timeout, request=request, **kwargs
+    )
+    if produced_path and produced_path != output_path:
+        await run_blocking_io(link_or_copy, produced_path, output_path, request=request)
+    return output_path if produced_path else None
+
+
+async def render_to(output_path: str, key: str, render, image_paths: Dict[str, str], prompt: str, **kwargs) -> str:
+    """Render into output_path and keep the result in the render cache"""
+    # Shared by every request in the flight, so no single client's disconnect cancels it
+    await run_render(render, image_paths, prompt, output_path, **kwargs)
+    await run_blocking_io(render_cache.store, key, output_path)
+    return output_path
+
+
+async def generate_animated_gif(session: Dict, tagged_images: Dict[str, str], prompt: str,
+                                request: Request = None, job: Dict = None,
+                                output_format: str = DEFAULT_OUTPUT_FORMAT) -> str:
+    """Generate an animated GIF (or WebP/MP4 when output_format asks for it) based on prompt"""
     from .gif_generator import create_animated_gif
     
-    output_filename = f"animated_{uuid.uuid4()}.gif"
+    extension, _ = OUTPUT_FORMATS[output_format]
+    output_filename = f"animated_{uuid.uuid4()}{extension}"
     output_path = os.path.join(session["output_dir"], output_filename)
     
     # Prepare image paths
     image_paths = {}
     for tag, filename in tagged_images.items():
-        image_paths[tag] = os.path.join(session["upload_dir"], filename)
+        image_paths[tag] = SessionManager.image_path(session, filename)
     
     # Check if we have images to work with
     if not image_paths:
@@ -326,8 +551,13 @@ async def generate_animated_gif(session: Dict, tagged_images: Dict[str, str], pr
     if not image_paths:
         raise Exception("No valid images found for GIF generation")
     
-    # Generate animated GIF
-    create_animated_gif(image_paths, prompt, output_path)
+    # Generate animated GIF off the event loop
+    set_job_stage(job, "rendering")
+    # Presentations are rendered by create_animated_gif too, so this covers both
+    await cached_render(
+        "animation", output_format, image_paths, prompt, output_path, create_animated_gif,
+        request=request, progress=job_manager.frame_progress(job), output_format=output_format
+    )
     return output_path
 
 
@@ -346,10 +576,10 @@ async def download_output(session_id: str, filename: str):
         raise HTTPException(status_code=404, detail="File not found")
     
     # Determine media type
-    if filename.lower().endswith('.gif'):
-        media_type = "image/gif"
-    else:
-        media_type = "image/png"
+    media_type = "image/png"
+    for extension, format_media_type in OUTPUT_FORMATS.values():
+        if filename.lower().endswith(extension):
+            media_type = format_media_type
     
     return FileResponse(file_path, media_type=media_type, filename=filename)
 
@@ -361,7 +591,10 @@ async def get_uploaded_image(session_id: str, filename: str):
     if not session:
         raise HTTPException(status_code=404, detail="Session not found")
     
-    file_path = os.path.join(session["upload_dir"], filename)
+    if filename not in session["images"]:
+        raise HTTPException(status_code=404, detail="Image not found")
+    
+    file_path = SessionManager.image_path(session, filename)
     if not os.path.exists(file_path):
         raise HTTPException(status_code=404, detail="Image not found")
     
@@ -382,7 +615,7 @@ async def get_uploaded_image(session_id: str, filename: str):
 # 🔄 Image Refinement with AI
 # ==========================================
 @app.post("/session/{session_id}/refine/")
-async def refine_image(session_id: str, payload: dict):
+async def refine_image(session_id: str, payload: dict, request: Request):
     """Refine an image based on user feedback using AI"""
     session = SessionManager.get_session(session_id)
     if not session:
@@ -391,45 +624,159 @@ async def refine_image(session_id: str, payload: dict):
     original_prompt = payload.get("original_prompt", "")
     user_feedback = payload.get("feedback", "")
     generate_gif = payload.get("generate_gif", False)
+    output_format = payload.get("format", DEFAULT_OUTPUT_FORMAT)
     
     if not original_prompt or not user_feedback:
         raise HTTPException(status_code=400, detail="Both original prompt and feedback are required")
+    if output_format not in OUTPUT_FORMATS:
+        raise HTTPException(status_code=400, detail=f"Unsupported format: {output_format}")
+    if not await run_blocking_io(output_format_available, output_format):
+        raise HTTPException(status_code=400, detail=f"Format not available on this server: {output_format}")
+    
+    # Opt-in async mode: queue the work and return a job id right away
+    if payload.get("async", False):
+        return submit_job(
+            session_id, "refine",
+            lambda job: run_refinement(session_id, session, original_prompt, user_feedback, generate_gif,
+                                       job=job, output_format=output_format)
+        )
     
     try:
-        from .ollama_handler import refine_ai_image
-        
-        # Refine the prompt using AI
-        refined_prompt = refine_ai_image(original_prompt, user_feedback)
-        
-        # Get tagged images for the session
-        tagged_images = {}
-        for filename, tag in session["images"].items():
-            if tag:
-                tagged_images[tag] = filename
-        
-        if generate_gif:
-            # Generate refined animated GIF
-            output_path = await generate_animated_gif(session, tagged_images, refined_prompt)
-            return {
-                "message": "Refined animated GIF generated successfully",
-                "gif_path": f"/session/{session_id}/output/{os.path.basename(output_path)}",
-                "refined_prompt": refined_prompt,
-                "session_id": session_id
-            }
-        else:
-            # Generate refined static image
-            output_path = await generate_static_image(session, tagged_images, refined_prompt)
-            return {
-                "message": "Refined image generated successfully",
-                "image_path": f"/session/{session_id}/output/{os.path.basename(output_path)}",
-                "refined_prompt": refined_prompt,
-                "session_id": session_id
-            }
-            
+        return await run_refinement(session_id, session, original_prompt, user_feedback, generate_gif,
+                                    request=request, output_format=output_format)
+    except ClientDisconnected as e:
+        raise HTTPException(status_code=499, detail=str(e))
+    except JobTimeout as e:
+        raise HTTPException(status_code=504, detail=f"Refinement timed out: {str(e)}")
+    except OutputTooLarge as e:
+        raise HTTPException(status_code=413, detail=str(e))
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"Refinement failed: {str(e)}")
 
 
+async def run_refinement(session_id: str, session: Dict, original_prompt: str, user_feedback: str,
+                         generate_gif: bool, request: Request = None, job: Dict = None,
+                         output_format: str = DEFAULT_OUTPUT_FORMAT) -> Dict:
+    """Refine the prompt, render the result and build the API response"""
+    from .ollama_handler import refine_ai_image_async
+    
+    # Refine the prompt using AI
+    set_job_stage(job, "prompt_refinement")
+    flight_key = ("refine", original_prompt, user_feedback)
+    refined_prompt = await run_async(
+        inflight.do, flight_key, refine_ai_image_async, original_prompt, user_feedback, request=request
+    )
+    
+    # Get tagged images for the session
+    tagged_images = get_tagged_images(session, list(session["tags"]))
+    
+    if generate_gif:
+        # Generate refined animated GIF
+        output_path = await generate_animated_gif(session, tagged_images, refined_prompt, request, job, output_format)
+        return {
+            "message": "Refined animated GIF generated successfully",
+            "gif_path": f"/session/{session_id}/output/{os.path.basename(output_path)}",
+            "format": output_format,
+            "refined_prompt": refined_prompt,
+            "session_id": session_id
+        }
+    else:
+        # Generate refined static image
+        output_path = await generate_static_image(session, tagged_images, refined_prompt, request, job)
+        return {
+            "message": "Refined image generated successfully",
+            "image_path": f"/session/{session_id}/output/{os.path.basename(output_path)}",
+            "refined_prompt": refined_prompt,
+            "session_id": session_id
+        }
+
+
+# ==========================================
+# ⏳ Background Jobs
+# ==========================================
+def submit_job(session_id: str, kind: str, run) -> JSONResponse:
+    """Queue a generation job, answering 429 when the queue is full"""
+    try:
+        job = job_manager.submit(session_id, kind, run)
+    except QueueFull as e:
+        raise HTTPException(status_code=429, detail=str(e))
+    
+    return JSONResponse(status_code=202, content={
+        "message": "Job queued",
+        "job_id": job["job_id"],
+        "status": job["status"],
+        "status_url": f"/jobs/{job['job_id']}",
+        "session_id": session_id
+    })
+
+
+def get_job(job_id: str):
+    """Job record of this worker, answering 421 for a job queued by another uvicorn worker"""
+    try:
+        return job_manager.get(job_id)
+    except JobElsewhere as e:
+        raise HTTPException(
+            status_code=421,
+            detail=f"{e}; async jobs need a single worker or routing by job id"
+        )
+
+
+@app.get("/jobs/{job_id}")
+async def get_job_status(job_id: str):
+    """Get status, progress and result of a background job"""
+    job = get_job(job_id)
+    if not job:
+        raise HTTPException(status_code=404, detail="Job not found")
+    
+    return job_manager.describe(job)
+
+
+@app.delete("/jobs/{job_id}")
+async def cancel_job(job_id: str):
+    """Cancel a queued or running background job"""
+    job = get_job(job_id)
+    if not job:
+        raise HTTPException(status_code=404, detail="Job not found")
+    
+    if not job_manager.cancel(job_id):
+        raise HTTPException(status_code=409, detail=f"Job already {job['status']}")
+    
+    return {"message": "Job cancelled", "job_id": job_id}
+
+
+# ==========================================
+# 📊 Cache Statistics
+# ==========================================
+@app.get("/cache/stats/")
+async def cache_stats():
+    """
+    Report hit/miss counters for the shared render caches.
+
+    Sprite, prompt, label and timeline caches are per process: their counters are
+    summed over this process and every render worker, as of each worker's
+    last job.
+    """
+    from .llm_cache import llm_response_cache
+    
+    return {
+        **merge_cache_stats([render_cache_stats()] + worker_stats()),
+        "renders": render_cache.stats(),
+        "llm": llm_response_cache.stats(),
+        "coalesced": inflight.stats(),
+    }
+
+
+# ==========================================
+# 🩺 LLM Health
+# ==========================================
+@app.get("/llm/status/")
+async def llm_status():
+    """Report circuit breaker state, failures and latency per LM Studio endpoint"""
+    from .ollama_handler import lm_studio_generator
+    
+    return {"url": lm_studio_generator.lm_studio_url, "breakers": lm_studio_generator.breaker_stats()}
+
+
 # ==========================================
 # 🧹 Cleanup Old Sessions (Background Task)
 # ==========================================
@@ -449,7 +796,7 @@ async def test_gif_generation(payload: dict):
         os.makedirs(os.path.dirname(test_output), exist_ok=True)
         
         # Test the generation
-        result = create_presentation_gif(image_paths, prompt, test_output)
+        result = await run_render(create_presentation_gif, image_paths, prompt, test_output)
         
         if os.path.exists(result):
             file_size = os.path.getsize(result)
@@ -530,9 +877,9 @@ async def create_zip_archive(session_id: str, payload: dict):
                         zipf.write(file_path, f"outputs/{filename}")
             
             # Add upload files
-            if include_uploads and os.path.exists(session["upload_dir"]):
-                for filename in os.listdir(session["upload_dir"]):
-                    file_path = os.path.join(session["upload_dir"], filename)
+            if include_uploads:
+                for filename in session["images"]:
+                    file_path = SessionManager.image_path(session, filename)
                     if os.path.isfile(file_path):
                         zipf.write(file_path, f"uploads/{filename}")
         
@@ -550,5 +897,18 @@ async def create_zip_archive(session_id: str, payload: dict):
 
 @app.on_event("startup")
 async def startup_event():
-    """Clean up old sessions on startup"""
+    """Clean up old sessions and start the job workers on startup"""
     SessionManager.cleanup_old_sessions()
+    await job_manager.start()
+
+
+@app.on_event("shutdown")
+async def shutdown_event():
+    """Stop the job workers, the render and I/O pools and the LLM client, and save the LLM cache"""
+    from .llm_cache import llm_response_cache
+    from .ollama_handler import lm_studio_generator
+    
+    await job_manager.stop()
+    await run_blocking_io(llm_response_cache.flush)
+    shutdown_pools()
+    await lm_studio_generator.aclose()
@@ -1,32 +1,336 @@
+import asyncio
 import subprocess
 import json
-import requests
 import base64
 import os
+import threading
+import time
 from typing import Dict, List, Optional
 
+import httpx
+
+try:
+    from .circuit_breaker import OPEN, CircuitBreaker
+    from .layout_plan import PLAN_INSTRUCTIONS, strip_layout_plan
+    from .llm_cache import llm_response_cache, response_key
+    from .prompt_spec import parse_prompt_spec
+except ImportError:
+    from circuit_breaker import OPEN, CircuitBreaker
+    from layout_plan import PLAN_INSTRUCTIONS, strip_layout_plan
+    from llm_cache import llm_response_cache, response_key
+    from prompt_spec import parse_prompt_spec
+
+# LM Studio connection settings (environment overridable)
+LM_STUDIO_URL = os.environ.get("LM_STUDIO_URL", "http://localhost:1234")
+LLM_MAX_CONCURRENCY = int(os.environ.get("LLM_MAX_CONCURRENCY", 4))  # Requests in flight to the LLM server
+LLM_CONNECT_TIMEOUT = float(os.environ.get("LLM_CONNECT_TIMEOUT", 5))
+CHAT_READ_TIMEOUT = float(os.environ.get("CHAT_READ_TIMEOUT", 30))
+IMAGE_READ_TIMEOUT = float(os.environ.get("IMAGE_READ_TIMEOUT", 60))
+
+# Idle keep-alive connections are closed after this many seconds
+LLM_KEEPALIVE_EXPIRY = 30
+
+# Statuses meaning the server is up but does not serve the endpoint
+UNSERVED_STATUS_CODES = (404, 405, 501)
+
+
 class LMStudioImageGenerator:
-    def __init__(self, lm_studio_url: str = "http://localhost:1234"):
+    """
+    Client for a local LM Studio server.
+
+    Requests go through long-lived pooled HTTP clients (one for the blocking
+    methods, one async client for the *_async methods) that keep connections
+    alive between calls. At most LLM_MAX_CONCURRENCY requests are in flight
+    at once; the rest wait for a slot. Answers are kept in response_cache, so
+    a repeated prompt skips the LLM.
+
+    Each endpoint sits behind a CircuitBreaker, so a server that is down (or
+    an endpoint it does not serve) costs milliseconds instead of timeouts.
+    While a breaker is open, async callers keep a background health probe
+    running that lets traffic back in once the server answers again.
+    """
+
+    def __init__(self, lm_studio_url: str = LM_STUDIO_URL, max_concurrency: int = LLM_MAX_CONCURRENCY,
+                 response_cache=llm_response_cache, transport: httpx.BaseTransport = None):
         self.lm_studio_url = lm_studio_url
+        self.transport = transport  # None for the network; tests pass an httpx.MockTransport
         self.model = "llama-3.2-3b-instruct"  # LM Studio uses local models
+        self.max_concurrency = max_concurrency
+        self.response_cache = response_cache
+        self._client = None
+        self._async_client = None
+        self._async_loop = None
+        self._semaphore = None
+        self._lock = threading.Lock()
+        self.chat_breaker = CircuitBreaker("chat")
+        self.image_breaker = CircuitBreaker("images")
+        self._probes = {}  # breaker name -> background probe task
+    
+    def _limits(self) -> httpx.Limits:
+        return httpx.Limits(
+            max_connections=self.max_concurrency,
+            max_keepalive_connections=self.max_concurrency,
+            keepalive_expiry=LLM_KEEPALIVE_EXPIRY,
+        )
+    
+    @staticmethod
+    def _timeout(read_timeout: float) -> httpx.Timeout:
+        # Waiting for a free connection is bounded by the caller's job timeout
+        return httpx.Timeout(connect=LLM_CONNECT_TIMEOUT, read=read_timeout, write=LLM_CONNECT_TIMEOUT, pool=None)
+    
+    @property
+    def client(self) -> httpx.Client:
+        """Pooled blocking client, created on first use"""
+        with self._lock:
+            if self._client is None:
+                self._client = httpx.Client(
+                    base_url=self.lm_studio_url, limits=self._limits(), transport=self.transport
+                )
+            return self._client
+    
+    def _async_state(self):
+        """Pooled async client and concurrency limit for the running event loop"""
+        loop = asyncio.get_running_loop()
+        if self._async_loop is not loop:
+            # Connections cannot move between event loops; the old loop's pool is abandoned with it
+            self._async_client = httpx.AsyncClient(
+                base_url=self.lm_studio_url, limits=self._limits(), transport=self.transport
+            )
+            self._semaphore = asyncio.Semaphore(self.max_concurrency)
+            self._async_loop = loop
+        return self._async_client, self._semaphore
+    
+    async def aclose(self):
+        """Close the async client and stop health probes (on application shutdown)"""
+        for probe in self._probes.values():
+            probe.cancel()
+        self._probes.clear()
+        if self._async_client is not None:
+            await self._async_client.aclose()
+            self._async_client = None
+            self._async_loop = None
+    
+    def _chat_payload(self, content: str, stream: bool = False) -> dict:
+        return {
+            "model": self.model,
+            "messages": [
+                {
+                    "role": "user",
+                    "content": content
+                }
+            ],
+            "temperature": 0.7,
+            "max_tokens": 500,
+            "stream": stream
+        }
+    
+    @staticmethod
+    def _completion_text(response: httpx.Response) -> Optional[str]:
+        """Cleaned-up text of a chat completion, None if the server did not answer one"""
+        if response.status_code != 200:
+            return None
+        result = response.json()
+        if "choices" not in result or len(result["choices"]) == 0:
+            return None
+        return LMStudioImageGenerator._clean_output(result["choices"][0]["message"]["content"])
+    
+    @staticmethod
+    def _clean_output(output: str) -> Optional[str]:
+        output = output.strip()
+        
+        # Clean up the output (remove any model-specific formatting);
+        # lines stay apart so layout plan lines can still be told from the prompt
+        lines = output.split('\n')
+        prompt_lines = []
+        for line in lines:
+            if line.strip() and not line.startswith('>') and not line.startswith('User:'):
+                prompt_lines.append(line.strip())
+        
+        return '\n'.join(prompt_lines)
+    
+    @staticmethod
+    def _single_line(text: Optional[str]) -> Optional[str]:
+        """A cleaned answer as the one-line prompt sent on to image generation"""
+        return ' '.join(text.split('\n')) if text else text
+    
+    def _chat(self, content: str, cache_key: str) -> Optional[str]:
+        cached = self.response_cache.get(cache_key)
+        if cached is not None:
+            return cached
+        if not self.chat_breaker.allow():
+            return None
+        started = time.monotonic()
+        try:
+            response = self.client.post(
+                "/v1/chat/completions", json=self._chat_payload(content), timeout=self._timeout(CHAT_READ_TIMEOUT)
+            )
+            text = self._completion_text(response)
+        except Exception:
+            text = None
+        self._record(self.chat_breaker, started, text is not None)
+        return self._remember(cache_key, text)
+    
+    async def _chat_async(self, content: str, cache_key: str, on_text=None) -> Optional[str]:
+        """
+        Streamed chat completion; on_text(piece) is called with the text as it
+        arrives (once with the whole answer on a cache hit).
+        """
+        cached = self.response_cache.get(cache_key)
+        if cached is not None:
+            if on_text:
+                on_text(cached)
+            return cached
+        if not self.chat_breaker.allow():
+            return None
+        client, semaphore = self._async_state()
+        started = time.monotonic()
+        try:
+            async with semaphore:
+                text = await self._stream_completion(client, content, on_text)
+        except Exception:
+            text = None
+        if self._record(self.chat_breaker, started, text is not None):
+            self._start_probe(self.chat_breaker)
+        return self._remember(cache_key, text)
+    
+    async def _stream_completion(self, client: httpx.AsyncClient, content: str, on_text=None) -> Optional[str]:
+        """Read a chat completion sent as server-sent events, passing each piece of text to on_text"""
+        async with client.stream(
+            "POST", "/v1/chat/completions",
+            json=self._chat_payload(content, stream=True), timeout=self._timeout(CHAT_READ_TIMEOUT)
+        ) as response:
+            if response.status_code != 200:
+                return None
+            
+            if not response.headers.get("content-type", "").startswith("text/event-stream"):
+                # Servers that ignore "stream" answer with a single JSON body
+                await response.aread()
+                text = self._completion_text(response)
+                if text and on_text:
+                    on_text(text)
+                return text
+            
+            pieces = []
+            async for line in response.aiter_lines():
+                if not line.startswith("data:"):
+                    continue
+                data = line[len("data:"):].strip()
+                if data == "[DONE]":
+                    break
+                choices = json.loads(data).get("choices") or []
+                piece = (choices[0].get("delta") or {}).get("content") if choices else None
+                if piece:
+                    pieces.append(piece)
+                    if on_text:
+                        on_text(piece)
+        
+        return self._clean_output("".join(pieces)) or None
+    
+    @staticmethod
+    def _record(breaker: CircuitBreaker, started: float, succeeded: bool) -> bool:
+        """Report a call's outcome to its breaker; True when the breaker just opened"""
+        latency = time.monotonic() - started
+        if succeeded:
+            breaker.record_success(latency)
+            return False
+        return breaker.record_failure(latency)
+    
+    def _start_probe(self, breaker: CircuitBreaker):
+        probe = self._probes.get(breaker.name)
+        if probe is None or probe.done():
+            self._probes[breaker.name] = asyncio.ensure_future(self._probe_until_healthy(breaker))
+    
+    async def _probe_until_healthy(self, breaker: CircuitBreaker):
+        """While breaker is open, check the server in the background instead of with user requests"""
+        while breaker.state == OPEN:
+            await asyncio.sleep(breaker.reset_timeout / 2)
+            # Probes finish within reset_timeout / 2, so the breaker stays shut while one runs
+            breaker.hold_open()
+            if await self._endpoint_healthy(breaker, breaker.reset_timeout / 2):
+                # The next real call is the trial that closes the breaker
+                breaker.probe_succeeded()
+                return
+            breaker.hold_open()
+    
+    async def _endpoint_healthy(self, breaker: CircuitBreaker, timeout: float) -> bool:
+        """
+        Check the endpoint breaker guards, not just the server: an LM Studio that
+        is up but has no image endpoint must keep the image breaker open.
+        """
+        client, _ = self._async_state()
+        try:
+            if breaker is self.image_breaker:
+                # An empty request is rejected by a served endpoint without generating anything
+                response = await client.post("/v1/images/generations", json={}, timeout=timeout)
+                return response.status_code < 500 and response.status_code not in UNSERVED_STATUS_CODES
+            response = await client.get("/v1/models", timeout=timeout)
+            return response.status_code == 200
+        except Exception:
+            return False
+    
+    def images_available(self) -> bool:
+        """False while the image endpoint's breaker is open: callers should go straight to the local composer"""
+        return self.image_breaker.available
+    
+    def images_failing(self) -> bool:
+        """True while the image endpoint's last call failed (the breaker may still be closed or half-open)"""
+        return self.image_breaker.consecutive_failures > 0
+    
+    def breaker_stats(self) -> dict:
+        return {breaker.name: breaker.stats() for breaker in (self.chat_breaker, self.image_breaker)}
+    
+    def _remember(self, cache_key: str, text: Optional[str]) -> Optional[str]:
+        # Only real answers are cached; failures fall back without poisoning the cache
+        if text:
+            self.response_cache.put(cache_key, text)
+        return text
+    
+    def _cache_key(self, template: str, prompt: str, tags) -> str:
+        return response_key(self.model, template, prompt, tags)
     
     def generate_image_prompt(self, user_prompt: str, tagged_images: Dict[str, str]) -> str:
         """
         Use LM Studio to convert user prompt with @tags into a detailed image generation prompt.
         """
-        # Create context about available images
+        request = self._image_prompt_request(user_prompt, tagged_images)
+        if request is None:
+            return user_prompt
+        template, lm_studio_prompt = request
+        cache_key = self._cache_key(template, user_prompt, tagged_images)
+        text = self._chat(lm_studio_prompt, cache_key)
+        return self._single_line(strip_layout_plan(text)) or self._image_prompt_fallback(user_prompt)
+    
+    async def generate_image_prompt_async(self, user_prompt: str, tagged_images: Dict[str, str], on_text=None) -> str:
+        """Async variant of generate_image_prompt; the completion is streamed to on_text(piece) as it arrives"""
+        request = self._image_prompt_request(user_prompt, tagged_images)
+        if request is None:
+            return user_prompt
+        template, lm_studio_prompt = request
+        cache_key = self._cache_key(template, user_prompt, tagged_images)
+        text = await self._chat_async(lm_studio_prompt, cache_key, on_text)
+        return self._single_line(strip_layout_plan(text)) or self._image_prompt_fallback(user_prompt)
+    
+    @staticmethod
+    def _image_prompt_fallback(user_prompt: str) -> str:
+        return f"Professional promotional image: {user_prompt}, high quality, detailed, commercial photography style"
+    
+    def _image_prompt_request(self, user_prompt: str, tagged_images: Dict[str, str]) -> Optional[tuple]:
+        """(template name, LLM instructions) for expanding user_prompt, None when the prompt is used as is"""
+        # Create context about available images (in tag order, so equal requests read the same)
         image_context = ""
-        for tag, filename in tagged_images.items():
+        for tag, filename in sorted(tagged_images.items()):
             image_context += f"- @{tag}: {filename}\n"
         
+        spec = parse_prompt_spec(user_prompt)
+        
         # Check if this is a presentation/animation request
-        if any(keyword in user_prompt.lower() for keyword in ["presentation", "slideshow", "shift images", "gif", "animation"]):
+        if spec.is_animation_request:
             # For presentation/animation requests, return the original prompt
             # The GIF generator will handle the presentation logic
-            return user_prompt
+            return None
         
         # Check if this is a promotional image request
-        is_promotional = any(keyword in user_prompt.lower() for keyword in ["promotional", "promotion", "advertisement", "ad", "marketing", "commercial", "product"])
+        is_promotional = spec.is_promotional
         
         if is_promotional:
             lm_studio_prompt = f"""
@@ -45,7 +349,7 @@ Instructions:
 5. Ensure the layout follows promotional design best practices
 
 Provide a detailed composition plan with specific positioning instructions for each element.
-"""
+{PLAN_INSTRUCTIONS}"""
         else:
             lm_studio_prompt = f"""
 You are an AI image generation prompt expert. Convert the user's request into a detailed, high-quality prompt for image generation.
@@ -62,95 +366,81 @@ Instructions:
 4. Make the prompt suitable for AI image generation (like Stable Diffusion)
 5. Be specific about positioning, relationships between elements, and overall aesthetic
 
-Respond with ONLY the image generation prompt, no explanations or additional text.
-"""
+After the layout lines, respond with ONLY the image generation prompt, no explanations or additional text.
+{PLAN_INSTRUCTIONS}"""
 
-        try:
-            # LM Studio API call
-            payload = {
-                "model": self.model,
-                "messages": [
-                    {
-                        "role": "user",
-                        "content": lm_studio_prompt
-                    }
-                ],
-                "temperature": 0.7,
-                "max_tokens": 500,
-                "stream": False
-            }
-            
-            response = requests.post(
-                f"{self.lm_studio_url}/v1/chat/completions",
-                json=payload,
-                headers={"Content-Type": "application/json"},
-                timeout=30
-            )
-            
-            if response.status_code == 200:
-                result = response.json()
-                if "choices" in result and len(result["choices"]) > 0:
-                    output = result["choices"][0]["message"]["content"].strip()
-                    
-                    # Clean up the output (remove any model-specific formatting)
-                    lines = output.split('\n')
-                    prompt_lines = []
-                    for line in lines:
-                        if line.strip() and not line.startswith('>') and not line.startswith('User:'):
-                            prompt_lines.append(line.strip())
-                    
-                    return ' '.join(prompt_lines)
-                else:
-                    return f"Professional promotional image: {user_prompt}, high quality, detailed, commercial photography style"
-            else:
-                return f"Professional promotional image: {user_prompt}, high quality, detailed, commercial photography style"
-            
-        except requests.exceptions.RequestException:
-            return f"Professional promotional image: {user_prompt}, high quality, detailed, commercial photography style"
-        except Exception as e:
-            return f"Professional promotional image: {user_prompt}, high quality, detailed, commercial photography style"
+        # Template names carry a version so answers cached without plan lines, or
+        # flattened to one line (which loses the plan), are not reused
+        return ("promotional_v3" if is_promotional else "image_prompt_v3"), lm_studio_prompt
     
     def generate_image_with_lm_studio(self, prompt: str, width: int = 1024, height: int = 1024) -> Optional[str]:
         """
         Generate image using LM Studio's image generation capabilities.
         Note: This assumes you have an image generation model loaded in LM Studio.
         """
+        if not self.image_breaker.allow():
+            return None
+        started = time.monotonic()
         try:
             # Try to use LM Studio's image generation if available
-            payload = {
-                "model": self.model,
-                "prompt": prompt,
-                "width": width,
-                "height": height,
-                "format": "png"
-            }
-            
-            response = requests.post(
-                f"{self.lm_studio_url}/v1/images/generations",
-                json=payload,
-                headers={"Content-Type": "application/json"},
-                timeout=60
+            response = self.client.post(
+                "/v1/images/generations",
+                json=self._image_payload(prompt, width, height),
+                timeout=self._timeout(IMAGE_READ_TIMEOUT)
             )
-            
-            if response.status_code == 200:
-                result = response.json()
-                if "data" in result and len(result["data"]) > 0:
-                    # Save the generated image
-                    image_data = base64.b64decode(result["data"][0]["b64_json"])
-                    output_path = f"backend/static/temp/generated_{hash(prompt) % 100000}.png"
-                    os.makedirs(os.path.dirname(output_path), exist_ok=True)
-                    
-                    with open(output_path, 'wb') as f:
-                        f.write(image_data)
-                    
-                    return output_path
-                else:
-                    return None
-            else:
-                return None
-                
+            image_path = self._save_generated_image(response, prompt)
         except Exception as e:
+            image_path = None
+        self._record(self.image_breaker, started, image_path is not None)
+        return image_path
+    
+    async def generate_image_with_lm_studio_async(self, prompt: str, width: int = 1024, height: int = 1024) -> Optional[str]:
+        """Async variant of generate_image_with_lm_studio"""
+        if not self.image_breaker.allow():
             return None
+        client, semaphore = self._async_state()
+        started = time.monotonic()
+        try:
+            async with semaphore:
+                response = await client.post(
+                    "/v1/images/generations",
+                    json=self._image_payload(prompt, width, height),
+                    timeout=self._timeout(IMAGE_READ_TIMEOUT)
+                )
+            # Decoding and writing the image stays off the event loop
+            image_path = await asyncio.to_thread(self._save_generated_image, response, prompt)
+        except Exception as e:
+            image_path = None
+        if self._record(self.image_breaker, started, image_path is not None):
+            self._start_probe(self.image_breaker)
+        return image_path
+    
+    def _image_payload(self, prompt: str, width: int, height: int) -> dict:
+        return {
+            "model": self.model,
+            "prompt": prompt,
+            "width": width,
+            "height": height,
+            "format": "png"
+        }
+    
+    @staticmethod
+    def _save_generated_image(response: httpx.Response, prompt: str) -> Optional[str]:
+        if response.status_code != 200:
+            return None
+        result = response.json()
+        if "data" not in result or len(result["data"]) == 0:
+            return None
+        
+        # Save the generated image
+        image_data = base64.b64decode(result["data"][0]["b64_json"])
+        output_path = f"backend/static/temp/generated_{hash(prompt) % 100000}.png"
+        os.makedirs(os.path.dirname(output_path), exist_ok=True)
+        
+        with open(output_path, 'wb') as f:
+            f.write(image_data)
+        
+        return output_path
     
     def generate_image_with_external_api(self, prompt: str, width: int = 1024, height: int = 1024) -> Optional[str]:
         """
@@ -170,7 +460,25 @@ Respond with ONLY the image generation prompt, no explanations or additional tex
         """
         Use LM Studio to refine the image generation prompt based on user feedback.
         """
-        lm_studio_prompt = f"""
+        lm_studio_prompt = self._refine_request(original_prompt, user_feedback)
+        cache_key = self._refine_cache_key(original_prompt, user_feedback)
+        return self._single_line(self._chat(lm_studio_prompt, cache_key)) or f"{original_prompt}, {user_feedback}, improved version"
+    
+    async def refine_image_prompt_async(self, original_prompt: str, user_feedback: str) -> str:
+        """Async variant of refine_image_prompt"""
+        lm_studio_prompt = self._refine_request(original_prompt, user_feedback)
+        cache_key = self._refine_cache_key(original_prompt, user_feedback)
+        text = await self._chat_async(lm_studio_prompt, cache_key)
+        return self._single_line(text) or f"{original_prompt}, {user_feedback}, improved version"
+    
+    def _refine_cache_key(self, original_prompt: str, user_feedback: str) -> str:
+        # Prompt and feedback are folded separately, so text cannot shift between them
+        prompt = json.dumps([original_prompt, user_feedback], ensure_ascii=False)
+        return self._cache_key("refine", prompt, parse_prompt_spec(original_prompt).tags)
+    
+    @staticmethod
+    def _refine_request(original_prompt: str, user_feedback: str) -> str:
+        return f"""
 You are an AI image generation prompt expert. Refine the following image generation prompt based on user feedback.
 
 Original Prompt: {original_prompt}
@@ -186,50 +494,6 @@ Instructions:
 Respond with ONLY the refined image generation prompt, no explanations.
 """
 
-        try:
-            # LM Studio API call
-            payload = {
-                "model": self.model,
-                "messages": [
-                    {
-                        "role": "user",
-                        "content": lm_studio_prompt
-                    }
-                ],
-                "temperature": 0.7,
-                "max_tokens": 500,
-                "stream": False
-            }
-            
-            response = requests.post(
-                f"{self.lm_studio_url}/v1/chat/completions",
-                json=payload,
-                headers={"Content-Type": "application/json"},
-                timeout=30
-            )
-            
-            if response.status_code == 200:
-                result = response.json()
-                if "choices" in result and len(result["choices"]) > 0:
-                    output = result["choices"][0]["message"]["content"].strip()
-                    
-                    # Clean up the output
-                    lines = output.split('\n')
-                    prompt_lines = []
-                    for line in lines:
-                        if line.strip() and not line.startswith('>') and not line.startswith('User:'):
-                            prompt_lines.append(line.strip())
-                    
-                    return ' '.join(prompt_lines)
-                else:
-                    return f"{original_prompt}, {user_feedback}, improved version"
-            else:
-                return f"{original_prompt}, {user_feedback}, improved version"
-            
-        except requests.exceptions.RequestException:
-            return f"{original_prompt}, {user_feedback}, improved version"
-        except Exception as e:
-            return f"{original_prompt}, {user_feedback}, improved version"
 
 # Global instance
 lm_studio_generator = LMStudioImageGenerator()
@@ -238,11 +502,13 @@ def generate_ai_image(user_prompt: str, tagged_images: Dict[str, str], width: in
     """
     Main function to generate AI image using LM Studio.
     """
+    # Without the image endpoint there is nothing to expand the prompt for
+    if not lm_studio_generator.images_available():
+        return None
+    
     # Extract custom dimensions from prompt if not provided
     if width is None or height is None:
-        from .image_composer import extract_canvas_size_from_prompt
-        canvas_size = extract_canvas_size_from_prompt(user_prompt)
-        width, height = canvas_size
+        width, height = parse_prompt_spec(user_prompt).canvas_size
     
     # Step 1: Convert user prompt to detailed image generation prompt
     detailed_prompt = lm_studio_generator.generate_image_prompt(user_prompt, tagged_images)
@@ -261,3 +527,30 @@ def refine_ai_image(original_prompt: str, user_feedback: str) -> str:
     Refine an image generation prompt based on user feedback.
     """
     return lm_studio_generator.refine_image_prompt(original_prompt, user_feedback)
+
+async def generate_ai_image_async(user_prompt: str, tagged_images: Dict[str, str], width: int = None,
+                                  height: int = None, on_text=None) -> Optional[str]:
+    """
+    Async variant of generate_ai_image: the LLM round-trips use the pooled
+    async client instead of tying up a server thread, and the prompt
+    expansion is streamed to on_text(piece) while the model writes it.
+    """
+    if not lm_studio_generator.images_available():
+        return None
+    
+    if width is None or height is None:
+        width, height = parse_prompt_spec(user_prompt).canvas_size
+    
+    detailed_prompt = await lm_studio_generator.generate_image_prompt_async(user_prompt, tagged_images, on_text)
+    image_path = await lm_studio_generator.generate_image_with_lm_studio_async(detailed_prompt, width, height)
+    
+    if not image_path:
+        image_path = lm_studio_generator.generate_image_with_external_api(detailed_prompt, width, height)
+    
+    return image_path
+
+async def refine_ai_image_async(original_prompt: str, user_feedback: str) -> str:
+    """
+    Async variant of refine_ai_image.
+    """
+    return await lm_studio_generator.refine_image_prompt_async(original_prompt, user_feedback)
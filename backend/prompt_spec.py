@@ -0,0 +1,318 @@
+from dataclasses import dataclass
+from functools import lru_cache
+import os
+import re
+
+# Distinct prompts whose parsed spec is kept in memory
+PROMPT_CACHE_SIZE = int(os.environ.get("PROMPT_CACHE_SIZE", 1024))
+
+TAG_PATTERN = re.compile(r'@(\w+)')
+
+# Dimension patterns, tried in order (first valid match wins)
+CANVAS_SIZE_PATTERNS = [
+    re.compile(r'(\d+)\s*x\s*(\d+)'),  # 1920x1080, 1920 x 1080
+    re.compile(r'(\d+)\s*by\s*(\d+)'),  # 1920 by 1080
+    re.compile(r'(\d+)\s*width\s*(\d+)\s*height'),  # 1920 width 1080 height
+    re.compile(r'width\s*(\d+)\s*height\s*(\d+)'),  # width 1920 height 1080
+    re.compile(r'(\d+)\s*wide\s*(\d+)\s*tall'),  # 1920 wide 1080 tall
+    re.compile(r'(\d+)\s*pixels?\s*wide\s*(\d+)\s*pixels?\s*tall'),  # 1920 pixels wide 1080 pixels tall
+    re.compile(r'size\s*(\d+)\s*x\s*(\d+)'),  # size 1920x1080
+    re.compile(r'dimensions?\s*(\d+)\s*x\s*(\d+)'),  # dimensions 1920x1080
+]
+
+ASPECT_RATIOS = {
+    'square': (1080, 1080),
+    'landscape': (1920, 1080),
+    'portrait': (1080, 1920),
+    'widescreen': (1920, 1080),
+    'instagram': (1080, 1080),
+    'youtube': (1920, 1080),
+    'facebook': (1200, 630),
+    'twitter': (1200, 675),
+}
+
+DEFAULT_CANVAS_SIZE = (1080, 1080)
+
+COLOR_MAP = {
+    'white': (255, 255, 255),
+    'black': (0, 0, 0),
+    'red': (255, 0, 0),
+    'green': (0, 255, 0),
+    'blue': (0, 0, 255),
+    'yellow': (255, 255, 0),
+    'cyan': (0, 255, 255),
+    'magenta': (255, 0, 255),
+    'gray': (128, 128, 128),
+    'grey': (128, 128, 128),
+    'orange': (255, 165, 0),
+    'purple': (128, 0, 128),
+    'pink': (255, 192, 203),
+    'brown': (165, 42, 42),
+    'lightblue': (173, 216, 230),
+    'darkblue': (0, 0, 139),
+    'lightgreen': (144, 238, 144),
+    'darkgreen': (0, 100, 0),
+}
+
+RGB_PATTERN = re.compile(r'rgb\s*\(\s*(\d+)\s*,\s*(\d+)\s*,\s*(\d+)\s*\)')
+HEX_PATTERN = re.compile(r'#([0-9a-f]{6})')
+QUOTED_TEXT_PATTERN = re.compile(r'["\']([^"\']+)["\']')
+TEXT_PATTERN = re.compile(r'text[:\s]+([^,\.]+)')
+SECONDS_PATTERN = re.compile(r'(\d+)\s*seconds?')
+ORDER_PATTERN = re.compile(r'order\s+@(\w+)(?:\s*,\s*@(\w+))*(?:\s*and\s*@(\w+))?')
+
+PRESENTATION_KEYWORDS = [
+    "presentation", "slideshow", "shift images", "slide", "show images",
+    "display images", "sequence", "order", "one by one", "turn by turn"
+]
+TEXT_OVERLAY_KEYWORDS = [
+    "add text", "with text", "text overlay", "show text", "display text",
+    "tag name", "label", "caption", "title", "white text", "text color"
+]
+TEXT_KEYWORDS = ["add text", "with text", "text", "write"]
+ANIMATION_REQUEST_KEYWORDS = ["presentation", "slideshow", "shift images", "gif", "animation"]
+PROMOTIONAL_KEYWORDS = ["promotional", "promotion", "advertisement", "ad", "marketing", "commercial", "product"]
+TEXT_COLORS = ("white", "black", "red", "blue")
+
+# Keyword -> position type, applied in this order (later keywords win)
+POSITION_KEYWORDS = [
+    ("center", "center"),
+    ("left", "left"),
+    ("right", "right"),
+    ("top", "top"),
+    ("bottom", "bottom"),
+]
+
+
+@dataclass(frozen=True)
+class PromptSpec:
+    """
+    Everything the renderers and the LLM handler read from a prompt, parsed once.
+
+    Specs are shared between callers through the parse cache, so every field
+    is immutable; the *_instructions() helpers return fresh dicts.
+    """
+    prompt: str
+    tags: tuple
+    canvas_size: tuple
+    background_color: tuple
+    positions: tuple  # ((tag, position type), ...)
+    animations: tuple  # ((tag, animation type, direction or None), ...)
+    is_presentation: bool
+    is_animation_request: bool
+    is_promotional: bool
+    wants_text_overlay: bool
+    wants_text: bool
+    custom_text: str
+    language: str
+    text_colors: tuple  # Colours named as "<colour> text", in TEXT_COLORS order
+    text_position: str
+    duration_ms: int
+    explicit_order: tuple
+
+    @property
+    def overlay_text(self):
+        """Composer text: custom text, a placeholder, or None when no text was asked for"""
+        if not self.wants_text:
+            return None
+        return self.custom_text or "Generated Image"
+
+    def positioning_instructions(self) -> dict:
+        return {tag: {"type": position, "x": 0, "y": 0} for tag, position in self.positions}
+
+    def animation_instructions(self) -> dict:
+        instructions = {}
+        for tag, kind, direction in self.animations:
+            instructions[tag] = {"type": kind}
+            if direction:
+                instructions[tag]["direction"] = direction
+        return instructions
+
+    def image_order(self, available_tags: list) -> list:
+        """Slide order: an explicit "order @a, @b" list, else @tags as mentioned, else available_tags"""
+        if self.explicit_order is not None:
+            return [tag for tag in self.explicit_order if tag in available_tags]
+        ordered_tags = []
+        for tag in self.tags:
+            if tag in available_tags and tag not in ordered_tags:
+                ordered_tags.append(tag)
+        return ordered_tags or available_tags
+
+
+@lru_cache(maxsize=PROMPT_CACHE_SIZE)
+def parse_prompt_spec(prompt: str) -> PromptSpec:
+    """Parse a prompt into a PromptSpec (memoized per prompt string)"""
+    prompt_lower = prompt.lower()
+    tags = tuple(TAG_PATTERN.findall(prompt))
+    custom_text = _parse_custom_text(prompt, prompt_lower)
+
+    timing_match = SECONDS_PATTERN.search(prompt_lower)
+
+    return PromptSpec(
+        prompt=prompt,
+        tags=tags,
+        canvas_size=_parse_canvas_size(prompt_lower),
+        background_color=_parse_background_color(prompt_lower),
+        positions=_parse_positions(prompt_lower, tags),
+        animations=_parse_animations(prompt_lower, tags),
+        is_presentation=any(keyword in prompt_lower for keyword in PRESENTATION_KEYWORDS),
+        is_animation_request=any(keyword in prompt_lower for keyword in ANIMATION_REQUEST_KEYWORDS),
+        is_promotional=any(keyword in prompt_lower for keyword in PROMOTIONAL_KEYWORDS),
+        wants_text_overlay=any(keyword in prompt_lower for keyword in TEXT_OVERLAY_KEYWORDS),
+        wants_text=any(keyword in prompt_lower for keyword in TEXT_KEYWORDS),
+        custom_text=custom_text,
+        language=_parse_language(prompt, prompt_lower),
+        text_colors=tuple(color for color in TEXT_COLORS if f"{color} text" in prompt_lower),
+        text_position=_parse_text_position(prompt_lower),
+        duration_ms=int(timing_match.group(1)) * 1000 if timing_match else None,
+        explicit_order=_parse_explicit_order(prompt_lower),
+    )
+
+
+def prompt_cache_stats() -> dict:
+    info = parse_prompt_spec.cache_info()
+    return {"hits": info.hits, "misses": info.misses, "entries": info.currsize, "max_entries": info.maxsize}
+
+
+def _parse_canvas_size(prompt_lower: str) -> tuple:
+    return find_canvas_size(prompt_lower) or DEFAULT_CANVAS_SIZE
+
+
+def find_canvas_size(text_lower: str):
+    """Canvas size stated in lower-cased text, or None"""
+    for pattern in CANVAS_SIZE_PATTERNS:
+        match = pattern.search(text_lower)
+        if match:
+            width = int(match.group(1))
+            height = int(match.group(2))
+
+            # Validate reasonable dimensions
+            if 100 <= width <= 4000 and 100 <= height <= 4000:
+                return (width, height)
+
+    # Look for common aspect ratios
+    for ratio_name, dimensions in ASPECT_RATIOS.items():
+        if ratio_name in text_lower:
+            return dimensions
+
+    return None
+
+
+def _parse_background_color(prompt_lower: str) -> tuple:
+    # Default to white
+    return find_background_color(prompt_lower) or (255, 255, 255)
+
+
+def find_background_color(text_lower: str):
+    """Background colour stated in lower-cased text, or None"""
+    # Color keywords
+    for color_name, rgb in COLOR_MAP.items():
+        if f'{color_name} background' in text_lower or f'background {color_name}' in text_lower or f'{color_name} color' in text_lower:
+            return rgb
+
+    # RGB values (e.g., "rgb(255, 0, 0)")
+    match = RGB_PATTERN.search(text_lower)
+    if match:
+        r, g, b = int(match.group(1)), int(match.group(2)), int(match.group(3))
+        if 0 <= r <= 255 and 0 <= g <= 255 and 0 <= b <= 255:
+            return (r, g, b)
+
+    # Hex color values (e.g., "#FF0000")
+    match = HEX_PATTERN.search(text_lower)
+    if match:
+        hex_color = match.group(1)
+        return (int(hex_color[0:2], 16), int(hex_color[2:4], 16), int(hex_color[4:6], 16))
+
+    return None
+
+
+def _parse_positions(prompt_lower: str, tags: tuple) -> tuple:
+    positioning = {}
+
+    # The first tag becomes the background / foreground image
+    if tags and ("background" in prompt_lower or "bg" in prompt_lower):
+        positioning[tags[0]] = "background"
+    if tags and ("front" in prompt_lower or "foreground" in prompt_lower):
+        positioning[tags[0]] = "front"
+
+    for keyword, position in POSITION_KEYWORDS:
+        if keyword in prompt_lower:
+            for tag in tags:
+                positioning[tag] = position
+
+    return tuple(positioning.items())
+
+
+def _parse_animations(prompt_lower: str, tags: tuple) -> tuple:
+    moving = "moving" in prompt_lower or "move" in prompt_lower
+    kind, direction = "static", None
+
+    if moving:
+        if "left to right" in prompt_lower:
+            kind, direction = "slide_horizontal", "left_to_right"
+        elif "right to left" in prompt_lower:
+            kind, direction = "slide_horizontal", "right_to_left"
+        elif "up to down" in prompt_lower or "top to bottom" in prompt_lower:
+            kind, direction = "slide_vertical", "top_to_bottom"
+        elif "down to up" in prompt_lower or "bottom to top" in prompt_lower:
+            kind, direction = "slide_vertical", "bottom_to_top"
+        elif "rotate" in prompt_lower or "spinning" in prompt_lower:
+            kind = "rotate"
+        elif "bounce" in prompt_lower:
+            kind = "bounce"
+        elif "fade" in prompt_lower:
+            kind = "fade"
+
+    # Rotating and fading do not need a "move" keyword
+    if kind == "static":
+        if "rotate" in prompt_lower or "spinning" in prompt_lower:
+            kind = "rotate"
+        elif "fade" in prompt_lower:
+            kind = "fade"
+    if kind == "fade":
+        direction = "out" if "fade out" in prompt_lower else "in"
+
+    if "stable" in prompt_lower or "static" in prompt_lower:
+        kind, direction = "static", None
+
+    # Every tag gets the same instruction
+    return tuple((tag, kind, direction) for tag in dict.fromkeys(tags))
+
+
+def _parse_custom_text(prompt: str, prompt_lower: str):
+    # Quoted text
+    match = QUOTED_TEXT_PATTERN.search(prompt)
+    if match:
+        return match.group(1)
+
+    # "text: <content>", keeping the original case
+    match = TEXT_PATTERN.search(prompt_lower)
+    if match:
+        return prompt[match.start(1):match.end(1)].strip()
+
+    return None
+
+
+def _parse_language(prompt: str, prompt_lower: str) -> str:
+    if "hindi" in prompt_lower or "हिंदी" in prompt:
+        return "hindi"
+    if "spanish" in prompt_lower:
+        return "spanish"
+    if "french" in prompt_lower:
+        return "french"
+    return "english"
+
+
+def _parse_text_position(prompt_lower: str) -> str:
+    if "top" in prompt_lower and "text" in prompt_lower:
+        return "top"
+    if "center" in prompt_lower and "text" in prompt_lower:
+        return "center"
+    return "bottom"
+
+
+def _parse_explicit_order(prompt_lower: str):
+    match = ORDER_PATTERN.search(prompt_lower)
+    if not match:
+        return None
+    return tuple(tag for tag in match.groups() if tag)
@@ -0,0 +1,171 @@
+from collections import OrderedDict
+import dataclasses
+import hashlib
+import json
+import os
+import shutil
+import threading
+import uuid
+
+try:
+    from .image_cache import file_digest
+    from .prompt_spec import parse_prompt_spec
+except ImportError:
+    from image_cache import file_digest
+    from prompt_spec import parse_prompt_spec
+
+# Render cache limits (environment overridable); RENDER_CACHE_BYTES=0 disables it
+RENDER_CACHE_BYTES = int(os.environ.get("RENDER_CACHE_BYTES", 1024 * 1024 * 1024))
+
+# Bump when renderer output changes, so old artifacts are never served
+RENDER_CACHE_VERSION = 3
+
+
+def render_key(kind: str, prompt: str, image_paths: dict, output_format: str, **params) -> str:
+    """
+    Deterministic key for one render.
+
+    Built from the parsed prompt (not its raw text, so prompts that parse the
+    same share a result), the content hash of every tagged image in the order
+    the renderer layers them, the canvas size, the output format and any
+    extra renderer parameters.
+    """
+    spec = dataclasses.asdict(parse_prompt_spec(prompt))
+    del spec["prompt"]
+    payload = {
+        "version": RENDER_CACHE_VERSION,
+        "kind": kind,
+        "spec": spec,
+        "inputs": [(tag, file_digest(path)) for tag, path in image_paths.items()],
+        "canvas_size": spec["canvas_size"],
+        "format": output_format,
+        "params": params,
+    }
+    return hashlib.sha256(json.dumps(payload, sort_keys=True, default=list).encode()).hexdigest()
+
+
+class RenderCache:
+    """
+    Finished renders on disk, keyed by render_key.
+
+    Artifacts are hard-linked between the cache and session output folders
+    (copied when the two are on different filesystems), so a hit costs no
+    rendering and no data copy. Total size is bounded by max_bytes with LRU
+    eviction; file mtimes carry the LRU order across restarts.
+    """
+
+    def __init__(self, root: str, max_bytes: int = RENDER_CACHE_BYTES):
+        self.root = root
+        self.max_bytes = max_bytes
+        self._entries = OrderedDict()  # key -> (path, nbytes), least recently used first
+        self._bytes = 0
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        os.makedirs(root, exist_ok=True)
+        self._load()
+
+    def _load(self):
+        """Index artifacts left by a previous run, oldest first"""
+        found = []
+        for name in os.listdir(self.root):
+            path = os.path.join(self.root, name)
+            if name.endswith(".part") or not os.path.isfile(path):
+                continue
+            stat = os.stat(path)
+            found.append((stat.st_mtime, os.path.splitext(name)[0], path, stat.st_size))
+        for _, key, path, nbytes in sorted(found):
+            self._entries[key] = (path, nbytes)
+            self._bytes += nbytes
+        with self._lock:
+            self._evict()
+
+    def fetch(self, key: str, dest_path: str) -> bool:
+        """Place the cached artifact for key at dest_path; False on a miss"""
+        if self.max_bytes <= 0:
+            return False
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                self.misses += 1
+                return False
+            self._entries.move_to_end(key)
+
+        try:
+            link_or_copy(entry[0], dest_path)
+            os.utime(entry[0])
+        except FileNotFoundError:
+            # Removed behind our back: forget it and render again
+            with self._lock:
+                if self._entries.pop(key, None):
+                    self._bytes -= entry[1]
+                self.misses += 1
+            return False
+
+        with self._lock:
+            self.hits += 1
+        return True
+
+    def store(self, key: str, src_path: str):
+        """Keep a freshly rendered artifact under key"""
+        if self.max_bytes <= 0 or not os.path.exists(src_path):
+            return
+        nbytes = os.path.getsize(src_path)
+        if nbytes > self.max_bytes:
+            return
+
+        cache_path = os.path.join(self.root, f"{key}{os.path.splitext(src_path)[1]}")
+        partial_path = f"{cache_path}.{uuid.uuid4().hex}.part"
+        link_or_copy(src_path, partial_path)
+        os.replace(partial_path, cache_path)
+
+        with self._lock:
+            previous = self._entries.pop(key, None)
+            if previous:
+                self._bytes -= previous[1]
+            self._entries[key] = (cache_path, nbytes)
+            self._bytes += nbytes
+            self._evict()
+
+    def _evict(self):
+        while self._bytes > self.max_bytes and self._entries:
+            _, (path, nbytes) = self._entries.popitem(last=False)
+            self._bytes -= nbytes
+            self.evictions += 1
+            try:
+                os.remove(path)
+            except FileNotFoundError:
+                pass
+
+    def clear(self):
+        with self._lock:
+            for path, _ in self._entries.values():
+                try:
+                    os.remove(path)
+                except FileNotFoundError:
+                    pass
+            self._entries.clear()
+            self._bytes = 0
+
+    def stats(self) -> dict:
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                "entries": len(self._entries),
+                "bytes": self._bytes,
+                "max_bytes": self.max_bytes,
+                "hits": self.hits,
+                "misses": self.misses,
+                "evictions": self.evictions,
+                "hit_rate": round(self.hits / lookups, 4) if lookups else 0.0,
+            }
+
+
+def link_or_copy(src_path: str, dest_path: str):
+    try:
+        os.link(src_path, dest_path)
+    except OSError as e:
+        if isinstance(e, FileNotFoundError):
+            raise
+        shutil.copyfile(src_path, dest_path)
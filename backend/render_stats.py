@@ -0,0 +1,42 @@
+try:
+    from .animation_timeline import timeline_cache_stats
+    from .image_cache import sprite_cache
+    from .prompt_spec import prompt_cache_stats
+    from .text_labels import label_cache_stats
+except ImportError:
+    from animation_timeline import timeline_cache_stats
+    from image_cache import sprite_cache
+    from prompt_spec import prompt_cache_stats
+    from text_labels import label_cache_stats
+
+
+def render_cache_stats() -> dict:
+    """Counters of the in-memory caches that render jobs fill (sprites, prompts, labels, timelines), for the current process"""
+    return {
+        "sprites": sprite_cache.stats(),
+        "prompts": prompt_cache_stats(),
+        "labels": label_cache_stats(),
+        "timelines": timeline_cache_stats(),
+    }
+
+
+def merge_cache_stats(reports: list) -> dict:
+    """
+    Sum render_cache_stats() reports from several processes.
+
+    Counters and budgets add up (every process has its own cache), hit rates
+    are recomputed from the totals, and "processes" says how many reported.
+    """
+    merged = {}
+    for report in reports:
+        for cache, stats in report.items():
+            totals = merged.setdefault(cache, {})
+            for name, value in stats.items():
+                if name != "hit_rate" and value is not None:
+                    totals[name] = totals.get(name, 0) + value
+    for totals in merged.values():
+        lookups = totals.get("hits", 0) + totals.get("misses", 0)
+        if "hits" in totals:
+            totals["hit_rate"] = round(totals["hits"] / lookups, 4) if lookups else 0.0
+        totals["processes"] = len(reports)
+    return merged
@@ -0,0 +1,329 @@
+from collections import OrderedDict
+from datetime import datetime
+from typing import Dict, List, Optional
+import bisect
+import os
+import sqlite3
+import threading
+
+# last_activity is only written back when it is older than this many seconds,
+# so busy sessions do not turn every read into a write
+TOUCH_INTERVAL = 30
+
+# Sessions whose images/tags index the SQLite store keeps decoded per process
+IMAGE_INDEX_CACHE_SIZE = 1024
+
+
+class InMemorySessionStore:
+    """
+    Session store backed by a dict in this process (the default).
+
+    Sessions are lost on restart and cannot be shared between uvicorn workers.
+    """
+
+    def __init__(self):
+        self._sessions: Dict[str, Dict] = {}
+        self._blob_refs: Dict[str, int] = {}  # image filename -> number of sessions using it
+        self._lock = threading.Lock()
+
+    def create(self, session_id: str, upload_dir: str, output_dir: str) -> Dict:
+        now = datetime.now()
+        session = {
+            "created_at": now,
+            "upload_dir": upload_dir,
+            "output_dir": output_dir,
+            "images": {},  # filename -> tag mapping
+            "tags": {},  # tag -> filenames in upload order
+            "image_seq": {},  # filename -> upload position
+            "last_activity": now
+        }
+        with self._lock:
+            self._sessions[session_id] = session
+        return session
+
+    def get(self, session_id: str) -> Optional[Dict]:
+        return self._sessions.get(session_id)
+
+    def touch(self, session_id: str, last_activity: datetime = None):
+        session = self._sessions.get(session_id)
+        if session:
+            session["last_activity"] = datetime.now()
+
+    def add_image(self, session_id: str, filename: str) -> bool:
+        """Add an image to the session and take a reference on it; False if it was already there"""
+        with self._lock:
+            session = self._sessions[session_id]
+            if filename in session["images"]:
+                return False
+            session["images"][filename] = None
+            session["image_seq"][filename] = len(session["image_seq"])
+            self._blob_refs[filename] = self._blob_refs.get(filename, 0) + 1
+            return True
+
+    def set_tag(self, session_id: str, filename: str, tag: str):
+        with self._lock:
+            session = self._sessions[session_id]
+            old_tag = session["images"].get(filename)
+            if old_tag == tag:
+                return
+            session["images"][filename] = tag
+
+            # Keep the reverse index in sync, ordered by upload position
+            if old_tag is not None:
+                session["tags"][old_tag].remove(filename)
+                if not session["tags"][old_tag]:
+                    del session["tags"][old_tag]
+            bisect.insort(session["tags"].setdefault(tag, []), filename, key=session["image_seq"].get)
+
+    def delete(self, session_id: str, release_image=None):
+        """
+        Remove a session and drop its image references.
+
+        release_image(filename) is called, while the store is still locked, for
+        every image no other session refers to any more.
+        """
+        with self._lock:
+            session = self._sessions.pop(session_id, None)
+            if not session:
+                return
+            for filename in session["images"]:
+                self._blob_refs[filename] -= 1
+                if self._blob_refs[filename] == 0:
+                    del self._blob_refs[filename]
+                    if release_image:
+                        release_image(filename)
+
+    def idle_sessions(self, max_idle_seconds: float) -> List[str]:
+        """Return ids of sessions without activity for longer than max_idle_seconds"""
+        current_time = datetime.now()
+        return [
+            session_id for session_id, session in list(self._sessions.items())
+            if (current_time - session["last_activity"]).total_seconds() > max_idle_seconds
+        ]
+
+
+class SQLiteSessionStore:
+    """
+    Session store backed by a SQLite database on disk.
+
+    Several uvicorn workers can point at the same file; WAL journaling lets
+    readers proceed while one worker writes, and sessions survive restarts.
+
+    Each session row carries images_version, bumped whenever its images or
+    tags change, so get() reads one row and reuses the images/tags index it
+    built last time until another write (from any worker) bumps the version.
+    """
+
+    def __init__(self, db_path: str):
+        self.db_path = db_path
+        self._local = threading.local()
+        self._image_index = OrderedDict()  # session_id -> (created_at, images_version, images, tags)
+        self._index_lock = threading.Lock()
+        os.makedirs(os.path.dirname(db_path) or ".", exist_ok=True)
+
+        conn = self._connection()
+        with conn:
+            conn.executescript("""
+                CREATE TABLE IF NOT EXISTS sessions (
+                    session_id TEXT PRIMARY KEY,
+                    created_at REAL NOT NULL,
+                    upload_dir TEXT NOT NULL,
+                    output_dir TEXT NOT NULL,
+                    last_activity REAL NOT NULL,
+                    images_version INTEGER NOT NULL DEFAULT 0
+                );
+                CREATE TABLE IF NOT EXISTS session_images (
+                    seq INTEGER PRIMARY KEY AUTOINCREMENT,
+                    session_id TEXT NOT NULL,
+                    filename TEXT NOT NULL,
+                    tag TEXT,
+                    UNIQUE (session_id, filename)
+                );
+                CREATE INDEX IF NOT EXISTS session_images_tag
+                    ON session_images (session_id, tag);
+                CREATE INDEX IF NOT EXISTS sessions_activity
+                    ON sessions (last_activity);
+                CREATE TABLE IF NOT EXISTS blob_refs (
+                    filename TEXT PRIMARY KEY,
+                    refcount INTEGER NOT NULL
+                );
+            """)
+            columns = [row[1] for row in conn.execute("PRAGMA table_info(sessions)")]
+            if "images_version" not in columns:
+                # Databases created before the version column
+                conn.execute("ALTER TABLE sessions ADD COLUMN images_version INTEGER NOT NULL DEFAULT 0")
+
+    def _connection(self) -> sqlite3.Connection:
+        """One connection per thread; SQLite handles locking between processes"""
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            conn = sqlite3.connect(self.db_path, timeout=10)
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=NORMAL")
+            self._local.conn = conn
+        return conn
+
+    def create(self, session_id: str, upload_dir: str, output_dir: str) -> Dict:
+        now = datetime.now()
+        conn = self._connection()
+        with conn:
+            conn.execute(
+                "INSERT INTO sessions (session_id, created_at, upload_dir, output_dir, last_activity) "
+                "VALUES (?, ?, ?, ?, ?)",
+                (session_id, now.timestamp(), upload_dir, output_dir, now.timestamp())
+            )
+        return {
+            "created_at": now,
+            "upload_dir": upload_dir,
+            "output_dir": output_dir,
+            "images": {},
+            "tags": {},
+            "last_activity": now
+        }
+
+    def get(self, session_id: str) -> Optional[Dict]:
+        conn = self._connection()
+        row = conn.execute(
+            "SELECT created_at, upload_dir, output_dir, last_activity, images_version FROM sessions "
+            "WHERE session_id = ?",
+            (session_id,)
+        ).fetchone()
+        if row is None:
+            return None
+
+        images, tags = self._images_and_tags(conn, session_id, row[0], row[4])
+        return {
+            "created_at": datetime.fromtimestamp(row[0]),
+            "upload_dir": row[1],
+            "output_dir": row[2],
+            "images": images,
+            "tags": tags,
+            "last_activity": datetime.fromtimestamp(row[3])
+        }
+
+    def _images_and_tags(self, conn: sqlite3.Connection, session_id: str, created_at: float, version: int):
+        """The session's images and tag index, rebuilt from its rows only when version moved on"""
+        with self._index_lock:
+            cached = self._image_index.get(session_id)
+            if cached and cached[:2] == (created_at, version):
+                self._image_index.move_to_end(session_id)
+                return cached[2], cached[3]
+
+        # A write landing after the version was read only makes these rows newer
+        # than their version, so the next get() rebuilds them once more
+        rows = conn.execute(
+            "SELECT filename, tag FROM session_images WHERE session_id = ? ORDER BY seq",
+            (session_id,)
+        ).fetchall()
+
+        images = {}
+        tags = {}
+        for filename, tag in rows:
+            images[filename] = tag
+            if tag is not None:
+                tags.setdefault(tag, []).append(filename)
+
+        with self._index_lock:
+            self._image_index[session_id] = (created_at, version, images, tags)
+            self._image_index.move_to_end(session_id)
+            while len(self._image_index) > IMAGE_INDEX_CACHE_SIZE:
+                self._image_index.popitem(last=False)
+        return images, tags
+
+    def touch(self, session_id: str, last_activity: datetime = None):
+        """
+        Record activity on a session.
+
+        last_activity is the value get() just read; when it is recent the
+        write (and SQLite's write lock) is skipped altogether.
+        """
+        now = datetime.now().timestamp()
+        if last_activity is not None and now - last_activity.timestamp() < TOUCH_INTERVAL:
+            return
+        conn = self._connection()
+        with conn:
+            conn.execute(
+                "UPDATE sessions SET last_activity = ? WHERE session_id = ? AND last_activity < ?",
+                (now, session_id, now - TOUCH_INTERVAL)
+            )
+
+    def add_image(self, session_id: str, filename: str) -> bool:
+        """Add an image to the session and take a reference on it; False if it was already there"""
+        conn = self._connection()
+        with conn:
+            inserted = conn.execute(
+                "INSERT OR IGNORE INTO session_images (session_id, filename, tag) VALUES (?, ?, NULL)",
+                (session_id, filename)
+            ).rowcount
+            if inserted:
+                self._bump_images_version(conn, session_id)
+                conn.execute(
+                    "INSERT INTO blob_refs (filename, refcount) VALUES (?, 1) "
+                    "ON CONFLICT (filename) DO UPDATE SET refcount = refcount + 1",
+                    (filename,)
+                )
+        return bool(inserted)
+
+    def set_tag(self, session_id: str, filename: str, tag: str):
+        conn = self._connection()
+        with conn:
+            changed = conn.execute(
+                "UPDATE session_images SET tag = ? WHERE session_id = ? AND filename = ? AND tag IS NOT ?",
+                (tag, session_id, filename, tag)
+            ).rowcount
+            if changed:
+                self._bump_images_version(conn, session_id)
+
+    @staticmethod
+    def _bump_images_version(conn: sqlite3.Connection, session_id: str):
+        conn.execute("UPDATE sessions SET images_version = images_version + 1 WHERE session_id = ?", (session_id,))
+
+    def delete(self, session_id: str, release_image=None):
+        """
+        Remove a session and drop its image references.
+
+        release_image(filename) is called inside the write transaction for every
+        image no other session refers to any more, so a concurrent upload of the
+        same content in another worker waits until the file is gone.
+        """
+        conn = self._connection()
+        with conn:
+            conn.execute("BEGIN IMMEDIATE")
+            filenames = [row[0] for row in conn.execute(
+                "SELECT filename FROM session_images WHERE session_id = ?", (session_id,)
+            )]
+            conn.execute("DELETE FROM session_images WHERE session_id = ?", (session_id,))
+            conn.execute("DELETE FROM sessions WHERE session_id = ?", (session_id,))
+            with self._index_lock:
+                self._image_index.pop(session_id, None)
+
+            for filename in filenames:
+                conn.execute("UPDATE blob_refs SET refcount = refcount - 1 WHERE filename = ?", (filename,))
+                row = conn.execute("SELECT refcount FROM blob_refs WHERE filename = ?", (filename,)).fetchone()
+                if row and row[0] <= 0:
+                    conn.execute("DELETE FROM blob_refs WHERE filename = ?", (filename,))
+                    if release_image:
+                        release_image(filename)
+
+    def idle_sessions(self, max_idle_seconds: float) -> List[str]:
+        """Return ids of sessions without activity for longer than max_idle_seconds"""
+        cutoff = datetime.now().timestamp() - max_idle_seconds
+        rows = self._connection().execute(
+            "SELECT session_id FROM sessions WHERE last_activity < ?", (cutoff,)
+        ).fetchall()
+        return [row[0] for row in rows]
+
+
+def create_session_store(backend: str, db_path: str):
+    """
+    Build the session store selected by backend.
+
+    Args:
+        backend: "memory" (default, single process) or "sqlite" (shared, persistent)
+        db_path: Database file used by the sqlite backend
+    """
+    if backend == "sqlite":
+        return SQLiteSessionStore(db_path)
+    if backend == "memory":
+        return InMemorySessionStore()
+    raise ValueError(f"Unknown session store backend: {backend}")
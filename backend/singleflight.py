@@ -0,0 +1,46 @@
+import asyncio
+import functools
+
+
+class SingleFlight:
+    """
+    Coalesce concurrent identical async calls.
+
+    The first do() for a key starts the call; every do() with the same key
+    made while it runs awaits that same call and gets its result (or its
+    exception). Once it finishes the key is forgotten, so later calls start
+    afresh. A caller that is cancelled stops waiting without cancelling the
+    call for the others; the call is only cancelled when nobody waits for it.
+    """
+
+    def __init__(self):
+        self._flights = {}  # key -> [task, number of waiting callers]
+        self.calls = 0
+        self.shared = 0
+
+    async def do(self, key, fn, *args, **kwargs):
+        """Return await fn(*args, **kwargs), shared with identical calls already in flight under key"""
+        flight = self._flights.get(key)
+        if flight is None:
+            flight = [asyncio.ensure_future(fn(*args, **kwargs)), 0]
+            self._flights[key] = flight
+            flight[0].add_done_callback(functools.partial(self._forget, key, flight))
+            self.calls += 1
+        else:
+            self.shared += 1
+
+        task = flight[0]
+        flight[1] += 1
+        try:
+            return await asyncio.shield(task)
+        finally:
+            flight[1] -= 1
+            if flight[1] == 0 and not task.done():
+                task.cancel()
+
+    def _forget(self, key, flight, task):
+        if self._flights.get(key) is flight:
+            del self._flights[key]
+
+    def stats(self) -> dict:
+        return {"calls": self.calls, "shared": self.shared, "in_flight": len(self._flights)}
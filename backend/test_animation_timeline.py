@@ -0,0 +1,39 @@
+"""
+Tests for the precomputed animation timeline.
+"""
+
+from animation_timeline import ALPHA, X, Y, animation_track, build_timeline, describe_timeline
+
+
+def test_slide_spans_canvas_using_sprite_size():
+    track = animation_track((100, 50), {"type": "slide_horizontal", "direction": "left_to_right"}, (800, 600), 10)
+
+    assert track.shape == (10, 4)
+    assert track[0, X] == 0
+    assert track[-1, X] == 700
+    assert (track[:, Y] == 275).all()
+    assert (track[:, ALPHA] == 1).all()
+
+
+def test_tracks_are_shared_and_read_only():
+    instruction = {"type": "bounce"}
+    first = animation_track((64, 64), instruction, (400, 300), 60)
+
+    assert animation_track((64, 64), instruction, (400, 300), 60) is first
+    assert not first.flags.writeable
+
+
+def test_timeline_covers_every_tag():
+    timeline = build_timeline({"a": (50, 50), "b": (80, 40)}, {"a": {"type": "rotate"}}, (400, 300), 12)
+
+    assert set(timeline) == {"a", "b"}
+    assert len(describe_timeline(timeline)["b"]) == 12
+    assert describe_timeline(timeline)["b"][0] == {"x": 160.0, "y": 130.0, "alpha": 1.0, "angle": 0.0}
+    assert describe_timeline(timeline)["a"][3] == {"x": 175.0, "y": 125.0, "alpha": 1.0, "angle": 90.0}
+
+
+def test_fade_out_ramps_alpha_down():
+    track = animation_track((50, 50), {"type": "fade", "direction": "out"}, (400, 300), 5)
+
+    assert list(track[:, ALPHA]) == [1.0, 0.75, 0.5, 0.25, 0.0]
+    assert (track[:, X] == 175).all()
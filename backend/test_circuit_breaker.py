@@ -0,0 +1,46 @@
+"""
+Tests for the LM Studio circuit breaker.
+"""
+
+from circuit_breaker import CLOSED, HALF_OPEN, OPEN, CircuitBreaker
+
+
+def test_opens_after_consecutive_failures_and_fails_fast():
+    breaker = CircuitBreaker("images", failure_threshold=3, reset_timeout=60)
+
+    assert not breaker.record_failure(0.1)
+    breaker.record_success(0.1)
+    for _ in range(2):
+        assert not breaker.record_failure(0.1)
+    assert breaker.record_failure(0.1)
+
+    assert breaker.state == OPEN
+    assert not breaker.available
+    assert not breaker.allow()
+    stats = breaker.stats()
+    assert (stats["failures"], stats["rejected"], stats["opened"]) == (4, 1, 1)
+
+
+def test_half_open_trial_closes_or_reopens():
+    breaker = CircuitBreaker("chat", failure_threshold=1, reset_timeout=0)
+    breaker.record_failure(1.0)
+
+    # reset_timeout passed: one trial goes through
+    assert breaker.allow()
+    assert breaker.state == HALF_OPEN
+    assert breaker.record_failure(1.0)
+    assert breaker.state == OPEN
+
+    assert breaker.allow()
+    breaker.record_success(0.2)
+    assert breaker.state == CLOSED and breaker.allow()
+
+
+def test_background_probe_moves_the_retry_time():
+    breaker = CircuitBreaker("images", failure_threshold=1, reset_timeout=60)
+    breaker.record_failure(0.1)
+
+    breaker.hold_open()
+    assert not breaker.available
+    breaker.probe_succeeded()
+    assert breaker.available and breaker.allow()
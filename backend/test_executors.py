@@ -0,0 +1,97 @@
+"""
+Tests for running jobs off the event loop with timeouts and disconnect handling.
+"""
+
+import asyncio
+from concurrent.futures import ThreadPoolExecutor
+import threading
+
+import pytest
+import executors
+from executors import ClientDisconnected, JobTimeout, run_async, run_in_pool
+
+
+class FakeRequest:
+    def __init__(self, disconnected=True):
+        self.disconnected = disconnected
+
+    async def is_disconnected(self):
+        return self.disconnected
+
+
+@pytest.fixture
+def busy_pool():
+    """Single-worker pool whose worker is held until the test ends, so new jobs stay queued"""
+    pool = ThreadPoolExecutor(max_workers=1)
+    release = threading.Event()
+    pool.submit(release.wait)
+    yield pool, release
+    release.set()
+    pool.shutdown(wait=True)
+
+
+def drain(busy_pool):
+    """Free the worker and wait until every job that was not cancelled has run"""
+    pool, release = busy_pool
+    release.set()
+    pool.shutdown(wait=True)
+
+
+def run_queued_job(pool, ran, **kwargs):
+    async def main():
+        await run_in_pool(pool, ran.append, "ran", **kwargs)
+
+    asyncio.run(main())
+
+
+def test_finished_job_returns_its_result():
+    with ThreadPoolExecutor(max_workers=1) as pool:
+        assert asyncio.run(run_in_pool(pool, pow, 2, 5, timeout=1)) == 32
+
+
+def test_timeout_raises_and_cancels_the_queued_job(busy_pool):
+    ran = []
+    with pytest.raises(JobTimeout):
+        run_queued_job(busy_pool[0], ran, timeout=0.01)
+    drain(busy_pool)
+    assert ran == []
+
+
+def test_disconnect_raises_and_cancels_the_queued_job(busy_pool, monkeypatch):
+    monkeypatch.setattr(executors, "DISCONNECT_POLL_INTERVAL", 0.001)
+    ran = []
+    with pytest.raises(ClientDisconnected):
+        run_queued_job(busy_pool[0], ran, timeout=5, request=FakeRequest())
+    drain(busy_pool)
+    assert ran == []
+
+
+def test_connected_client_keeps_waiting_for_the_job():
+    with ThreadPoolExecutor(max_workers=1) as pool:
+        result = asyncio.run(run_in_pool(pool, pow, 3, 2, timeout=1, request=FakeRequest(disconnected=False)))
+    assert result == 9
+
+
+def test_coroutine_is_cancelled_on_timeout_and_disconnect():
+    cancelled = []
+
+    async def slow():
+        try:
+            await asyncio.sleep(5)
+        except asyncio.CancelledError:
+            cancelled.append(True)
+            raise
+
+    async def main(**kwargs):
+        task = asyncio.ensure_future(run_async(slow, **kwargs))
+        try:
+            return await task
+        finally:
+            # Let the cancelled coroutine run its handler before the loop closes
+            await asyncio.sleep(0)
+
+    with pytest.raises(JobTimeout):
+        asyncio.run(main(timeout=0.01))
+    with pytest.raises(ClientDisconnected):
+        asyncio.run(main(timeout=5, request=FakeRequest()))
+    assert cancelled == [True, True]
@@ -0,0 +1,57 @@
+"""
+Tests for parallel frame rendering.
+"""
+
+from PIL import Image
+from animation_timeline import build_timeline
+from frame_pool import get_frame_pool, parallel_animation_frames
+from gif_encoder import build_shared_palette, quantize_frame
+from gif_generator import animation_frames
+
+
+def make_layers():
+    sprite = Image.new("RGBA", (40, 30), (200, 40, 40, 255))
+    layers = {"a": {"sprite": sprite}, "b": {"sprite": sprite.rotate(30, expand=True)}}
+    instructions = {"a": {"type": "rotate"}, "b": {"type": "slide_horizontal", "direction": "left_to_right"}}
+    timeline = build_timeline({tag: layer["sprite"].size for tag, layer in layers.items()}, instructions, (160, 120), 10)
+    return layers, timeline
+
+
+def test_parallel_frames_match_serial_frames_in_order():
+    layers, timeline = make_layers()
+    serial = list(animation_frames(layers, timeline, (160, 120), 10))
+    parallel = list(parallel_animation_frames(layers, timeline, (160, 120), 10, workers=2))
+
+    assert len(parallel) == len(serial)
+    for (expected, expected_box), (frame, box) in zip(serial[1:], parallel[1:]):
+        assert frame.tobytes() == expected.tobytes()
+        assert box == expected_box
+    assert parallel[0][0].tobytes() == serial[0][0].tobytes()
+
+
+def test_parallel_frames_quantize_dirty_area():
+    layers, timeline = make_layers()
+    palette = build_shared_palette([layer["sprite"] for layer in layers.values()])
+    serial = list(animation_frames(layers, timeline, (160, 120), 10))
+    parallel = list(parallel_animation_frames(layers, timeline, (160, 120), 10, palette, workers=2))
+
+    assert parallel[0][0].mode == "P"
+    assert parallel[0][0].tobytes() == quantize_frame(serial[0][0], palette).tobytes()
+    frame, box = parallel[5]
+    expected = quantize_frame(serial[5][0].crop(box), palette)
+    assert frame.crop(box).tobytes() == expected.tobytes()
+
+
+def test_frame_pool_is_reused_across_animations():
+    layers, timeline = make_layers()
+    list(parallel_animation_frames(layers, timeline, (160, 120), 10, workers=2))
+    pool = get_frame_pool()
+
+    # Different sprites under the same tags must not pick up the previous animation's state
+    blue = Image.new("RGBA", (20, 50), (40, 40, 200, 255))
+    other = {"a": {"sprite": blue}, "b": {"sprite": blue}}
+    serial = list(animation_frames(other, timeline, (160, 120), 10))
+    parallel = list(parallel_animation_frames(other, timeline, (160, 120), 10, workers=2))
+
+    assert get_frame_pool() is pool
+    assert [frame.tobytes() for frame, _ in parallel] == [frame.tobytes() for frame, _ in serial]
@@ -0,0 +1,99 @@
+"""
+Tests for the animation output formats.
+"""
+
+import cv2
+import pytest
+from PIL import Image
+import frame_writers
+from frame_writers import OutputTooLarge, check_webp_size, h264_available, open_frame_writer
+from gif_encoder import build_frame_palette
+
+
+def frames(count=4, size=(64, 48)):
+    return [Image.new("RGB", size, (i * 60, 100, 200)) for i in range(count)]
+
+
+def test_gif_palette_sampled_from_frame_generator(tmp_path):
+    output = str(tmp_path / "out.gif")
+    palette = build_frame_palette(frame for frame in frames())
+    with open_frame_writer("gif", output, (64, 48), 100, palette) as writer:
+        for frame in frames():
+            writer.add_frame(frame)
+
+    with Image.open(output) as gif:
+        assert gif.n_frames == 4
+
+
+def test_webp_writes_every_frame(tmp_path):
+    output = str(tmp_path / "out.webp")
+    with open_frame_writer("webp", output, (64, 48), 100) as writer:
+        for frame in frames():
+            writer.add_frame(frame)
+
+    with Image.open(output) as webp:
+        assert webp.format == "WEBP"
+        assert webp.n_frames == 4
+        webp.seek(3)
+        assert webp.convert("RGB").getpixel((10, 10))[0] > 150
+
+
+@pytest.mark.skipif(not h264_available(), reason="ffmpeg without libx264")
+def test_mp4_is_h264_repeats_long_frames_and_evens_size(tmp_path):
+    output = str(tmp_path / "out.mp4")
+    with open_frame_writer("mp4", output, (65, 49), 2000) as writer:
+        for frame in frames(size=(65, 49)):
+            writer.add_frame(frame)
+
+    video = cv2.VideoCapture(output)
+    assert video.get(cv2.CAP_PROP_FRAME_COUNT) == 8
+    assert (video.get(cv2.CAP_PROP_FRAME_WIDTH), video.get(cv2.CAP_PROP_FRAME_HEIGHT)) == (64, 48)
+    fourcc = int(video.get(cv2.CAP_PROP_FOURCC))
+    assert fourcc.to_bytes(4, "little") in (b"avc1", b"h264")
+    video.release()
+
+
+def test_unknown_format_is_rejected(tmp_path):
+    with pytest.raises(ValueError):
+        open_frame_writer("avi", str(tmp_path / "out.avi"), (64, 48), 100)
+
+
+def test_mp4_without_h264_is_refused(tmp_path, monkeypatch):
+    monkeypatch.setattr(frame_writers, "h264_available", lambda: False)
+    assert not frame_writers.output_format_available("mp4")
+    with pytest.raises(RuntimeError):
+        open_frame_writer("mp4", str(tmp_path / "out.mp4"), (64, 48), 100)
+
+
+def test_empty_animation_writes_nothing(tmp_path):
+    formats = [("gif", build_frame_palette(frames(1))), ("webp", None)] + ([("mp4", None)] if h264_available() else [])
+    for output_format, palette in formats:
+        output = tmp_path / f"empty.{output_format}"
+        with open_frame_writer(output_format, str(output), (64, 48), 100, palette):
+            pass
+        assert not output.exists()
+
+
+def test_webp_refuses_frames_over_its_budget(tmp_path):
+    with pytest.raises(OutputTooLarge):
+        check_webp_size((64, 48), 4, max_bytes=64 * 48 * 3 * 3)
+    check_webp_size((64, 48), 3, max_bytes=64 * 48 * 3 * 3)
+
+    writer = frame_writers.WebPWriter(str(tmp_path / "out.webp"), (64, 48), 100, max_bytes=64 * 48 * 3 * 3)
+    for frame in frames(3):
+        writer.add_frame(frame)
+    with pytest.raises(OutputTooLarge):
+        writer.add_frame(frames(1)[0])
+
+
+def test_oversized_webp_animation_is_refused_before_drawing(tmp_path):
+    from gif_generator import create_animated_gif
+
+    sprite = tmp_path / "logo.png"
+    Image.new("RGB", (32, 32), (200, 0, 0)).save(sprite)
+    output = tmp_path / "out.webp"
+
+    with pytest.raises(OutputTooLarge):
+        create_animated_gif({"logo": str(sprite)}, "1920x1920 @logo moving from left to right",
+                            str(output), frame_count=60, output_format="webp")
+    assert not output.exists()
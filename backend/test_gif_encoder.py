@@ -0,0 +1,60 @@
+"""
+Tests for the delta GIF writer.
+"""
+
+from PIL import Image, ImageSequence
+from gif_encoder import QUANTIZERS, GifDeltaWriter, build_frame_palette, build_shared_palette, union_boxes
+
+
+def render_frames(sprite, canvas_size=(200, 150), count=6):
+    frames, boxes = [], []
+    for i in range(count):
+        canvas = Image.new("RGB", canvas_size, (255, 255, 255))
+        canvas.paste(sprite, (10 + i * 20, 20), sprite)
+        frames.append(canvas)
+        boxes.append((10 + i * 20, 20, 10 + i * 20 + sprite.size[0], 20 + sprite.size[1]))
+    return frames, boxes
+
+
+def test_delta_frames_decode_to_full_frames(tmp_path):
+    sprite = Image.new("RGBA", (30, 30), (200, 30, 40, 255))
+    palette = build_shared_palette([sprite])
+    frames, boxes = render_frames(sprite)
+    output = str(tmp_path / "out.gif")
+
+    with GifDeltaWriter(output, frames[0].size, palette, 100) as writer:
+        previous = None
+        for frame, box in zip(frames, boxes):
+            writer.add_frame(frame, union_boxes([previous, box]) if previous else None)
+            previous = box
+
+    with Image.open(output) as gif:
+        decoded = [frame.convert("RGB") for frame in ImageSequence.Iterator(gif)]
+
+    assert len(decoded) == len(frames)
+    for frame, got in zip(frames, decoded):
+        expected = frame.quantize(palette=palette, dither=Image.Dither.NONE).convert("RGB")
+        assert got.tobytes() == expected.tobytes()
+
+
+def test_unchanged_frame_keeps_timing(tmp_path):
+    sprite = Image.new("RGBA", (30, 30), (20, 160, 40, 255))
+    frames, _ = render_frames(sprite, count=1)
+    output = str(tmp_path / "still.gif")
+
+    with GifDeltaWriter(output, frames[0].size, build_shared_palette([sprite]), 100) as writer:
+        writer.add_frame(frames[0])
+        writer.add_frame(frames[0], (0, 0, 0, 0))
+
+    with Image.open(output) as gif:
+        assert gif.n_frames == 2
+
+
+def test_frame_palette_is_deterministic_for_every_quantizer():
+    frames = [Image.new("RGB", (640, 360), color) for color in ((0, 0, 0), (250, 120, 10), (10, 80, 200))]
+
+    for method in QUANTIZERS:
+        first = build_frame_palette(frames, method).getpalette()
+        assert build_frame_palette(frames, method).getpalette() == first
+        colors = {tuple(first[i:i + 3]) for i in range(0, len(first), 3)}
+        assert {(0, 0, 0), (250, 120, 10), (10, 80, 200)} <= colors
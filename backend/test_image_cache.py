@@ -0,0 +1,106 @@
+"""
+Tests for the shared decoded-sprite cache.
+"""
+
+from PIL import Image
+from image_cache import SpriteCache, decode_for_target, file_digest, load_sprite, sprite_cache
+
+
+def make_image(path, size=(400, 300), color=(100, 150, 200)):
+    Image.new("RGB", size, color=color).save(path)
+    return str(path)
+
+
+def test_load_sprite_hits_cache_for_same_content(tmp_path):
+    first = make_image(tmp_path / "first.png")
+    copy = make_image(tmp_path / "copy.png")
+    sprite_cache.clear()
+    hits_before = sprite_cache.hits
+
+    img = load_sprite(first, (200, 150))
+    again = load_sprite(copy, (200, 150))
+
+    assert img.size == (200, 150)
+    assert img.mode == "RGBA"
+    assert again is img
+    assert sprite_cache.hits == hits_before + 1
+
+
+def test_load_sprite_keys_on_target_size(tmp_path):
+    path = make_image(tmp_path / "image.png")
+    sprite_cache.clear()
+
+    small = load_sprite(path, (100, 75))
+    full = load_sprite(path)
+
+    assert small.size == (100, 75)
+    assert full.size == (400, 300)
+
+
+def test_file_digest_changes_with_content(tmp_path):
+    path = make_image(tmp_path / "image.png")
+    digest = file_digest(path)
+    make_image(tmp_path / "image.png", color=(0, 0, 0), size=(401, 300))
+
+    assert file_digest(path) != digest
+
+
+def test_cache_evicts_least_recently_used_by_bytes():
+    cache = SpriteCache(max_bytes=3 * 10 * 10 * 4)
+    images = [Image.new("RGBA", (10, 10)) for _ in range(4)]
+    for idx, img in enumerate(images[:3]):
+        cache.put(("key", idx), img)
+
+    assert cache.get(("key", 0)) is images[0]
+    cache.put(("key", 3), images[3])
+
+    assert cache.get(("key", 1)) is None
+    assert cache.get(("key", 0)) is images[0]
+    stats = cache.stats()
+    assert stats["entries"] == 3
+    assert stats["evictions"] == 1
+    assert stats["bytes"] <= stats["max_bytes"]
+
+
+def test_blob_digest_comes_from_the_name(tmp_path):
+    digest = "ab" + "0" * 62
+    (tmp_path / "ab").mkdir()
+    path = tmp_path / "ab" / f"{digest}.png"
+    Image.new("RGB", (4, 4)).save(path)
+
+    assert file_digest(str(path)) == digest
+
+
+def make_jpeg(path, size, orientation=None):
+    exif = Image.Exif()
+    if orientation:
+        exif[0x0112] = orientation
+    Image.new("RGB", size, (200, 80, 40)).save(path, "JPEG", exif=exif.tobytes())
+    return str(path)
+
+
+def test_jpeg_decodes_at_reduced_scale_covering_target(tmp_path):
+    path = make_jpeg(tmp_path / "photo.jpg", (2000, 1600))
+
+    img = decode_for_target(path, (400, 300))
+
+    # draft picks the 1/4 scale: the smallest that still covers 400x300
+    assert img.size == (500, 400)
+    assert img.mode == "RGBA"
+
+
+def test_draft_decoding_respects_exif_rotation(tmp_path):
+    # Stored 1600x2000, displayed 2000x1600
+    path = make_jpeg(tmp_path / "photo.jpg", (1600, 2000), orientation=6)
+
+    img = decode_for_target(path, (400, 300))
+
+    assert img.size == (500, 400)
+    assert img.size[0] >= 400 and img.size[1] >= 300
+
+
+def test_non_jpeg_decodes_at_full_size(tmp_path):
+    path = tmp_path / "image.png"
+    Image.new("RGB", (2000, 1600)).save(path)
+
+    assert decode_for_target(str(path), (400, 300)).size == (2000, 1600)
@@ -0,0 +1,52 @@
+"""
+Tests for upload-time image pyramids.
+"""
+
+from PIL import Image
+from image_cache import decode_for_target
+from image_pyramid import PYRAMID_LEVELS, best_level_path, build_pyramid, level_path
+
+ORIENTATION = 0x0112
+
+
+def make_jpeg(path, size, orientation=None):
+    exif = Image.Exif()
+    if orientation:
+        exif[ORIENTATION] = orientation
+    Image.new("RGB", size, (200, 80, 40)).save(path, "JPEG", exif=exif.tobytes())
+    return str(path)
+
+
+def test_pyramid_levels_are_exif_oriented_rgba(tmp_path):
+    # Stored landscape, displayed portrait (rotated 90 degrees)
+    path = make_jpeg(tmp_path / "photo.jpg", (3000, 1500), orientation=6)
+
+    written = build_pyramid(path)
+
+    assert written == [level_path(path, level) for level in sorted(PYRAMID_LEVELS, reverse=True)]
+    for level in PYRAMID_LEVELS:
+        with Image.open(level_path(path, level)) as img:
+            assert img.size == (level // 2, level)
+            assert img.mode == "RGBA"
+    # Levels that already exist are not built again
+    assert build_pyramid(path) == []
+
+
+def test_best_level_is_smallest_covering_the_target(tmp_path):
+    path = make_jpeg(tmp_path / "photo.jpg", (3000, 1500))
+    build_pyramid(path)
+
+    # 512 gives 512x256, too narrow for 600x300; 1024 gives 1024x512
+    chosen = best_level_path(path, (3000, 1500), (600, 300))
+    assert chosen == level_path(path, 1024)
+    decoded = decode_for_target(chosen, (600, 300))
+    assert decoded.size[0] >= 600 and decoded.size[1] >= 300
+
+    assert best_level_path(path, (3000, 1500), (200, 100)) == level_path(path, 512)
+    # Nothing stored covers it, so the original is decoded
+    assert best_level_path(path, (3000, 1500), (2500, 1250)) == path
+
+
+def test_best_level_falls_back_without_pyramid(tmp_path):
+    path = make_jpeg(tmp_path / "photo.jpg", (3000, 1500))
+    assert best_level_path(path, (3000, 1500), (600, 300)) == path
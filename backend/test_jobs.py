@@ -0,0 +1,137 @@
+"""
+Tests for the background job queue.
+"""
+
+import asyncio
+
+import pytest
+import jobs
+from jobs import JobElsewhere, JobManager, QueueFull, set_job_stage
+
+
+@pytest.fixture(autouse=True)
+def thread_executor(monkeypatch):
+    # Progress stays in this process, no multiprocessing manager needed
+    monkeypatch.setattr(jobs, "RENDER_EXECUTOR", "thread")
+
+
+async def wait_for(manager, job_id, *statuses):
+    while manager.describe(manager.get(job_id))["status"] not in statuses:
+        await asyncio.sleep(0.001)
+    return manager.describe(manager.get(job_id))
+
+
+def test_submit_poll_done():
+    manager = JobManager(max_queue=4, workers=1)
+
+    async def main():
+        gate = asyncio.Event()
+
+        async def run(job):
+            set_job_stage(job, "rendering")
+            manager.frame_progress(job)(3, 10)
+            await gate.wait()
+            return {"image_path": "out.png"}
+
+        await manager.start()
+        try:
+            job = manager.submit("session", "generate", run)
+            assert manager.describe(job)["status"] == "queued"
+
+            await wait_for(manager, job["job_id"], "running")
+            await asyncio.sleep(0.01)
+            running = manager.describe(manager.get(job["job_id"]))
+            assert running["stage"] == "rendering"
+            assert running["progress"] == {"frames_rendered": 3, "frame_count": 10}
+
+            gate.set()
+            return await wait_for(manager, job["job_id"], "succeeded", "failed")
+        finally:
+            await manager.stop()
+
+    done = asyncio.run(main())
+    assert done["status"] == "succeeded" and done["stage"] == "done"
+    assert done["result"] == {"image_path": "out.png"} and done["error"] is None
+
+
+def test_failed_job_reports_its_error():
+    manager = JobManager(max_queue=4, workers=1)
+
+    async def main():
+        async def run(job):
+            raise ValueError("no images")
+
+        await manager.start()
+        try:
+            job = manager.submit("session", "generate", run)
+            return await wait_for(manager, job["job_id"], "succeeded", "failed")
+        finally:
+            await manager.stop()
+
+    failed = asyncio.run(main())
+    assert failed["status"] == "failed" and failed["error"] == "no images"
+
+
+def test_full_queue_is_refused():
+    manager = JobManager(max_queue=1, workers=1)
+
+    async def main():
+        gate = asyncio.Event()
+
+        async def run(job):
+            await gate.wait()
+            return {}
+
+        await manager.start()
+        try:
+            first = manager.submit("session", "generate", run)
+            await wait_for(manager, first["job_id"], "running")
+            # One job waits in the queue, the next is refused and never registered
+            manager.submit("session", "generate", run)
+            with pytest.raises(QueueFull):
+                manager.submit("session", "generate", run)
+            assert len(manager.jobs) == 2
+        finally:
+            # Stopping takes the running job down with it
+            await manager.stop()
+        assert first["status"] == "cancelled"
+
+    asyncio.run(main())
+
+
+def test_cancel_queued_and_running_jobs():
+    manager = JobManager(max_queue=4, workers=1)
+    ran = []
+
+    async def main():
+        async def run(job):
+            ran.append(job["job_id"])
+            await asyncio.sleep(5)
+            return {}
+
+        await manager.start()
+        try:
+            running = manager.submit("session", "generate", run)
+            queued = manager.submit("session", "generate", run)
+            await wait_for(manager, running["job_id"], "running")
+
+            assert manager.cancel(queued["job_id"])
+            assert manager.cancel(running["job_id"])
+            await wait_for(manager, running["job_id"], "cancelled")
+            await asyncio.sleep(0.01)
+            # Finished jobs cannot be cancelled again
+            assert not manager.cancel(running["job_id"])
+            return running, queued
+        finally:
+            await manager.stop()
+
+    running, queued = asyncio.run(main())
+    assert running["status"] == queued["status"] == "cancelled"
+    assert ran == [running["job_id"]]
+
+
+def test_jobs_of_another_worker_are_told_apart_from_unknown_ones():
+    manager = JobManager()
+    assert manager.get(f"{manager.worker_id}-missing") is None
+    with pytest.raises(JobElsewhere):
+        manager.get(f"{JobManager().worker_id}-missing")
@@ -0,0 +1,53 @@
+"""
+Tests for extracting a layout plan from streamed LLM text.
+"""
+
+from layout_plan import LayoutPlanParser, strip_layout_plan
+
+
+def test_plan_fills_in_from_finished_lines():
+    parser = LayoutPlanParser("@logo @product promotional banner", ["logo", "product"])
+    assert not parser.sufficient
+
+    # Unfinished lines are held back
+    assert not parser.feed("CANVAS: 1200x")
+    assert not parser.feed("628")
+    assert parser.feed("\nBACKGROUND: navy blue\nBACKGROUND: blue\n@logo: top")
+    assert parser.describe()["canvas_size"] == [1200, 628]
+    assert parser.describe()["positions"] == {}
+
+    assert parser.feed("\n@product: left side\nA bold banner for the product...")
+    assert parser.sufficient
+    assert parser.layout() == {
+        "canvas_size": [1200, 628],
+        "background_color": [0, 0, 255],
+        "positions": {"logo": "top", "product": "left"},
+    }
+
+
+def test_prompt_values_win_and_plain_prompts_have_no_layout():
+    parser = LayoutPlanParser("@a on the right, 640x480 red background", ["a"])
+    assert parser.sufficient and parser.layout() is None
+
+    parser.feed("CANVAS: 1920x1080\nBACKGROUND: white\n@a: center\n")
+    assert parser.layout() is None
+
+    parser = LayoutPlanParser("@a 640x480", ["a"])
+    parser.feed("BACKGROUND: #00ff00")
+    parser.finish()
+    assert parser.layout() == {"canvas_size": [640, 480], "background_color": [0, 255, 0], "positions": {}}
+
+
+def test_descriptive_prose_is_not_layout():
+    parser = LayoutPlanParser("@logo make a poster", ["logo"])
+    parser.feed("Portrait of a product with @logo, subtle grey color grading, bottom-lit.\n")
+    parser.feed("A serene landscape photograph with a white background behind @logo at the top, 1920x1080")
+    parser.finish()
+    assert parser.layout() is None
+    assert parser.describe()["positions"] == {}
+
+
+def test_plan_lines_are_stripped_from_the_image_prompt():
+    text = "CANVAS: 1080x1080\nBACKGROUND: white\n@logo: top\nA clean poster with @logo.\n"
+    assert strip_layout_plan(text) == "A clean poster with @logo."
+    assert strip_layout_plan(None) is None
@@ -0,0 +1,50 @@
+"""
+Tests for the LLM response cache.
+"""
+
+import os
+
+from llm_cache import ResponseCache, normalize_prompt, response_key
+
+
+def test_normalize_prompt_folds_case_whitespace_and_tag_runs():
+    assert normalize_prompt("@b and @a  on  Blue\n") == normalize_prompt("@a, @b on blue")
+    # Tags in different parts of the sentence keep their places
+    assert normalize_prompt("@a left of @b") != normalize_prompt("@b left of @a")
+
+    key = response_key("model", "image_prompt", "@a @b", ["b", "a"])
+    assert response_key("model", "image_prompt", "@B @A", {"a": "1.png", "b": "2.png"}) == key
+    assert response_key("model", "promotional", "@a @b", ["a", "b"]) != key
+    assert response_key("model", "image_prompt", "@a @b", ["a"]) != key
+
+
+def test_entries_expire_and_evict_least_recently_used(monkeypatch):
+    import llm_cache
+
+    now = [1000.0]
+    monkeypatch.setattr(llm_cache.time, "time", lambda: now[0])
+    cache = ResponseCache(max_entries=2, ttl=60)
+
+    cache.put("a", "A")
+    cache.put("b", "B")
+    assert cache.get("a") == "A"
+    cache.put("c", "C")
+    assert cache.get("b") is None
+
+    now[0] += 61
+    assert cache.get("a") is None
+    stats = cache.stats()
+    assert (stats["hits"], stats["misses"], stats["evictions"], stats["expirations"]) == (1, 2, 1, 1)
+
+
+def test_entries_persist_across_instances(tmp_path):
+    path = str(tmp_path / "llm_cache.json")
+    cache = ResponseCache(path=path, flush_interval=60)
+    cache.put("key", "expanded prompt")
+
+    # put() never writes; the timer or an explicit flush does
+    assert not os.path.exists(path)
+    cache.flush()
+
+    assert ResponseCache(path=path).get("key") == "expanded prompt"
+    assert ResponseCache(path=path, ttl=-1).get("key") is None
@@ -0,0 +1,195 @@
+"""
+Tests for the LM Studio client, driven through httpx.MockTransport.
+"""
+
+import asyncio
+import base64
+import io
+import json
+
+import httpx
+from PIL import Image
+from circuit_breaker import CircuitBreaker, OPEN
+from layout_plan import LayoutPlanParser
+from llm_cache import ResponseCache
+import ollama_handler
+from ollama_handler import LMStudioImageGenerator
+
+
+def png_b64():
+    buffer = io.BytesIO()
+    Image.new("RGB", (8, 8), (255, 0, 0)).save(buffer, "PNG")
+    return base64.b64encode(buffer.getvalue()).decode()
+
+
+def sse(*pieces):
+    events = [f"data: {json.dumps({'choices': [{'delta': {'content': piece}}]})}\n\n" for piece in pieces]
+    return "".join(events) + "data: [DONE]\n\n"
+
+
+class FakeLMStudio:
+    """Records requests and answers chat completions (JSON or streamed) and image generations"""
+
+    def __init__(self, answer="A red product shot", chat_status=200, image_status=200):
+        self.answer = answer
+        self.chat_status = chat_status
+        self.image_status = image_status
+        self.requests = []
+
+    def __call__(self, request: httpx.Request) -> httpx.Response:
+        body = json.loads(request.content) if request.content else {}
+        self.requests.append((request.url.path, body))
+        if request.url.path == "/v1/chat/completions":
+            if self.chat_status != 200:
+                return httpx.Response(self.chat_status)
+            if body.get("stream"):
+                # Split mid-line, the way tokens arrive
+                middle = len(self.answer) // 2
+                return httpx.Response(
+                    200, headers={"content-type": "text/event-stream"},
+                    text=sse(self.answer[:middle], self.answer[middle:]),
+                )
+            return httpx.Response(200, json={"choices": [{"message": {"content": self.answer}}]})
+        if request.url.path == "/v1/images/generations":
+            if self.image_status != 200:
+                return httpx.Response(self.image_status)
+            return httpx.Response(200, json={"data": [{"b64_json": png_b64()}]})
+        return httpx.Response(404)
+
+    def paths(self):
+        return [path for path, _ in self.requests]
+
+
+def generator(server, **kwargs):
+    return LMStudioImageGenerator(
+        lm_studio_url="http://lm-studio", response_cache=ResponseCache(path=None),
+        transport=httpx.MockTransport(server), **kwargs
+    )
+
+
+def test_sync_client_is_pooled_and_answers_are_cached():
+    server = FakeLMStudio()
+    lm = generator(server)
+
+    assert lm.refine_image_prompt("a product", "make it red") == "A red product shot"
+    client = lm.client
+    assert lm.refine_image_prompt("a product", "make it red") == "A red product shot"
+
+    assert lm.client is client
+    assert server.paths() == ["/v1/chat/completions"]
+    assert server.requests[0][1]["stream"] is False
+
+
+def test_async_completion_is_streamed_from_server_sent_events():
+    server = FakeLMStudio()
+    lm = generator(server)
+    pieces = []
+
+    async def main():
+        text = await lm._chat_async("prompt", "key", on_text=pieces.append)
+        client, _ = lm._async_state()
+        again = await lm._chat_async("prompt", "key")
+        assert lm._async_state()[0] is client
+        await lm.aclose()
+        return text, again
+
+    text, again = asyncio.run(main())
+    assert text == again == "A red product shot"
+    assert pieces == ["A red pro", "duct shot"]
+    assert server.requests[0][1]["stream"] is True
+    assert server.paths() == ["/v1/chat/completions"]
+
+
+def test_servers_ignoring_stream_still_answer():
+    server = FakeLMStudio()
+    lm = generator(server)
+    pieces = []
+
+    async def stream_ignored():
+        client = httpx.AsyncClient(base_url="http://lm-studio", transport=httpx.MockTransport(
+            lambda request: httpx.Response(200, json={"choices": [{"message": {"content": "Plain answer"}}]})
+        ))
+        async with client:
+            return await lm._stream_completion(client, "prompt", pieces.append)
+
+    assert asyncio.run(stream_ignored()) == "Plain answer"
+    assert pieces == ["Plain answer"]
+
+
+def test_failing_chat_opens_breaker_and_falls_back_without_calls():
+    server = FakeLMStudio(chat_status=500)
+    lm = generator(server)
+    lm.chat_breaker = CircuitBreaker("chat", failure_threshold=2, reset_timeout=60)
+
+    for _ in range(3):
+        assert lm.refine_image_prompt("a product", "make it red") == "a product, make it red, improved version"
+
+    # The third call failed fast without reaching the server
+    assert server.paths() == ["/v1/chat/completions"] * 2
+    assert lm.chat_breaker.state == OPEN
+
+
+def test_unserved_image_endpoint_opens_breaker(tmp_path, monkeypatch):
+    monkeypatch.chdir(tmp_path)
+    server = FakeLMStudio(image_status=404)
+    lm = generator(server)
+    lm.image_breaker = CircuitBreaker("images", failure_threshold=1, reset_timeout=60)
+
+    assert lm.generate_image_with_lm_studio("prompt", 64, 64) is None
+    assert not lm.images_available()
+    assert lm.generate_image_with_lm_studio("prompt", 64, 64) is None
+    assert server.paths() == ["/v1/images/generations"]
+
+    server.image_status = 200
+    lm.image_breaker = CircuitBreaker("images")
+    assert lm.generate_image_with_lm_studio("prompt", 64, 64) is not None
+    assert lm.image_breaker.stats()["successes"] == 1
+
+
+PLANNED_ANSWER = (
+    "CANVAS: 1200x628\nBACKGROUND: white\n@red: left\n@blue: right\n"
+    "A glossy product shot of @red and @blue\non a marble table."
+)
+
+
+def test_image_endpoint_gets_the_expansion_without_plan_lines(tmp_path, monkeypatch):
+    monkeypatch.chdir(tmp_path)
+    server = FakeLMStudio(answer=PLANNED_ANSWER)
+    lm = generator(server)
+    monkeypatch.setattr(ollama_handler, "lm_studio_generator", lm)
+    tagged_images = {"red": "red.png", "blue": "blue.png"}
+
+    assert ollama_handler.generate_ai_image("@red and @blue product shot", tagged_images) is not None
+    assert asyncio.run(
+        ollama_handler.generate_ai_image_async("@red and @blue on a table", tagged_images)
+    ) is not None
+
+    prompts = [body["prompt"] for path, body in server.requests if path == "/v1/images/generations"]
+    assert prompts == ["A glossy product shot of @red and @blue on a marble table."] * 2
+
+
+def test_cached_expansion_keeps_its_layout_plan(tmp_path):
+    server = FakeLMStudio(answer=PLANNED_ANSWER)
+    lm = generator(server)
+    lm.response_cache = ResponseCache(path=str(tmp_path / "llm_cache.json"))
+    prompt, tagged_images = "@red and @blue product shot", {"red": "red.png", "blue": "blue.png"}
+
+    def plan_of_expansion():
+        parser = LayoutPlanParser(prompt, list(tagged_images))
+        text = asyncio.run(lm.generate_image_prompt_async(prompt, tagged_images, on_text=parser.feed))
+        parser.finish()
+        return text, parser.layout()
+
+    streamed = plan_of_expansion()
+    # Reloaded from disk, as after a restart
+    lm.response_cache.flush()
+    lm.response_cache = ResponseCache(path=str(tmp_path / "llm_cache.json"))
+    cached = plan_of_expansion()
+
+    assert server.paths() == ["/v1/chat/completions"]
+    assert cached == streamed
+    assert cached[1] == {
+        "canvas_size": [1200, 628],
+        "background_color": [255, 255, 255],
+        "positions": {"red": "left", "blue": "right"},
+    }
@@ -0,0 +1,43 @@
+"""
+Tests for the shared prompt parser.
+"""
+
+import dataclasses
+
+import pytest
+from prompt_spec import parse_prompt_spec
+
+
+def test_parses_layout_in_one_spec():
+    spec = parse_prompt_spec("@logo center @bg background 1280x720 red background 'Sale' blue text")
+
+    assert spec.tags == ("logo", "bg")
+    assert spec.canvas_size == (1280, 720)
+    assert spec.background_color == (255, 0, 0)
+    assert spec.positioning_instructions() == {
+        "logo": {"type": "center", "x": 0, "y": 0},
+        "bg": {"type": "center", "x": 0, "y": 0},
+    }
+    assert spec.custom_text == "Sale"
+    assert spec.text_colors == ("blue",)
+
+
+def test_spec_is_memoized_and_immutable():
+    spec = parse_prompt_spec("@a @b fade out")
+
+    assert parse_prompt_spec("@a @b fade out") is spec
+    with pytest.raises(dataclasses.FrozenInstanceError):
+        spec.canvas_size = (1, 1)
+
+    # Callers get their own dicts, so the cached spec cannot be changed through them
+    spec.animation_instructions()["a"]["type"] = "static"
+    assert spec.animation_instructions()["a"] == {"type": "fade", "direction": "out"}
+
+
+def test_presentation_fields():
+    spec = parse_prompt_spec("presentation order @b, @a 3 seconds add text")
+
+    assert spec.is_presentation
+    assert spec.wants_text_overlay
+    assert spec.duration_ms == 3000
+    assert spec.image_order(["a", "b", "c"]) == ["b", "a"]
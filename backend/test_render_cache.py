@@ -0,0 +1,72 @@
+"""
+Tests for the on-disk render-result cache.
+"""
+
+import os
+
+from PIL import Image
+from render_cache import RenderCache, render_key
+
+
+def make_image(path, color=(100, 150, 200)):
+    Image.new("RGB", (64, 48), color=color).save(path)
+    return str(path)
+
+
+def make_artifact(path, nbytes):
+    with open(path, "wb") as f:
+        f.write(b"x" * nbytes)
+    return str(path)
+
+
+def test_render_key_follows_spec_and_image_content(tmp_path):
+    images = {"cat": make_image(tmp_path / "cat.png")}
+    key = render_key("animation", "@cat moving left to right", images, "gif")
+
+    # Same spec, same content under another path
+    copy = {"cat": make_image(tmp_path / "copy.png")}
+    assert render_key("animation", "@cat  moving left to right", copy, "gif") == key
+
+    assert render_key("animation", "@cat moving left to right", images, "webp") != key
+    assert render_key("animation", "@cat moving right to left", images, "gif") != key
+    changed = {"cat": make_image(tmp_path / "other.png", color=(1, 2, 3))}
+    assert render_key("animation", "@cat moving left to right", changed, "gif") != key
+
+
+def test_render_key_follows_layering_order(tmp_path):
+    back, front = make_image(tmp_path / "back.png"), make_image(tmp_path / "front.png", color=(1, 2, 3))
+
+    # Images are pasted in image_paths order, so the other order is another picture
+    assert render_key("compose", "@a @b", {"a": back, "b": front}, "png") != \
+        render_key("compose", "@a @b", {"b": front, "a": back}, "png")
+
+
+def test_fetch_links_cached_artifact(tmp_path):
+    cache = RenderCache(str(tmp_path / "cache"), max_bytes=1000)
+    rendered = make_artifact(tmp_path / "first.gif", 100)
+
+    assert not cache.fetch("k", str(tmp_path / "miss.gif"))
+    cache.store("k", rendered)
+    assert cache.fetch("k", str(tmp_path / "second.gif"))
+
+    with open(tmp_path / "second.gif", "rb") as f:
+        assert f.read() == b"x" * 100
+    stats = cache.stats()
+    assert (stats["hits"], stats["misses"], stats["entries"], stats["hit_rate"]) == (1, 1, 1, 0.5)
+
+
+def test_store_evicts_least_recently_used(tmp_path):
+    root = str(tmp_path / "cache")
+    cache = RenderCache(root, max_bytes=250)
+    for key in ("a", "b"):
+        cache.store(key, make_artifact(tmp_path / f"{key}.gif", 100))
+
+    assert cache.fetch("a", str(tmp_path / "a-again.gif"))
+    cache.store("c", make_artifact(tmp_path / "c.gif", 100))
+
+    assert not cache.fetch("b", str(tmp_path / "b-again.gif"))
+    assert cache.stats()["evictions"] == 1
+    assert sorted(os.listdir(root)) == ["a.gif", "c.gif"]
+
+    # The index is rebuilt from disk on restart
+    assert RenderCache(root, max_bytes=250).stats()["entries"] == 2
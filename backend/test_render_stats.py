@@ -0,0 +1,20 @@
+"""
+Tests for summing per-process cache counters.
+"""
+
+from render_stats import merge_cache_stats, render_cache_stats
+
+
+def test_worker_reports_are_summed():
+    worker = {"sprites": {"entries": 2, "bytes": 100, "max_bytes": 1000, "hits": 3, "misses": 1, "hit_rate": 0.75}}
+    api = {"sprites": {"entries": 0, "bytes": 0, "max_bytes": 1000, "hits": 0, "misses": 0, "hit_rate": 0.0}}
+
+    merged = merge_cache_stats([api, worker, worker])
+
+    assert merged["sprites"] == {
+        "entries": 4, "bytes": 200, "max_bytes": 3000, "hits": 6, "misses": 2, "hit_rate": 0.75, "processes": 3,
+    }
+
+
+def test_local_report_covers_every_render_cache():
+    assert set(render_cache_stats()) == {"sprites", "prompts", "labels", "timelines"}
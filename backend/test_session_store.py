@@ -0,0 +1,129 @@
+"""
+Tests for the in-memory and SQLite session stores.
+"""
+
+import pytest
+from session_store import InMemorySessionStore, SQLiteSessionStore
+
+
+@pytest.fixture(params=["memory", "sqlite"])
+def store(request, tmp_path):
+    if request.param == "sqlite":
+        return SQLiteSessionStore(str(tmp_path / "sessions.db"))
+    return InMemorySessionStore()
+
+
+def test_images_and_tags_round_trip(store):
+    store.create("s1", "/uploads/s1", "/output/s1")
+    store.add_image("s1", "b.png")
+    store.add_image("s1", "a.png")
+    store.set_tag("s1", "a.png", "logo")
+
+    session = store.get("s1")
+    assert session["upload_dir"] == "/uploads/s1"
+    assert list(session["images"].items()) == [("b.png", None), ("a.png", "logo")]
+
+
+def test_delete_and_missing_session(store):
+    store.create("s1", "/uploads/s1", "/output/s1")
+    store.delete("s1")
+
+    assert store.get("s1") is None
+    assert store.get("unknown") is None
+
+
+def test_idle_sessions(store):
+    store.create("s1", "/uploads/s1", "/output/s1")
+
+    assert store.idle_sessions(3600) == []
+    assert store.idle_sessions(-1) == ["s1"]
+
+
+def test_sqlite_store_is_shared_between_instances(tmp_path):
+    db_path = str(tmp_path / "sessions.db")
+    SQLiteSessionStore(db_path).create("s1", "/uploads/s1", "/output/s1")
+    other = SQLiteSessionStore(db_path)
+    other.add_image("s1", "a.png")
+
+    assert SQLiteSessionStore(db_path).get("s1")["images"] == {"a.png": None}
+
+
+def test_tag_index_follows_retagging_in_upload_order(store):
+    store.create("s1", "/uploads/s1", "/output/s1")
+    for filename in ["a.png", "b.png", "c.png"]:
+        store.add_image("s1", filename)
+    store.set_tag("s1", "c.png", "logo")
+    store.set_tag("s1", "a.png", "logo")
+    store.set_tag("s1", "b.png", "hero")
+    store.set_tag("s1", "c.png", "hero")
+
+    assert store.get("s1")["tags"] == {"logo": ["a.png"], "hero": ["b.png", "c.png"]}
+
+
+def test_shared_images_are_released_with_their_last_session(store):
+    released = []
+    store.create("s1", "/uploads/s1", "/output/s1")
+    store.create("s2", "/uploads/s2", "/output/s2")
+
+    assert store.add_image("s1", "logo.png") is True
+    assert store.add_image("s1", "logo.png") is False
+    store.add_image("s2", "logo.png")
+    store.add_image("s2", "photo.png")
+
+    store.delete("s1", release_image=released.append)
+    assert released == []
+
+    store.delete("s2", release_image=released.append)
+    assert sorted(released) == ["logo.png", "photo.png"]
+
+
+def test_sqlite_touch_skips_the_write_for_recent_activity(tmp_path):
+    store = SQLiteSessionStore(str(tmp_path / "sessions.db"))
+    store.create("s1", "/uploads/s1", "/output/s1")
+    conn = store._connection()
+    changes = conn.total_changes
+
+    store.touch("s1", store.get("s1")["last_activity"])
+    assert conn.total_changes == changes
+
+    with conn:
+        conn.execute("UPDATE sessions SET last_activity = 0 WHERE session_id = 's1'")
+    store.touch("s1", store.get("s1")["last_activity"])
+    assert store.get("s1")["last_activity"].timestamp() > 0
+
+
+def test_sqlite_tag_index_is_reused_until_another_worker_changes_it(tmp_path):
+    db_path = str(tmp_path / "sessions.db")
+    store = SQLiteSessionStore(db_path)
+    store.create("s1", "/uploads/s1", "/output/s1")
+    store.add_image("s1", "a.png")
+    store.set_tag("s1", "a.png", "logo")
+
+    first = store.get("s1")
+    assert store.get("s1")["tags"] is first["tags"]
+
+    other = SQLiteSessionStore(db_path)
+    other.add_image("s1", "b.png")
+    other.set_tag("s1", "b.png", "logo")
+    assert store.get("s1")["tags"] == {"logo": ["a.png", "b.png"]}
+
+    # Re-assigning the same tag is not a change
+    version = store._connection().execute("SELECT images_version FROM sessions").fetchone()[0]
+    other.set_tag("s1", "b.png", "logo")
+    assert store._connection().execute("SELECT images_version FROM sessions").fetchone()[0] == version
+
+
+def test_sqlite_store_adds_the_version_column_to_old_databases(tmp_path):
+    import sqlite3
+
+    db_path = str(tmp_path / "sessions.db")
+    with sqlite3.connect(db_path) as conn:
+        conn.execute(
+            "CREATE TABLE sessions (session_id TEXT PRIMARY KEY, created_at REAL NOT NULL, "
+            "upload_dir TEXT NOT NULL, output_dir TEXT NOT NULL, last_activity REAL NOT NULL)"
+        )
+        conn.execute("INSERT INTO sessions VALUES ('s1', 0, '/uploads/s1', '/output/s1', 0)")
+
+    store = SQLiteSessionStore(db_path)
+    store.add_image("s1", "a.png")
+    assert store.get("s1")["images"] == {"a.png": None}
@@ -0,0 +1,77 @@
+"""
+Tests for coalescing identical in-flight calls.
+"""
+
+import asyncio
+
+import pytest
+from singleflight import SingleFlight
+
+
+def test_concurrent_calls_share_one_result():
+    flights = SingleFlight()
+    started = []
+
+    async def work(value):
+        started.append(value)
+        await asyncio.sleep(0.01)
+        return value * 2
+
+    async def main():
+        results = await asyncio.gather(*(flights.do("key", work, 21) for _ in range(3)))
+        # Finished flights are forgotten, so the next call runs again
+        again = await flights.do("key", work, 21)
+        return results, again
+
+    results, again = asyncio.run(main())
+    assert results == [42, 42, 42] and again == 42
+    assert started == [21, 21]
+    assert flights.stats() == {"calls": 2, "shared": 2, "in_flight": 0}
+
+
+def test_failures_reach_every_caller_and_cancelled_callers_do_not_cancel_others():
+    flights = SingleFlight()
+
+    async def fail():
+        await asyncio.sleep(0.01)
+        raise ValueError("boom")
+
+    async def slow():
+        await asyncio.sleep(0.02)
+        return "done"
+
+    async def main():
+        failures = await asyncio.gather(flights.do("fail", fail), flights.do("fail", fail), return_exceptions=True)
+
+        leader = asyncio.ensure_future(flights.do("slow", slow))
+        follower = asyncio.ensure_future(flights.do("slow", slow))
+        await asyncio.sleep(0)
+        leader.cancel()
+        return failures, await follower
+
+    failures, result = asyncio.run(main())
+    assert all(isinstance(error, ValueError) for error in failures)
+    assert result == "done"
+
+
+def test_call_is_cancelled_when_every_caller_leaves():
+    flights = SingleFlight()
+    cancelled = []
+
+    async def slow():
+        try:
+            await asyncio.sleep(10)
+        except asyncio.CancelledError:
+            cancelled.append(True)
+            raise
+
+    async def main():
+        caller = asyncio.ensure_future(flights.do("slow", slow))
+        await asyncio.sleep(0)
+        caller.cancel()
+        with pytest.raises(asyncio.CancelledError):
+            await caller
+        await asyncio.sleep(0)
+
+    asyncio.run(main())
+    assert cancelled == [True]
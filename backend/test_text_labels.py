@@ -0,0 +1,26 @@
+"""
+Tests for cached fonts and outlined text labels.
+"""
+
+from PIL import Image
+from text_labels import load_font, paste_label, text_label
+
+
+def test_font_is_loaded_once_per_script_and_size():
+    assert load_font("latin", 48) is load_font("latin", 48)
+    assert load_font("latin", 24) is not load_font("latin", 48)
+
+
+def test_label_is_rendered_once_and_outlined():
+    label = text_label("Slide", "latin", 48, (255, 255, 255), (0, 0, 0))
+    assert text_label("Slide", "latin", 48, (255, 255, 255), (0, 0, 0)) is label
+
+    sprite, offset, (text_width, text_height) = label
+    assert sprite.mode == "RGBA"
+    # The outline makes the sprite larger than the text itself
+    assert sprite.width > text_width and sprite.height > text_height
+
+    canvas = Image.new("RGB", (400, 200), (0, 0, 255))
+    paste_label(canvas, label, (20, 20))
+    colors = {color for _, color in canvas.getcolors(400 * 200)}
+    assert (255, 255, 255) in colors and (0, 0, 0) in colors
@@ -0,0 +1,63 @@
+"""
+Tests for streaming uploads to disk.
+"""
+
+import asyncio
+import hashlib
+import io
+
+import pytest
+from PIL import Image
+import uploads
+from uploads import InvalidImage, UploadTooLarge, save_upload
+
+
+class FakeUpload:
+    """Just enough of Starlette's UploadFile: a filename and async read(size)"""
+
+    def __init__(self, data: bytes, filename="image.png"):
+        self.filename = filename
+        self._data = io.BytesIO(data)
+
+    async def read(self, size=-1):
+        return self._data.read(size)
+
+
+def png_bytes(size=(40, 30)):
+    buffer = io.BytesIO()
+    Image.new("RGB", size, (10, 20, 30)).save(buffer, "PNG")
+    return buffer.getvalue()
+
+
+def test_upload_is_hashed_and_identified_in_one_pass(tmp_path, monkeypatch):
+    monkeypatch.setattr(uploads, "UPLOAD_CHUNK_SIZE", 16)
+    data = png_bytes()
+    dest = tmp_path / "image.upload"
+
+    saved = asyncio.run(save_upload(FakeUpload(data), str(dest)))
+
+    assert saved == {
+        "size": len(data), "sha256": hashlib.sha256(data).hexdigest(),
+        "format": "PNG", "width": 40, "height": 30,
+    }
+    assert dest.read_bytes() == data
+    assert list(tmp_path.iterdir()) == [dest]
+
+
+def test_oversized_upload_is_refused_and_removed(tmp_path, monkeypatch):
+    monkeypatch.setattr(uploads, "UPLOAD_CHUNK_SIZE", 16)
+    data = png_bytes()
+    dest = tmp_path / "image.upload"
+
+    with pytest.raises(UploadTooLarge):
+        asyncio.run(save_upload(FakeUpload(data), str(dest), max_bytes=len(data) - 1))
+    # Neither the file nor its .part is left behind
+    assert list(tmp_path.iterdir()) == []
+
+
+def test_invalid_image_is_refused_and_removed(tmp_path):
+    dest = tmp_path / "notes.upload"
+
+    with pytest.raises(InvalidImage):
+        asyncio.run(save_upload(FakeUpload(b"not an image at all", "notes.png"), str(dest)))
+    assert list(tmp_path.iterdir()) == []
@@ -0,0 +1,73 @@
+from functools import lru_cache
+from PIL import Image, ImageDraw, ImageFont
+
+# Font files tried in order per script; the first that loads wins
+FONT_CANDIDATES = {
+    "devanagari": [
+        "NotoSansDevanagari-Regular.ttf",
+        "/usr/share/fonts/truetype/noto/NotoSansDevanagari-Regular.ttf",
+    ],
+    "latin": [
+        "arial.ttf",
+        "/System/Library/Fonts/Arial.ttf",
+        "/usr/share/fonts/truetype/dejavu/DejaVuSans-Bold.ttf",
+    ],
+}
+
+DEFAULT_FONT_SIZE = 48
+DEFAULT_STROKE_WIDTH = 2
+
+# Distinct rendered labels kept in memory (a slideshow needs one per slide)
+LABEL_CACHE_SIZE = 256
+
+# Measures text without a canvas
+_measure = ImageDraw.Draw(Image.new("L", (1, 1)))
+
+
+def script_for_language(language: str) -> str:
+    return "devanagari" if language == "hindi" else "latin"
+
+
+@lru_cache(maxsize=None)
+def load_font(script: str = "latin", size: int = DEFAULT_FONT_SIZE):
+    """Font for a script, resolved and loaded once per process (Pillow's default font if none is installed)"""
+    for candidate in FONT_CANDIDATES.get(script, FONT_CANDIDATES["latin"]):
+        try:
+            return ImageFont.truetype(candidate, size)
+        except OSError:
+            continue
+    return ImageFont.load_default()
+
+
+@lru_cache(maxsize=LABEL_CACHE_SIZE)
+def text_label(text: str, script: str, size: int, color: tuple, stroke_color: tuple,
+               stroke_width: int = DEFAULT_STROKE_WIDTH) -> tuple:
+    """
+    Render outlined text once into a transparent sprite.
+
+    Returns:
+        (sprite, offset, text_size): the RGBA sprite (shared, do not modify),
+        where its top-left sits relative to the text origin, and the size of
+        the text without its outline, for positioning
+    """
+    font = load_font(script, size)
+    left, top, right, bottom = _measure.textbbox((0, 0), text, font=font)
+    stroke_box = _measure.textbbox((0, 0), text, font=font, stroke_width=stroke_width)
+
+    sprite = Image.new("RGBA", (stroke_box[2] - stroke_box[0], stroke_box[3] - stroke_box[1]), (0, 0, 0, 0))
+    ImageDraw.Draw(sprite).text(
+        (-stroke_box[0], -stroke_box[1]), text, font=font, fill=color,
+        stroke_width=stroke_width, stroke_fill=stroke_color,
+    )
+    return sprite, stroke_box[:2], (right - left, bottom - top)
+
+
+def paste_label(canvas: Image.Image, label: tuple, position: tuple):
+    """Paste a text_label result with its text origin at position"""
+    sprite, offset, _ = label
+    canvas.paste(sprite, (position[0] + offset[0], position[1] + offset[1]), sprite)
+
+
+def label_cache_stats() -> dict:
+    info = text_label.cache_info()
+    return {"hits": info.hits, "misses": info.misses, "entries": info.currsize, "max_entries": info.maxsize}
@@ -0,0 +1,81 @@
+from PIL import Image
+import asyncio
+import hashlib
+import os
+
+try:
+    from .executors import get_io_pool
+except ImportError:
+    from executors import get_io_pool
+
+# Upload limits (environment overridable)
+UPLOAD_CHUNK_SIZE = int(os.environ.get("UPLOAD_CHUNK_SIZE", 1024 * 1024))
+MAX_UPLOAD_BYTES = int(os.environ.get("MAX_UPLOAD_BYTES", 25 * 1024 * 1024))
+MAX_SESSION_UPLOAD_BYTES = int(os.environ.get("MAX_SESSION_UPLOAD_BYTES", 200 * 1024 * 1024))
+
+
+class UploadTooLarge(Exception):
+    """Raised when an upload exceeds the per-file or per-session byte limit"""
+
+
+class InvalidImage(Exception):
+    """Raised when an uploaded file is not an image Pillow can read"""
+
+
+def _write_chunk(f, sha, chunk: bytes):
+    sha.update(chunk)
+    f.write(chunk)
+
+
+def read_image_header(path: str) -> dict:
+    """Identify an image from its header only (no pixel decode)"""
+    try:
+        with Image.open(path) as img:
+            return {"format": img.format, "width": img.size[0], "height": img.size[1]}
+    except Exception:
+        raise InvalidImage("Not a supported image file")
+
+
+async def save_upload(upload, dest_path: str, max_bytes: int = MAX_UPLOAD_BYTES) -> dict:
+    """
+    Stream an UploadFile to dest_path in fixed-size chunks.
+
+    The SHA-256 is computed in the same pass and the image header is checked
+    once the file is on disk. Writes go through the I/O thread pool so the
+    event loop never blocks on disk. Nothing is left at dest_path on failure.
+
+    Returns:
+        Dict with size, sha256, format, width and height
+
+    Raises:
+        UploadTooLarge: The upload is larger than max_bytes
+        InvalidImage: The file is not a readable image
+    """
+    loop = asyncio.get_running_loop()
+    pool = get_io_pool()
+    partial_path = f"{dest_path}.part"
+    sha = hashlib.sha256()
+    size = 0
+
+    try:
+        f = await loop.run_in_executor(pool, open, partial_path, "wb")
+        try:
+            while True:
+                chunk = await upload.read(UPLOAD_CHUNK_SIZE)
+                if not chunk:
+                    break
+                size += len(chunk)
+                if size > max_bytes:
+                    raise UploadTooLarge(f"{upload.filename} is larger than {max_bytes} bytes")
+                await loop.run_in_executor(pool, _write_chunk, f, sha, chunk)
+        finally:
+            await loop.run_in_executor(pool, f.close)
+
+        header = await loop.run_in_executor(pool, read_image_header, partial_path)
+        os.replace(partial_path, dest_path)
+    except BaseException:
+        if os.path.exists(partial_path):
+            os.remove(partial_path)
+        raise
+
+    return {"size": size, "sha256": sha.hexdigest(), **header}